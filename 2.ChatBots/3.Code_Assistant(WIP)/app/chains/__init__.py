@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Modules shared with the other apps (BM25 index, embedding cache, ingestion
+# pipeline, ...) live in the `shared` package at the root of the repository
+_repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+if _repo_root not in sys.path:
+    sys.path.append(_repo_root)
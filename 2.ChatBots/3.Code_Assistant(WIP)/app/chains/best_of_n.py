@@ -0,0 +1,94 @@
+import asyncio
+import os
+import time
+from collections import namedtuple
+
+from chains.code_gen import code_gen_chain_at
+from chains.sandbox import get_pool
+
+### Best-of-N generation
+#
+# Instead of generate -> check -> retry one solution at a time, N candidates
+# are generated concurrently, each with its own temperature and prompt hint,
+# and each is sent to the sandbox pool as soon as it arrives. The first
+# candidate that passes wins and the others are cancelled: pending
+# generations are abandoned mid-request and queued checks never start (a
+# check already running finishes within the sandbox timeout). When none
+# passes, every failure comes back so the retry can address them at once.
+
+n_candidates = int(os.environ.get("BEST_OF_N", 3))
+# One per candidate, cycled when N is larger
+temperatures = [float(t) for t in os.environ.get("BEST_OF_TEMPERATURES", "0,0.5,0.9").split(",")]
+hints = [
+    None,
+    "Keep the solution as short as possible, using only what the documentation shows.",
+    "Define every variable the code uses and avoid calls that need network access or API keys.",
+]
+
+# stage is "generation", "imports" or "code"
+Failure = namedtuple("Failure", ["candidate", "stage", "error", "solution"])
+
+
+def candidate_messages(messages, i):
+    hint = hints[i % len(hints)]
+    return messages + [("user", hint)] if hint else messages
+
+
+async def _candidate(i, context, messages):
+    temperature = temperatures[i % len(temperatures)]
+    try:
+        solution = await code_gen_chain_at(temperature).ainvoke(
+            {"context": context, "messages": candidate_messages(messages, i)}
+        )
+    except Exception as e:
+        return i, None, Failure(i, "generation", f"{type(e).__name__}: {e}", None)
+    result = await asyncio.wrap_future(get_pool().submit(solution.imports, solution.code))
+    if result.ok:
+        return i, solution, None
+    return i, solution, Failure(i, result.stage, result.error, solution)
+
+
+async def best_of_n(context, messages, n=n_candidates):
+    """
+    Generate n candidate solutions concurrently and check each as it arrives.
+
+    Args:
+        context (str): Documentation for the prompt
+        messages (list): The conversation so far
+        n (int): Number of candidates
+
+    Returns:
+        tuple: (passing solution or None, list of Failures in candidate order)
+    """
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(_candidate(i, context, messages)) for i in range(n)]
+    failures = []
+    try:
+        for finished in asyncio.as_completed(tasks):
+            i, solution, failure = await finished
+            if failure is None:
+                print(f"---CANDIDATE {i + 1}/{n} PASSED AFTER {time.perf_counter() - started:.1f}s---")
+                return solution, sorted(failures)
+            print(f"---CANDIDATE {i + 1}/{n} FAILED ({failure.stage})---")
+            failures.append(failure)
+        return None, sorted(failures)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def consolidated_feedback(failures):
+    """One retry message covering every failed candidate."""
+    lines = [f"All {len(failures)} candidate solutions failed:"]
+    for f in failures:
+        test = {"generation": "to produce a structured solution", "imports": "the import test"}.get(
+            f.stage, "the code execution test"
+        )
+        approach = f" ({f.solution.prefix.strip()[:200]})" if f.solution is not None else ""
+        lines.append(f"{f.candidate + 1}. Candidate{approach} failed {test}: {f.error}")
+    lines.append(
+        "Now, try again, avoiding all of these errors. Invoke the code tool to structure "
+        "the output with a prefix, imports, and code block:"
+    )
+    return "\n".join(lines)
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.pydantic_v1 import BaseModel, Field
 from langchain_openai import ChatOpenAI
@@ -10,7 +12,7 @@ code_gen_prompt = ChatPromptTemplate.from_messages(
         (
             "system",
             """You are a coding assistant with expertise in LCEL, LangChain expression language. \n 
-    Here is a full set of LCEL documentation:  \n ------- \n  {context} \n ------- \n Answer the user 
+    Here are the sections of the LCEL documentation relevant to the question:  \n ------- \n  {context} \n ------- \n Answer the user 
     question based on the above provided documentation. Ensure any code you provide can be executed \n 
     with all required imports and variables defined. Structure your answer with a description of the code solution. \n
     Then list the imports. And finally list the functioning code block. Here is the user question:""",
@@ -32,7 +34,8 @@ class code(BaseModel):
 
 expt_llm = "gpt-4o-mini"
 llm = ChatOpenAI(temperature=0, model=expt_llm)
-code_gen_chain = code_gen_prompt | llm.with_structured_output(code)
+# include_raw so check_claude_output can see parsing errors and missing tool calls
+code_gen_chain = code_gen_prompt | llm.with_structured_output(code, include_raw=True)
 
 def check_claude_output(tool_output):
     """Check for parse error or failure to call the tool"""
@@ -56,7 +59,25 @@ def check_claude_output(tool_output):
     return tool_output
 
 
+def parsed_solution(tool_output):
+    return tool_output["parsed"]
+
+
 # Chain with output check
 code_gen_chain_final = (
-    code_gen_chain | check_claude_output
-)
\ No newline at end of file
+    code_gen_chain | check_claude_output | parsed_solution
+)
+
+
+@lru_cache(maxsize=None)
+def code_gen_chain_at(temperature):
+    """code_gen_chain_final with the model sampled at the given temperature (best-of-N candidates)."""
+    if temperature == 0:
+        return code_gen_chain_final
+    candidate_llm = ChatOpenAI(temperature=temperature, model=expt_llm)
+    return (
+        code_gen_prompt
+        | candidate_llm.with_structured_output(code, include_raw=True)
+        | check_claude_output
+        | parsed_solution
+    )
\ No newline at end of file
@@ -0,0 +1,145 @@
+import asyncio
+import random
+from collections import namedtuple
+from urllib.parse import urldefrag, urljoin
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+### Concurrent documentation crawler
+#
+# Breadth-first crawl of every page under a URL prefix, with a bounded pool
+# of workers sharing one connection pool. Pages from the previous crawl are
+# requested conditionally (If-None-Match / If-Modified-Since); a 304 costs no
+# body, and its links are taken from the previous crawl so the walk goes on.
+# Transient failures are retried with exponential backoff; a page that still
+# fails is reported with its error and the caller keeps the old copy.
+
+headers_template = {"User-Agent": "Mozilla/5.0 (compatible; langgraph-code-assistant-crawler)"}
+
+# Responses worth retrying
+retry_statuses = {429, 500, 502, 503, 504}
+
+# text is None when the page is unchanged (304) or failed (error is set)
+CrawlResult = namedtuple("CrawlResult", ["url", "text", "validators", "links", "error"])
+
+
+class RetryableStatus(Exception):
+    pass
+
+
+def extract(url, html, prefix):
+    """
+    Page text, extracted as RecursiveUrlLoader's Soup(...).text did, and the links under prefix.
+
+    Returns:
+        tuple: (text, sorted list of absolute URLs without fragments)
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    links = set()
+    for a in soup.find_all("a", href=True):
+        link = urldefrag(urljoin(url, a["href"]))[0]
+        if link.startswith(prefix):
+            links.add(link)
+    return soup.text, sorted(links)
+
+
+async def fetch_page(session, url, previous, prefix, retries=3, backoff=0.5, timeout=30):
+    """
+    Conditionally fetch one page, retrying transient failures.
+
+    Args:
+        session (aiohttp.ClientSession): Shared HTTP session
+        url (str): Page URL
+        previous (dict): The page's entry in the last crawl ("etag", "last_modified", "links"), may be empty
+        prefix (str): Only links starting with this are followed
+
+    Returns:
+        CrawlResult: The page text, or None if the server answered 304
+    """
+    headers = {}
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+
+    for attempt in range(retries + 1):
+        try:
+            async with session.get(
+                url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                if response.status == 304:
+                    validators = {"etag": previous.get("etag"), "last_modified": previous.get("last_modified")}
+                    return CrawlResult(url, None, validators, previous.get("links", []), None)
+                if response.status in retry_statuses:
+                    raise RetryableStatus(f"HTTP {response.status}")
+                response.raise_for_status()
+                if "html" not in response.headers.get("Content-Type", "text/html"):
+                    return CrawlResult(url, None, {}, [], ValueError("not an HTML page"))
+                html = await response.text()
+                validators = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+            text, links = extract(url, html, prefix)
+            return CrawlResult(url, text, validators, links, None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, RetryableStatus) as e:
+            if attempt == retries or (
+                isinstance(e, aiohttp.ClientResponseError) and e.status not in retry_statuses
+            ):
+                print(f"---CRAWL FAILED: {url} ({e})---")
+                return CrawlResult(url, None, {}, previous.get("links", []), e)
+            delay = backoff * 2**attempt + random.uniform(0, backoff)
+            await asyncio.sleep(delay)
+
+
+async def acrawl(start_url, prefix, previous=None, max_depth=20, concurrency=8, per_host=8, retries=3):
+    """
+    Crawl every page reachable from start_url under prefix.
+
+    Args:
+        start_url (str): Where to start
+        prefix (str): Only URLs starting with this are crawled
+        previous (dict): url -> entry from the last crawl, for conditional requests
+        max_depth (int): Maximum link distance from start_url
+        concurrency (int): Maximum requests in flight
+        per_host (int): Maximum open connections per host
+        retries (int): Retries for transient failures
+
+    Returns:
+        dict: url -> CrawlResult for every page visited
+    """
+    previous = previous or {}
+    start_url = urldefrag(start_url)[0]
+    queue = asyncio.Queue()
+    queue.put_nowait((start_url, 0))
+    seen = {start_url}
+    results = {}
+
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host)
+    async with aiohttp.ClientSession(connector=connector, headers=headers_template) as session:
+
+        async def worker():
+            while True:
+                url, depth = await queue.get()
+                try:
+                    result = await fetch_page(session, url, previous.get(url, {}), prefix, retries)
+                except Exception as e:
+                    print(f"---CRAWL FAILED: {url} ({e})---")
+                    result = CrawlResult(url, None, {}, previous.get(url, {}).get("links", []), e)
+                results[url] = result
+                if depth < max_depth:
+                    for link in result.links:
+                        if link not in seen:
+                            seen.add(link)
+                            queue.put_nowait((link, depth + 1))
+                queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    return results
@@ -0,0 +1,267 @@
+from dotenv import load_dotenv
+import os
+load_dotenv()
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import tiktoken
+
+from shared.bm25 import BM25Index, index_name
+
+### Documentation index
+#
+# The LCEL docs snapshot (graph.content) is split into ~400-token chunks and
+# saved with a BM25 keyword index:
+#
+#   python -m chains.doc_index build     (re-)build the index, crawling only if there is no snapshot
+#   python -m chains.doc_index check     exit code 0 when an index exists
+#   python -m chains.doc_index stats "how do I stream a chain?"
+#
+# Each generation then gets only the chunks relevant to the user question and
+# to the latest error message, fused by reciprocal rank and packed into a
+# token budget, instead of the whole crawl. BM25 rather than embeddings:
+# questions and errors are full of API names (RunnableParallel,
+# with_structured_output, "has no attribute 'astream_events'") that keyword
+# search matches exactly, and retrieval needs no network call per attempt.
+
+index_dir = os.environ.get("CODE_ASSISTANT_INDEX_DIR", "./.doc_index")
+# Token budget for the documentation put in each prompt
+context_max_tokens = int(os.environ.get("DOCS_CONTEXT_MAX_TOKENS", 3000))
+# Chunks fetched per query before fusion and packing
+retrieval_k = int(os.environ.get("DOCS_RETRIEVAL_K", 12))
+# Weight of the error message's ranking relative to the question's
+error_weight = float(os.environ.get("DOCS_ERROR_WEIGHT", 1.0))
+# Crawl and index on first use when nothing is persisted yet
+build_on_demand = os.environ.get("CODE_ASSISTANT_BUILD_ON_DEMAND", "1") == "1"
+# Searches remembered per index (least recently used dropped first)
+search_cache_size = int(os.environ.get("DOCS_SEARCH_CACHE_SIZE", 128))
+
+chunks_name = "chunks.json"
+chunk_size = 400
+chunk_overlap = 40
+rrf_k = 60
+separator = "\n\n\n --- \n\n\n"
+
+_index = None
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text):
+    return len(_encoding().encode(text))
+
+
+def chunk_id(source, text):
+    """Content-addressed ID for a chunk of a given page."""
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()
+
+
+class DocIndex:
+    """
+    Persisted documentation chunks with a BM25 index over them.
+
+    Attributes:
+        directory: Where chunks.json and bm25.json are saved
+        chunks: chunk id -> {"source", "position", "text", "tokens"}
+        snapshot_version: Version of the doc snapshot the chunks come from
+    """
+
+    def __init__(self, directory=index_dir):
+        self.directory = directory
+        self.path = os.path.join(directory, chunks_name)
+        self.sparse_index = BM25Index(directory)
+        self.chunks = {}
+        self.snapshot_version = None
+        # (query, k) -> chunk ids, in LRU order; retries repeat the same
+        # question, while every error message is new
+        self._searches = OrderedDict()
+        self._searches_lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                saved = json.load(f)
+            self.chunks = saved["chunks"]
+            self.snapshot_version = saved.get("snapshot_version")
+
+    def exists(self):
+        return os.path.exists(self.path) and self.sparse_index.exists()
+
+    def total_tokens(self):
+        """Tokens of the whole documentation, i.e. what the prompt used to carry."""
+        return sum(c["tokens"] for c in self.chunks.values())
+
+    def build(self, docs, snapshot_version=None):
+        """
+        Replace the index with the given pages.
+
+        Args:
+            docs (list): Documents with the page text and a "source" URL in their metadata
+            snapshot_version (int): Version of the snapshot the pages come from
+        """
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+        chunks = {}
+        for doc in sorted(docs, key=lambda d: d.metadata["source"]):
+            source = doc.metadata["source"]
+            for position, text in enumerate(text_splitter.split_text(doc.page_content)):
+                chunks[chunk_id(source, text)] = {
+                    "source": source,
+                    "position": position,
+                    "text": text,
+                    "tokens": count_tokens(text),
+                }
+
+        os.makedirs(self.directory, exist_ok=True)
+        if self.sparse_index.exists():
+            os.remove(os.path.join(self.directory, index_name))
+        self.sparse_index = BM25Index(self.directory)
+        self.sparse_index.add(list(chunks), [c["text"] for c in chunks.values()])
+        self.sparse_index.save()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"snapshot_version": snapshot_version, "chunks": chunks}, f)
+        os.replace(tmp_path, self.path)
+        self.chunks = chunks
+        self.snapshot_version = snapshot_version
+        with self._searches_lock:
+            self._searches.clear()
+        print(f"---DOC INDEX: {len(docs)} PAGES, {len(chunks)} CHUNKS, {self.total_tokens()} TOKENS---")
+
+    def search(self, query, k=retrieval_k):
+        """
+        Args:
+            query (str): Question or error message
+            k (int): Number of chunks
+
+        Returns:
+            tuple: Chunk ids, best first
+        """
+        key = (query, k)
+        with self._searches_lock:
+            if key in self._searches:
+                self._searches.move_to_end(key)
+                return self._searches[key]
+        ids = tuple(i for i, _ in self.sparse_index.search(query, k) if i in self.chunks)
+        with self._searches_lock:
+            self._searches[key] = ids
+            while len(self._searches) > search_cache_size:
+                self._searches.popitem(last=False)
+        return ids
+
+    def context(self, question, error=None, max_tokens=context_max_tokens):
+        """
+        The documentation to put in the prompt for a question and, on a retry, its latest error.
+
+        Args:
+            question (str): The user question
+            error (str): The error the last attempt failed with, if any
+            max_tokens (int): Token budget
+
+        Returns:
+            str: The selected chunks, grouped by page, joined like the full crawl used to be
+        """
+        rankings = [(1.0, self.search(question))]
+        if error:
+            rankings.append((error_weight, self.search(error)))
+        scores = {}
+        for weight, ranked in rankings:
+            for rank, i in enumerate(ranked, start=1):
+                scores[i] = scores.get(i, 0.0) + weight / (rrf_k + rank)
+
+        selected, used = [], 0
+        for i in sorted(scores, key=scores.get, reverse=True):
+            tokens = self.chunks[i]["tokens"]
+            if used + tokens > max_tokens:
+                continue
+            selected.append(i)
+            used += tokens
+
+        # Keep each page's chunks together and in reading order
+        selected.sort(key=lambda i: (self.chunks[i]["source"], self.chunks[i]["position"]))
+        print(f"---DOC CONTEXT: {len(selected)} CHUNKS, {used} TOKENS---")
+        return separator.join(self.chunks[i]["text"] for i in selected)
+
+
+def _snapshot_version():
+    from chains.snapshot import read_current
+    from graph.content import snapshot_dir
+
+    current = read_current(snapshot_dir)
+    return current["version"] if current else None
+
+
+def build_doc_index(directory=index_dir):
+    from graph.content import load_docs
+
+    docs = load_docs()
+    index = DocIndex(directory)
+    index.build(docs, _snapshot_version())
+    return index
+
+
+def get_doc_index():
+    """
+    Return the process-wide index, loading it from disk on first call.
+
+    Returns:
+        DocIndex: The shared index
+    """
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                index = DocIndex(index_dir)
+                if not index.exists():
+                    if not build_on_demand:
+                        raise RuntimeError(
+                            f"No doc index in {index_dir}; run `python -m chains.doc_index build`"
+                        )
+                    print("---NO PERSISTED DOC INDEX, BUILDING IT NOW---")
+                    index = build_doc_index(index_dir)
+                elif _snapshot_version() not in (None, index.snapshot_version):
+                    print("---DOC SNAPSHOT CHANGED, REBUILDING THE DOC INDEX---")
+                    index = build_doc_index(index_dir)
+                _index = index
+    return _index
+
+
+def reload_doc_index():
+    """Rebuild the index from the current snapshot and swap it in for new requests."""
+    global _index
+    index = build_doc_index(index_dir)
+    with _lock:
+        _index = index
+
+
+def retrieve_context(question, error=None):
+    return get_doc_index().context(question, error)
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "build":
+        build_doc_index()
+    elif command == "check":
+        ready = DocIndex(index_dir).exists()
+        print("ready" if ready else f"not ready: no doc index in {index_dir}")
+        sys.exit(0 if ready else 1)
+    elif command == "stats" and len(sys.argv) > 2:
+        index = get_doc_index()
+        context = index.context(" ".join(sys.argv[2:]))
+        before, after = index.total_tokens(), count_tokens(context)
+        print(f"full docs: {before} tokens, retrieved: {after} tokens ({before / max(after, 1):.0f}x smaller)")
+    else:
+        print('usage: python -m chains.doc_index build | check | stats "<question>"')
+        sys.exit(2)
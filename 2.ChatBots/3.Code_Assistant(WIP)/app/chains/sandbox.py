@@ -0,0 +1,351 @@
+import atexit
+import contextlib
+import os
+import pickle
+import queue
+import select
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, the wall-clock timeout still applies
+    resource = None
+
+### Code execution pool
+#
+# Generated solutions run in a pool of worker subprocesses instead of the
+# assistant's own process. Each worker imports the usual LCEL modules once at
+# start, so a check only pays for the snippet itself, and runs one snippet at
+# a time with:
+#   - a CPU-time limit (RLIMIT_CPU) and an address-space limit (RLIMIT_AS)
+#     on top of what the worker uses after its imports
+#   - a wall-clock timeout enforced by the parent, which kills and replaces
+#     the worker when it expires (also covers sleeps and blocking I/O)
+#   - stdout / stderr captured and returned with the result, also when the
+#     snippet timed out: they are written, line by line, to files in the
+#     worker's directory, which the parent reads after killing the worker
+# Workers are replaced after a limit was hit or a crash, and after
+# `max_runs` snippets since snippets can leave modules monkeypatched.
+#
+# This is resource isolation, not a security sandbox: snippets run with the
+# user's permissions and environment.
+#
+# Workers are started with `python -m chains.sandbox` rather than
+# multiprocessing, whose spawn mode would re-run code-assistant-app.py (an
+# input() loop) in every worker. Requests and results are length-prefixed
+# pickles over the worker's stdin / stdout; snippets get /dev/null as stdin
+# and stdout, so input() fails at once instead of reading the protocol.
+
+pool_size = int(os.environ.get("SANDBOX_WORKERS", 4))
+timeout = float(os.environ.get("SANDBOX_TIMEOUT", 10))
+cpu_seconds = int(os.environ.get("SANDBOX_CPU_SECONDS", 5))
+memory_mb = int(os.environ.get("SANDBOX_MEMORY_MB", 512))
+max_runs = int(os.environ.get("SANDBOX_MAX_RUNS", 100))
+# Characters of stdout / stderr kept per run
+output_limit = int(os.environ.get("SANDBOX_OUTPUT_LIMIT", 10000))
+# Imported by every worker before it takes work
+preload = os.environ.get(
+    "SANDBOX_PRELOAD",
+    "langchain_core.runnables,langchain_core.prompts,langchain_core.output_parsers,"
+    "langchain_core.messages,langchain_openai",
+).split(",")
+
+# Seconds a new worker may take to import `preload`
+startup_timeout = 60
+
+# stage is "imports" or "code" when that part of the solution failed, None when both passed
+CheckResult = namedtuple("CheckResult", ["ok", "stage", "error", "stdout", "stderr", "seconds"])
+
+_frame = struct.Struct("<I")
+_app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _send(stream, message):
+    payload = pickle.dumps(message)
+    stream.write(_frame.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def _read_exactly(stream, n):
+    data = b""
+    while len(data) < n:
+        chunk = stream.read(n - len(data))
+        if not chunk:
+            raise EOFError("sandbox worker exited")
+        data += chunk
+    return data
+
+
+def _receive(stream):
+    (length,) = _frame.unpack(_read_exactly(stream, _frame.size))
+    return pickle.loads(_read_exactly(stream, length))
+
+
+class _Worker:
+    """Parent-side handle on one worker subprocess."""
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix="sandbox-")
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [_app_dir, os.environ.get("PYTHONPATH")]))}
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "chains.sandbox"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=self.directory,
+            env=env,
+        )
+        self.ready = False
+        self.runs = 0
+
+    def _output(self, name):
+        # What a killed worker's snippet printed before it was killed
+        try:
+            with open(os.path.join(self.directory, name), errors="replace") as f:
+                return f.read(output_limit)
+        except OSError:
+            return ""
+
+    def _wait(self, seconds):
+        readable, _, _ = select.select([self.process.stdout], [], [], seconds)
+        if not readable:
+            raise TimeoutError
+        return _receive(self.process.stdout)
+
+    def run(self, imports, code, timeout):
+        """
+        Returns:
+            tuple: (CheckResult, whether the worker can take more work)
+        """
+        try:
+            if not self.ready:
+                # Pre-warming normally finished while the worker sat idle
+                self._wait(startup_timeout)
+                self.ready = True
+        except (TimeoutError, EOFError, OSError) as e:
+            return CheckResult(False, "code", f"WorkerCrashed: the worker did not start ({e!r})", "", "", 0.0), False
+        started = time.perf_counter()
+        try:
+            _send(self.process.stdin, {"imports": imports, "code": code, "cpu_seconds": cpu_seconds, "memory_mb": memory_mb})
+            reply = self._wait(timeout)
+        except TimeoutError:
+            elapsed = time.perf_counter() - started
+            error = f"TimeoutError: execution took longer than {timeout:g}s"
+            self.close()
+            return CheckResult(False, "code", error, self._output("stdout.txt"), self._output("stderr.txt"), elapsed), False
+        except (EOFError, BrokenPipeError, OSError) as e:
+            elapsed = time.perf_counter() - started
+            error = f"WorkerCrashed: the code killed its worker process ({e})"
+            self.close()
+            return CheckResult(False, "code", error, self._output("stdout.txt"), self._output("stderr.txt"), elapsed), False
+        self.runs += 1
+        result = CheckResult(**reply["result"])
+        return result, not reply["replace"] and self.runs < max_runs
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+    def remove(self):
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class SandboxPool:
+    """
+    Pre-warmed worker subprocesses that check code solutions.
+
+    Attributes:
+        size: Number of workers, i.e. snippets run in parallel
+        timeout: Wall-clock seconds per snippet
+    """
+
+    def __init__(self, size=pool_size, timeout=timeout):
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(_Worker())
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="sandbox")
+        self._closed = False
+
+    def check(self, imports, code, timeout=None):
+        """
+        Run a solution's imports, then its imports and code, in a worker.
+
+        Args:
+            imports (str): Import statements
+            code (str): Code block
+            timeout (float): Wall-clock seconds; defaults to the pool's
+
+        Returns:
+            CheckResult: Outcome, captured output and run time
+        """
+        worker = self._idle.get()
+        healthy = False
+        try:
+            result, healthy = worker.run(imports, code, timeout or self.timeout)
+            return result
+        finally:
+            if healthy:
+                self._idle.put(worker)
+            else:
+                # Start the replacement first so it warms up while the old one dies
+                self._idle.put(_Worker())
+                worker.remove()
+
+    def check_many(self, solutions, timeout=None):
+        """
+        Check several solutions in parallel.
+
+        Args:
+            solutions (list): (imports, code) pairs
+
+        Returns:
+            list: CheckResults, in the order of solutions
+        """
+        futures = [self._executor.submit(self.check, imports, code, timeout) for imports, code in solutions]
+        return [f.result() for f in futures]
+
+    def submit(self, imports, code, timeout=None):
+        """Check a solution in the background; returns a concurrent.futures.Future."""
+        return self._executor.submit(self.check, imports, code, timeout)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        while True:
+            try:
+                self._idle.get_nowait().remove()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide pool, started on first use."""
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = SandboxPool()
+                atexit.register(_pool.close)
+    return _pool
+
+
+### Worker side
+
+
+class CPULimitExceeded(BaseException):
+    """Raised in the snippet on SIGXCPU; a BaseException so `except Exception` cannot swallow it."""
+
+
+def _address_space():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _set_limits(cpu, memory):
+    if resource is None:
+        return
+    used = resource.getrusage(resource.RUSAGE_SELF)
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (int(used.ru_utime + used.ru_stime) + cpu, cpu_hard))
+    if os.path.exists("/proc/self/statm"):
+        _, as_hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (_address_space() + memory * 1024 * 1024, as_hard))
+
+
+def _clear_limits():
+    if resource is None:
+        return
+    for limit in (resource.RLIMIT_CPU, resource.RLIMIT_AS):
+        resource.setrlimit(limit, (resource.getrlimit(limit)[1],) * 2)
+
+
+def _execute(request, directory):
+    # Line-buffered files rather than StringIO, so the parent can still read
+    # them if it has to kill this worker mid-run
+    stdout = open(os.path.join(directory, "stdout.txt"), "w+", buffering=1, errors="replace")
+    stderr = open(os.path.join(directory, "stderr.txt"), "w+", buffering=1, errors="replace")
+    stage, error, replace = None, None, False
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        for stage, source in (("imports", request["imports"]), ("code", request["imports"] + "\n" + request["code"])):
+            _set_limits(request["cpu_seconds"], request["memory_mb"])
+            try:
+                exec(source, {"__name__": "__sandbox__"})
+            except CPULimitExceeded:
+                error, replace = f"CPULimitExceeded: used more than {request['cpu_seconds']}s of CPU", True
+            except MemoryError:
+                error, replace = f"MemoryError: used more than {request['memory_mb']} MB", True
+            except BaseException as e:
+                error = f"{type(e).__name__}: {e}"
+                replace = not isinstance(e, Exception)
+            finally:
+                _clear_limits()
+            if error:
+                break
+        else:
+            stage = None
+    seconds = time.perf_counter() - started
+    output = {}
+    for name, f in (("stdout", stdout), ("stderr", stderr)):
+        with f:
+            f.seek(0)
+            output[name] = f.read(output_limit)
+    result = {"ok": error is None, "stage": stage, "error": error, **output, "seconds": seconds}
+    return {"result": result, "replace": replace}
+
+
+def _worker_main():
+    import signal
+
+    # Keep the protocol on its own descriptors; anything written to fd 1 by
+    # C extensions or subprocesses goes nowhere instead of corrupting it, and
+    # a snippet reading stdin gets EOF instead of blocking on the requests
+    requests = os.fdopen(os.dup(0), "rb")
+    replies = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    sys.stdin = open(0, "r", closefd=False)
+    sys.stdout = open(1, "w", closefd=False)
+    directory = os.getcwd()
+
+    def on_sigxcpu(signum, frame):
+        raise CPULimitExceeded()
+
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, on_sigxcpu)
+
+    for module in filter(None, (m.strip() for m in preload)):
+        try:
+            __import__(module)
+        except Exception:
+            pass
+    _send(replies, "ready")
+
+    while True:
+        try:
+            request = _receive(requests)
+        except EOFError:
+            return
+        _send(replies, _execute(request, directory))
+
+
+if __name__ == "__main__":
+    _worker_main()
@@ -0,0 +1,216 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import weakref
+import zlib
+
+from langchain_core.documents import Document
+
+### Crawl snapshots
+#
+# Every crawl is saved as one immutable, versioned file:
+#
+#   snapshot-<version>.bin = magic | header length | header | page blobs
+#
+# The header is zlib-compressed JSON: snapshot version, creation time and,
+# per URL, the offset and length of its blob, its HTTP validators (ETag /
+# Last-Modified) and its links. Each blob is the page text, compressed on
+# its own. A snapshot is opened by memory-mapping the file and reading only
+# the header; page text is decompressed when asked for, so opening one costs
+# milliseconds whatever the size of the crawl.
+#
+# CURRENT points at the live version and records when the docs were last
+# checked. A refresh writes the next version next to it, then swaps CURRENT
+# atomically; readers of the old file are unaffected. Unchanged pages (304)
+# have their compressed blob copied as-is.
+
+magic = b"LCELSNP1"
+_prefix = struct.Struct("<8sQ")
+current_name = "CURRENT"
+# Snapshot files kept on disk, counting the current one
+keep_versions = 2
+
+
+class Snapshot:
+    """
+    A read-only, memory-mapped crawl snapshot.
+
+    Attributes:
+        path: The snapshot file
+        version: Increases by one with every snapshot that changed something
+        created_at: When it was written (seconds since the epoch)
+        pages: url -> {"offset", "length", "etag", "last_modified", "links"}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Unmapped by close() or, at the latest, when the last reference is dropped
+        self._finalizer = weakref.finalize(self, self._mmap.close)
+        file_magic, header_length = _prefix.unpack_from(self._mmap, 0)
+        if file_magic != magic:
+            raise ValueError(f"{path} is not a crawl snapshot")
+        start = _prefix.size
+        header = json.loads(zlib.decompress(self._mmap[start:start + header_length]))
+        self._data_start = start + header_length
+        self.version = header["version"]
+        self.created_at = header["created_at"]
+        self.pages = header["pages"]
+
+    def __len__(self):
+        return len(self.pages)
+
+    def blob(self, url):
+        """The page's compressed text, as stored."""
+        page = self.pages[url]
+        start = self._data_start + page["offset"]
+        return self._mmap[start:start + page["length"]]
+
+    def text(self, url):
+        return zlib.decompress(self.blob(url)).decode("utf-8")
+
+    def documents(self):
+        """One Document per page, like the loader used to return."""
+        return [Document(page_content=self.text(url), metadata={"source": url}) for url in sorted(self.pages)]
+
+    def close(self):
+        self._finalizer()
+
+
+def write_snapshot(directory, version, pages, checked_at=None):
+    """
+    Write a new snapshot version and make it current.
+
+    Args:
+        directory (str): Snapshot directory
+        version (int): The new version
+        pages (dict): url -> {"blob" (compressed text), "etag", "last_modified", "links"}
+        checked_at (float): When the docs were checked; defaults to now
+
+    Returns:
+        str: Path of the new snapshot file
+    """
+    os.makedirs(directory, exist_ok=True)
+    entries, blobs, offset = {}, [], 0
+    for url in sorted(pages):
+        page = pages[url]
+        entries[url] = {
+            "offset": offset,
+            "length": len(page["blob"]),
+            "etag": page.get("etag"),
+            "last_modified": page.get("last_modified"),
+            "links": page.get("links", []),
+        }
+        blobs.append(page["blob"])
+        offset += len(page["blob"])
+    header = zlib.compress(
+        json.dumps({"version": version, "created_at": time.time(), "pages": entries}).encode("utf-8")
+    )
+
+    name = f"snapshot-{version:06d}.bin"
+    path = os.path.join(directory, name)
+    with open(path + ".tmp", "wb") as f:
+        f.write(_prefix.pack(magic, len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(path + ".tmp", path)
+    _write_current(directory, {"version": version, "file": name, "checked_at": checked_at or time.time()})
+    _prune(directory, version)
+    return path
+
+
+def _write_current(directory, current):
+    path = os.path.join(directory, current_name)
+    with open(path + ".tmp", "w") as f:
+        json.dump(current, f)
+    os.replace(path + ".tmp", path)
+
+
+def _prune(directory, version):
+    for name in os.listdir(directory):
+        if name.startswith("snapshot-") and name.endswith(".bin"):
+            if int(name[len("snapshot-"):-len(".bin")]) <= version - keep_versions:
+                os.remove(os.path.join(directory, name))
+
+
+def read_current(directory):
+    """The CURRENT pointer ({"version", "file", "checked_at"}), or None when there is no snapshot."""
+    try:
+        with open(os.path.join(directory, current_name)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def mark_checked(directory):
+    """Record that the docs were checked and nothing changed."""
+    current = read_current(directory)
+    if current is not None:
+        _write_current(directory, {**current, "checked_at": time.time()})
+
+
+_open = {}
+_lock = threading.Lock()
+
+
+def open_snapshot(directory):
+    """
+    The current snapshot of a directory, memory-mapped once per version.
+
+    When CURRENT has moved on, the previous version is dropped from the table
+    but not closed, since a reader (e.g. a refresh merging into the next
+    version) may still hold it; it is unmapped once the last one lets go.
+
+    Returns:
+        Snapshot: The current snapshot, or None when nothing was crawled yet
+    """
+    current = read_current(directory)
+    if current is None:
+        return None
+    path = os.path.join(directory, current["file"])
+    with _lock:
+        snapshot = _open.get(directory)
+        if snapshot is None or snapshot.path != path:
+            snapshot = _open[directory] = Snapshot(path)
+    return snapshot
+
+
+def merge_crawl(snapshot, results):
+    """
+    Combine a crawl with the previous snapshot.
+
+    Pages that are unchanged (304) or failed to download keep their old blob;
+    pages the crawl no longer reached are dropped.
+
+    Args:
+        snapshot (Snapshot): The previous snapshot, or None
+        results (dict): url -> chains.crawler.CrawlResult
+
+    Returns:
+        tuple: (pages for write_snapshot, whether anything changed)
+    """
+    old = snapshot.pages if snapshot is not None else {}
+    pages, changed = {}, False
+    for url, result in results.items():
+        if result.text is not None:
+            blob = zlib.compress(result.text.encode("utf-8"))
+            if url not in old or snapshot.blob(url) != blob:
+                changed = True
+            pages[url] = {"blob": blob, **result.validators, "links": result.links}
+        elif url in old:
+            entry = old[url]
+            validators = result.validators if result.error is None else entry
+            pages[url] = {
+                "blob": snapshot.blob(url),
+                "etag": validators.get("etag"),
+                "last_modified": validators.get("last_modified"),
+                "links": entry["links"],
+            }
+    if set(old) - set(pages):
+        changed = True
+    return pages, changed
@@ -3,6 +3,15 @@ import os
 load_dotenv()
 
 from graph.graph import app,display_graph
+from graph.content import start_background_refresh
+
+# Re-check the LCEL docs in the background once the snapshot is old enough
+start_background_refresh()
+
+from chains.sandbox import get_pool
+
+# Start the sandbox workers now so they have finished their imports by the first question
+get_pool()
 
 from pprint import pprint
 
@@ -0,0 +1,77 @@
+import os
+
+from langchain_core.messages import HumanMessage, RemoveMessage
+
+### Message compaction
+#
+# Nodes append to GraphState.messages through the add_messages reducer, so
+# each step only sends its new messages. A long retry chain still grows the
+# conversation (every failed attempt adds the full solution and its error),
+# which makes every later prompt, state update and checkpoint bigger. Once
+# the conversation passes `compact_tokens`, the attempts between the user
+# question and the last `keep_last` messages are replaced by one summary
+# message, one line per attempt and error:
+#
+#   [question, summary, last attempt, last error]
+#
+# The summary takes the place of the first compacted message (same id), so
+# it stays right after the question, and later compactions update it in
+# place. It is built without a model call.
+
+compact_tokens = int(os.environ.get("MESSAGES_COMPACT_TOKENS", 3000))
+keep_last = int(os.environ.get("MESSAGES_KEEP_LAST", 2))
+summary_name = "attempts_summary"
+summary_header = "Summary of earlier attempts and the errors they hit:"
+# Characters of an attempt or error kept in its summary line
+line_chars = 300
+
+
+def message_text(message):
+    """Content of a ("role", content) tuple or a message object."""
+    return message[1] if isinstance(message, tuple) else message.content
+
+
+def estimate_tokens(messages):
+    """Rough token count (4 characters per token), good enough for a threshold."""
+    return sum(len(message_text(m)) for m in messages) // 4
+
+
+def _summary_line(message):
+    text = " ".join(message_text(message).split())
+    if len(text) > line_chars:
+        text = text[:line_chars] + "..."
+    role = "Attempt" if getattr(message, "type", None) == "ai" else "Feedback"
+    return f"- {role}: {text}"
+
+
+def compact(messages, new=()):
+    """
+    Updates that compact the conversation, if it is over the threshold.
+
+    Args:
+        messages (list): The messages in the state (with ids)
+        new (list): Messages the node is about to append
+
+    Returns:
+        list: A summary message and RemoveMessages, to return before the new
+            messages; empty when no compaction is needed
+    """
+    if estimate_tokens(list(messages) + list(new)) <= compact_tokens:
+        return []
+    rest = messages[1:]
+    summary = next((m for m in rest if getattr(m, "name", None) == summary_name), None)
+    compacted = [m for m in rest[:max(len(rest) - keep_last, 0)] if m is not summary]
+    if not compacted:
+        return []
+
+    lines = summary.content.split("\n")[1:] if summary else []
+    lines += [_summary_line(m) for m in compacted]
+    print(f"---COMPACTING {len(compacted)} MESSAGES INTO THE SUMMARY---")
+
+    if summary is None:
+        # Reuse the first compacted message's id so the summary keeps its position
+        summary_id, removed = compacted[0].id, compacted[1:]
+    else:
+        summary_id, removed = summary.id, compacted
+    updated = HumanMessage(content="\n".join([summary_header] + lines), id=summary_id, name=summary_name)
+    return [updated] + [RemoveMessage(id=m.id) for m in removed]
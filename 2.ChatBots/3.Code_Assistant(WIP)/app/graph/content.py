@@ -1,16 +1,125 @@
-from bs4 import BeautifulSoup as Soup
-from langchain_community.document_loaders.recursive_url_loader import RecursiveUrlLoader
+import asyncio
+import os
+import threading
+import time
+
+from chains.crawler import acrawl
+from chains.snapshot import mark_checked, merge_crawl, open_snapshot, read_current, write_snapshot
 
 # LCEL docs
 url = "https://python.langchain.com/v0.2/docs/concepts/#langchain-expression-language-lcel"
-loader = RecursiveUrlLoader(
-    url=url, max_depth=20, extractor=lambda x: Soup(x, "html.parser").text
-)
-docs = loader.load()
-
-# Sort the list based on the URLs and get the text
-d_sorted = sorted(docs, key=lambda x: x.metadata["source"])
-d_reversed = list(reversed(d_sorted))
-concatenated_content = "\n\n\n --- \n\n\n".join(
-    [doc.page_content for doc in d_reversed]
-)
\ No newline at end of file
+# Pages under this prefix are crawled
+prefix = "https://python.langchain.com/v0.2/docs/"
+max_depth = 20
+
+### Doc snapshot
+#
+# The crawl lives in a versioned snapshot on disk (chains.snapshot) instead of
+# being re-downloaded on every start: the app reads the snapshot, and a
+# background thread re-checks the docs once they are older than
+# DOC_SNAPSHOT_MAX_AGE_HOURS, downloading only pages whose ETag changed.
+#
+#   python -m graph.content     crawl now (first crawl or forced refresh)
+#
+# The doc index (chains.doc_index) is built from the snapshot and rebuilt,
+# locally, whenever the snapshot version changes.
+
+snapshot_dir = os.environ.get("DOC_SNAPSHOT_DIR", "./.doc_snapshot")
+max_age = 3600 * float(os.environ.get("DOC_SNAPSHOT_MAX_AGE_HOURS", 24))
+crawl_concurrency = int(os.environ.get("DOC_CRAWL_CONCURRENCY", 8))
+
+_refresh_lock = threading.Lock()
+
+
+def refresh_snapshot():
+    """
+    Crawl the docs, conditionally against the current snapshot, and save a new version if anything changed.
+
+    Returns:
+        bool: Whether the docs changed
+    """
+    with _refresh_lock:
+        snapshot = open_snapshot(snapshot_dir)
+        previous = snapshot.pages if snapshot is not None else {}
+        started = time.perf_counter()
+        results = asyncio.run(
+            acrawl(url, prefix, previous, max_depth=max_depth, concurrency=crawl_concurrency)
+        )
+        if not any(r.error is None for r in results.values()):
+            raise RuntimeError(f"Crawling {url} failed, keeping the current snapshot")
+
+        pages, changed = merge_crawl(snapshot, results)
+        fetched = sum(r.text is not None for r in results.values())
+        print(
+            f"---CRAWLED {len(results)} PAGES IN {time.perf_counter() - started:.1f}s: "
+            f"{fetched} DOWNLOADED, {len(results) - fetched} UNCHANGED OR FAILED---"
+        )
+        if changed:
+            write_snapshot(snapshot_dir, (snapshot.version if snapshot else 0) + 1, pages)
+        else:
+            mark_checked(snapshot_dir)
+        return changed
+
+
+def snapshot_age():
+    """Seconds since the docs were last checked, None when they never were."""
+    current = read_current(snapshot_dir)
+    return time.time() - current["checked_at"] if current else None
+
+
+def load_docs():
+    """
+    The LCEL docs, one Document per page, from the snapshot.
+
+    Crawls only when there is no snapshot yet; refreshing is left to the background thread.
+    """
+    if open_snapshot(snapshot_dir) is None:
+        print("---NO DOC SNAPSHOT, CRAWLING NOW---")
+        refresh_snapshot()
+    return open_snapshot(snapshot_dir).documents()
+
+
+def start_background_refresh(check_every=600):
+    """
+    Keep the snapshot and the doc index fresh from a daemon thread.
+
+    Args:
+        check_every (float): Seconds between age checks
+
+    Returns:
+        threading.Thread: The started thread
+    """
+    from chains.doc_index import reload_doc_index
+
+    def run():
+        while True:
+            age = snapshot_age()
+            if age is not None and age >= max_age:
+                try:
+                    if refresh_snapshot():
+                        reload_doc_index()
+                except Exception as e:
+                    print(f"---DOC SNAPSHOT REFRESH FAILED: {e}---")
+            time.sleep(check_every)
+
+    thread = threading.Thread(target=run, name="doc-snapshot-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+def __getattr__(name):
+    # The whole crawl used to be joined at import; prompts now get retrieved
+    # sections (chains.doc_index). Still available, built from the index.
+    if name == "concatenated_content":
+        from chains.doc_index import get_doc_index, separator
+
+        index = get_doc_index()
+        # Pages in reverse URL order, as the crawl was joined; chunks in reading order
+        chunks = sorted(index.chunks.values(), key=lambda c: c["position"])
+        chunks = sorted(chunks, key=lambda c: c["source"], reverse=True)
+        return separator.join(c["text"] for c in chunks)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    refresh_snapshot()
@@ -1,3 +1,5 @@
+import os
+
 from langchain_core.pydantic_v1 import BaseModel, Field
 
 from langgraph.graph import END, StateGraph, START
@@ -5,27 +7,48 @@ from langgraph.graph import END, StateGraph, START
 from graph.conditional_edges import decide_to_finish
 from graph.state import GraphState
 
-from graph.nodes import generate,code_check,reflect
+from graph.nodes import generate,code_check,reflect,generate_candidates
+
+# "parallel": every round generates BEST_OF_N candidates concurrently and checks
+#             them in the sandbox pool as they arrive; the first to pass wins
+# "serial": one solution per round, generate -> check_code -> (reflect) -> retry
+mode = os.environ.get("CODE_GEN_MODE", "parallel")
+
 workflow = StateGraph(GraphState)
 
-# Define the nodes
-workflow.add_node("generate", generate)  # generation solution
-workflow.add_node("check_code", code_check)  # check code
-workflow.add_node("reflect", reflect)  # reflect
-
-# Build graph
-workflow.add_edge(START, "generate")
-workflow.add_edge("generate", "check_code")
-workflow.add_conditional_edges(
-    "check_code",
-    decide_to_finish,
-    {
-        "end": END,
-        "reflect": "reflect",
-        "generate": "generate",
-    },
-)
-workflow.add_edge("reflect", "generate")
+if mode == "parallel":
+    workflow.add_node("generate_candidates", generate_candidates)  # generate and check N solutions
+
+    workflow.add_edge(START, "generate_candidates")
+    # All failures are fed back in one message, so there is no separate reflect step
+    workflow.add_conditional_edges(
+        "generate_candidates",
+        decide_to_finish,
+        {
+            "end": END,
+            "reflect": "generate_candidates",
+            "generate": "generate_candidates",
+        },
+    )
+else:
+    # Define the nodes
+    workflow.add_node("generate", generate)  # generation solution
+    workflow.add_node("check_code", code_check)  # check code
+    workflow.add_node("reflect", reflect)  # reflect
+
+    # Build graph
+    workflow.add_edge(START, "generate")
+    workflow.add_edge("generate", "check_code")
+    workflow.add_conditional_edges(
+        "check_code",
+        decide_to_finish,
+        {
+            "end": END,
+            "reflect": "reflect",
+            "generate": "generate",
+        },
+    )
+    workflow.add_edge("reflect", "generate")
 app = workflow.compile()
 
 
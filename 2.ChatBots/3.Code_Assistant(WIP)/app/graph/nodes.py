@@ -1,9 +1,35 @@
 from graph.state import GraphState
 from chains.code_gen import code_gen_chain_final
-from graph.content import concatenated_content
+from chains.doc_index import retrieve_context
+from chains.best_of_n import best_of_n, consolidated_feedback, n_candidates
+from shared.concurrency import run_sync
+from chains.sandbox import get_pool
+from graph.compaction import compact, message_text
 ### Nodes
 
 
+def append(state: GraphState, *new):
+    """
+    The messages update for a node: its new messages, after compacting the conversation if it got too long.
+    """
+    return compact(state["messages"], new) + list(new)
+
+
+def documentation(state: GraphState):
+    """
+    Documentation sections relevant to the question and, after a failed check, to its error.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        str: Context for the code generation prompt
+    """
+    question = message_text(state["messages"][0])
+    error = state.get("error_message") if state.get("error") == "yes" else None
+    return retrieve_context(question, error)
+
+
 def generate(state: GraphState):
     """
     Generate a code solution
@@ -20,11 +46,12 @@ def generate(state: GraphState):
     # State
     messages = state["messages"]
     iterations = state["iterations"]
-    error = state["error"]
+    error = state.get("error")
 
     # We have been routed back to generation with an error
+    new = []
     if error == "yes":
-        messages += [
+        new += [
             (
                 "user",
                 "Now, try again. Invoke the code tool to structure the output with a prefix, imports, and code block:",
@@ -33,9 +60,9 @@ def generate(state: GraphState):
 
     # Solution
     code_solution = code_gen_chain_final.invoke(
-        {"context": concatenated_content, "messages": messages}
+        {"context": documentation(state), "messages": messages + new}
     )
-    messages += [
+    new += [
         (
             "assistant",
             f"{code_solution.prefix} \n Imports: {code_solution.imports} \n Code: {code_solution.code}",
@@ -44,7 +71,7 @@ def generate(state: GraphState):
 
     # Increment
     iterations = iterations + 1
-    return {"generation": code_solution, "messages": messages, "iterations": iterations}
+    return {"generation": code_solution, "messages": append(state, *new), "iterations": iterations}
 
 
 def code_check(state: GraphState):
@@ -61,7 +88,6 @@ def code_check(state: GraphState):
     print("---CHECKING CODE---")
 
     # State
-    messages = state["messages"]
     code_solution = state["generation"]
     iterations = state["iterations"]
 
@@ -69,39 +95,35 @@ def code_check(state: GraphState):
     imports = code_solution.imports
     code = code_solution.code
 
-    # Check imports
-    try:
-        exec(imports)
-    except Exception as e:
+    # Check imports, then imports and code, in a sandbox worker
+    result = get_pool().check(imports, code)
+
+    if result.stage == "imports":
         print("---CODE IMPORT CHECK: FAILED---")
-        error_message = [("user", f"Your solution failed the import test: {e}")]
-        messages += error_message
+        error_message = ("user", f"Your solution failed the import test: {result.error}")
         return {
             "generation": code_solution,
-            "messages": messages,
+            "messages": append(state, error_message),
             "iterations": iterations,
             "error": "yes",
+            "error_message": result.error,
         }
 
-    # Check execution
-    try:
-        exec(imports + "\n" + code)
-    except Exception as e:
+    if result.stage == "code":
         print("---CODE BLOCK CHECK: FAILED---")
-        error_message = [("user", f"Your solution failed the code execution test: {e}")]
-        messages += error_message
+        error_message = ("user", f"Your solution failed the code execution test: {result.error}")
         return {
             "generation": code_solution,
-            "messages": messages,
+            "messages": append(state, error_message),
             "iterations": iterations,
             "error": "yes",
+            "error_message": result.error,
         }
 
     # No errors
     print("---NO CODE TEST FAILURES---")
     return {
         "generation": code_solution,
-        "messages": messages,
         "iterations": iterations,
         "error": "no",
     }
@@ -129,8 +151,47 @@ def reflect(state: GraphState):
 
     # Add reflection
     reflections = code_gen_chain_final.invoke(
-        {"context": concatenated_content, "messages": messages}
+        {"context": documentation(state), "messages": messages}
     )
-    messages += [("assistant", f"Here are reflections on the error: {reflections}")]
-    return {"generation": code_solution, "messages": messages, "iterations": iterations}
+    reflection = ("assistant", f"Here are reflections on the error: {reflections}")
+    return {"generation": code_solution, "messages": append(state, reflection), "iterations": iterations}
 
+
+def generate_candidates(state: GraphState):
+    """
+    Generate and check several code solutions in parallel (best-of-N mode)
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): The first passing solution (or the first candidate), error, and one consolidated retry message
+    """
+
+    print(f"---GENERATING {n_candidates} CODE SOLUTIONS IN PARALLEL---")
+
+    # State
+    messages = state["messages"]
+    iterations = state["iterations"]
+
+    solution, failures = run_sync(best_of_n(documentation(state), messages))
+    iterations = iterations + 1
+
+    if solution is not None:
+        print("---NO CODE TEST FAILURES---")
+        answer = (
+            "assistant",
+            f"{solution.prefix} \n Imports: {solution.imports} \n Code: {solution.code}",
+        )
+        return {"generation": solution, "messages": append(state, answer), "iterations": iterations, "error": "no"}
+
+    print("---ALL CANDIDATES FAILED---")
+    feedback = ("user", consolidated_feedback(failures))
+    generated = [f.solution for f in failures if f.solution is not None]
+    return {
+        "generation": generated[0] if generated else state.get("generation"),
+        "messages": append(state, feedback),
+        "iterations": iterations,
+        "error": "yes",
+        "error_message": "\n".join(f.error for f in failures),
+    }
@@ -1,4 +1,6 @@
-from typing import List, TypedDict
+from typing import Annotated, List, TypedDict
+
+from langgraph.graph.message import add_messages
 
 
 class GraphState(TypedDict):
@@ -7,12 +9,15 @@ class GraphState(TypedDict):
 
     Attributes:
         error : Binary flag for control flow to indicate whether test error was tripped
-        messages : With user question, error messages, reasoning
+        error_message : The exception the last failed check raised, used to retrieve documentation
+        messages : With user question, error messages, reasoning. Append-only:
+            nodes return just their new messages (see graph.compaction)
         generation : Code solution
         iterations : Number of tries
     """
 
     error: str
-    messages: List
+    error_message: str
+    messages: Annotated[List, add_messages]
     generation: str
     iterations: int
\ No newline at end of file
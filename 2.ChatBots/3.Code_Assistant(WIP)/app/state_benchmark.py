@@ -0,0 +1,127 @@
+from dotenv import load_dotenv
+import os
+load_dotenv()
+
+import argparse
+import json
+import time
+
+### State size benchmark
+#
+# Runs the Code Assistant graph offline through a long retry chain (every
+# solution fails its check) with an in-memory checkpointer, and reports per
+# step: messages in the state, serialized state size, bytes the checkpointer
+# wrote and step time. The model, the doc index and the sandbox are replaced
+# by stubs; the nodes, reducer, compaction and checkpointing are the real ones.
+#
+#   python state_benchmark.py                      # compaction on
+#   python state_benchmark.py --no-compaction      # for comparison
+#   python state_benchmark.py --iterations 20 --mode parallel --output state.json
+
+parser = argparse.ArgumentParser(description="Per-step state size and checkpoint bytes of the Code Assistant graph")
+parser.add_argument("--iterations", type=int, default=12, help="Failed attempts before the graph gives up")
+parser.add_argument("--mode", choices=["serial", "parallel"], default="serial")
+parser.add_argument("--no-compaction", action="store_true")
+parser.add_argument("--error-chars", type=int, default=4000, help="Size of each (traceback-like) error")
+parser.add_argument("--output", default=None, help="Also write the results as JSON")
+args = parser.parse_args()
+
+os.environ["CODE_GEN_MODE"] = args.mode
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+if args.no_compaction:
+    os.environ["MESSAGES_COMPACT_TOKENS"] = str(10**12)
+
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+import chains.best_of_n
+import graph.conditional_edges
+import graph.nodes
+from chains.code_gen import code
+from chains.sandbox import CheckResult
+from graph.graph import workflow
+
+
+class MeasuredSerializer(JsonPlusSerializer):
+    """Counts the bytes the checkpointer serializes."""
+
+    bytes_written = 0
+
+    def dumps_typed(self, obj):
+        kind, data = super().dumps_typed(obj)
+        self.bytes_written += len(data)
+        return kind, data
+
+
+class StubPool:
+    def check(self, imports, code, timeout=None):
+        error = "Traceback (most recent call last):\n" + "  File \"<sandbox>\", line 1\n" * (args.error_chars // 30)
+        return CheckResult(False, "code", error + "ValueError: still wrong", "", "", 0.0)
+
+    def submit(self, imports, code, timeout=None):
+        from concurrent.futures import Future
+
+        future = Future()
+        future.set_result(self.check(imports, code))
+        return future
+
+
+attempt = [0]
+
+
+def stub_solution(_):
+    attempt[0] += 1
+    return code(
+        prefix=f"Attempt {attempt[0]}: build the chain with a prompt, a model and an output parser. " * 5,
+        imports="from langchain_core.prompts import ChatPromptTemplate",
+        code="chain = ChatPromptTemplate.from_template('{topic}')\n" * 20,
+    )
+
+
+graph.conditional_edges.max_iterations = args.iterations
+graph.nodes.code_gen_chain_final = RunnableLambda(stub_solution)
+graph.nodes.retrieve_context = lambda question, error=None: "documentation"
+graph.nodes.get_pool = StubPool
+chains.best_of_n.code_gen_chain_at = lambda temperature: RunnableLambda(stub_solution)
+chains.best_of_n.get_pool = StubPool
+
+serde = MeasuredSerializer()
+app = workflow.compile(checkpointer=InMemorySaver(serde=serde))
+config = {"configurable": {"thread_id": "benchmark"}, "recursion_limit": 4 * args.iterations + 10}
+
+steps = []
+last_bytes, last_time = 0, time.perf_counter()
+for step, values in enumerate(
+    app.stream({"messages": [("user", "How do I build an LCEL chain?")], "iterations": 0}, config, stream_mode="values")
+):
+    now = time.perf_counter()
+    steps.append(
+        {
+            "step": step,
+            "messages": len(values["messages"]),
+            "state_bytes": len(JsonPlusSerializer().dumps_typed(values)[1]),
+            "checkpoint_bytes": serde.bytes_written - last_bytes,
+            "step_ms": 1000 * (now - last_time),
+        }
+    )
+    last_bytes, last_time = serde.bytes_written, now
+
+print(f"{'step':>4} {'messages':>8} {'state bytes':>12} {'checkpoint bytes':>16} {'ms':>8}")
+for s in steps:
+    print(f"{s['step']:>4} {s['messages']:>8} {s['state_bytes']:>12} {s['checkpoint_bytes']:>16} {s['step_ms']:>8.2f}")
+print(f"total checkpoint bytes: {serde.bytes_written}")
+
+if args.output:
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "mode": args.mode,
+                "compaction": not args.no_compaction,
+                "iterations": args.iterations,
+                "steps": steps,
+                "total_checkpoint_bytes": serde.bytes_written,
+            },
+            f,
+            indent=2,
+        )
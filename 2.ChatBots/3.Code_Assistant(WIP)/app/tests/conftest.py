@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Tests import the app's packages (graph, chains) the way the app does:
+#   cd "2.ChatBots/3.Code_Assistant(WIP)/app" && python -m pytest tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chains  # noqa: E402,F401  puts the shared package on sys.path
@@ -0,0 +1,56 @@
+import itertools
+import json
+
+import pytest
+
+# chains.code_gen uses the pydantic_v1 shim of langchain < 1
+pytest.importorskip("langchain_core.pydantic_v1")
+
+from shared.testing import fake_openai
+
+n_candidates = 3
+
+
+def candidate_reply():
+    calls = itertools.count()
+
+    def reply(request):
+        # Every candidate of the first round fails its check, the second round's pass
+        n = next(calls)
+        code = "raise ValueError('still wrong')" if n < n_candidates else "answer = 42"
+        arguments = json.dumps({"prefix": f"Candidate {n}", "imports": "import math", "code": code})
+        call = {"id": f"call_{n}", "type": "function", "function": {"name": "code", "arguments": arguments}}
+        return {"role": "assistant", "content": None, "tool_calls": [call]}
+
+    return reply
+
+
+@pytest.fixture(scope="module")
+def server():
+    with fake_openai(candidate_reply()) as server, pytest.MonkeyPatch.context() as patch:
+        patch.setenv("OPENAI_API_KEY", "test")
+        patch.setenv("OPENAI_API_BASE", server.url)
+        patch.setenv("OPENAI_BASE_URL", server.url)
+        patch.setenv("CODE_GEN_MODE", "parallel")
+        patch.setenv("BEST_OF_N", str(n_candidates))
+        patch.setenv("SANDBOX_WORKERS", "2")
+        yield server
+
+
+def test_retry_round_after_all_candidates_failed(server, monkeypatch):
+    import graph.graph
+    import graph.nodes
+
+    monkeypatch.setattr(graph.nodes, "retrieve_context", lambda question, error=None: "LCEL documentation")
+    result = graph.graph.app.invoke({"messages": [("user", "How do I build an LCEL chain?")], "iterations": 0})
+
+    assert result["iterations"] == 2
+    assert result["error"] == "no"
+    assert result["generation"].code == "answer = 42"
+    # The second round really generated: its candidates reached the model
+    assert n_candidates < len(server.requests) <= 2 * n_candidates
+
+    # The retry was driven by the first round's check failures, not by generation errors
+    feedback = result["messages"][-2].content
+    assert feedback.count("failed the code execution test: ValueError: still wrong") == n_candidates
+    assert "failed to produce a structured solution" not in feedback
@@ -0,0 +1,28 @@
+import pytest
+
+from chains.sandbox import SandboxPool
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    # Workers read SANDBOX_PRELOAD when they start: skip the LangChain imports
+    monkeypatch.setenv("SANDBOX_PRELOAD", "")
+    pool = SandboxPool(size=1, timeout=2)
+    yield pool
+    pool.close()
+
+
+def test_reading_stdin_fails_instead_of_blocking(pool):
+    result = pool.check("import sys", "answer = input()")
+
+    assert result.error.startswith("EOFError")
+    assert result.seconds < 1
+    assert pool.check("import sys", "sys.stdin.read()").ok
+
+
+def test_timeout_keeps_the_output_printed_before_it(pool):
+    result = pool.check("import time", "print('step 1 done')\ntime.sleep(30)")
+
+    assert result.error.startswith("TimeoutError")
+    assert result.stdout == "step 1 done\n"
+    assert pool.check("", "print('next')").stdout == "next\n"
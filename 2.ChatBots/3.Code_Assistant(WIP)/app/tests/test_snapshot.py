@@ -0,0 +1,29 @@
+import gc
+import os
+import zlib
+
+import pytest
+
+from chains.snapshot import open_snapshot, write_snapshot
+
+
+def mapped_snapshots():
+    with open("/proc/self/maps") as f:
+        return sum("snapshot-" in line for line in f)
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/maps"), reason="reads /proc/self/maps")
+def test_replaced_versions_are_unmapped_once_unused(tmp_path):
+    write_snapshot(str(tmp_path), 1, {"https://docs/a": {"blob": zlib.compress(b"first")}})
+    held = open_snapshot(str(tmp_path))
+
+    for version in range(2, 6):
+        write_snapshot(str(tmp_path), version, {"https://docs/a": {"blob": zlib.compress(b"v%d" % version)}})
+        assert open_snapshot(str(tmp_path)).text("https://docs/a") == f"v{version}"
+
+    # Still readable by whoever held it, although its file was pruned
+    assert held.text("https://docs/a") == "first"
+    assert mapped_snapshots() == 2
+    del held
+    gc.collect()
+    assert mapped_snapshots() == 1
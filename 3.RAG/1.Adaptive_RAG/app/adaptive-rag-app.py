@@ -2,7 +2,7 @@ from dotenv import load_dotenv
 import os
 load_dotenv()
 
-from graph.app_graph import app,display_graph
+from graph.app_graph import app, cached_app, display_graph
 
 from pprint import pprint
 
@@ -15,7 +15,7 @@ def print_final_generation(inputs):
     inputs = {"question": inputs}
     print("the input from user is :::::")
     print(inputs)
-    for output in app.stream(inputs):
+    for output in cached_app.stream(inputs):
         for key, value in output.items():
             # Node
             pprint(f"Node '{key}':")
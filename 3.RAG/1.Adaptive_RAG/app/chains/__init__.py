@@ -0,0 +1,2 @@
+# Puts the shared package on sys.path before any chain imports from it
+import utils  # noqa: F401
@@ -0,0 +1,41 @@
+from dotenv import load_dotenv
+import os
+load_dotenv()
+
+from langchain_core.pydantic_v1 import BaseModel, Field
+from langchain_openai import ChatOpenAI
+from langchain_core.prompts import ChatPromptTemplate
+
+### Combined Generation Grader
+# Hallucination and answer grading in a single call
+
+# Data model
+class GradeGeneration(BaseModel):
+    """Binary scores for groundedness and usefulness of a generation."""
+
+    grounded: str = Field(
+        description="Answer is grounded in / supported by the facts, 'yes' or 'no'"
+    )
+    addresses_question: str = Field(
+        description="Answer addresses / resolves the question, 'yes' or 'no'"
+    )
+
+# Prompt
+system = """You are a grader assessing an LLM generation against a set of retrieved facts and a user question. \n 
+    Give two binary scores 'yes' or 'no'. \n
+    grounded: 'yes' means that the answer is grounded in / supported by the set of facts. \n
+    addresses_question: 'yes' means that the answer resolves the question."""
+generation_grade_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", system),
+        (
+            "human",
+            "Set of facts: \n\n {documents} \n\n User question: \n\n {question} \n\n LLM generation: {generation}",
+        ),
+    ]
+)
+
+llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+structured_llm_generation_grader = llm.with_structured_output(GradeGeneration)
+
+generation_grader_chain = generation_grade_prompt | structured_llm_generation_grader
@@ -31,4 +31,11 @@ route_prompt = ChatPromptTemplate.from_messages(
 structured_llm_router = llm.with_structured_output(RouteQuery)
 
 # Goes to web_search
-question_router_chain = route_prompt | structured_llm_router
\ No newline at end of file
+question_router_chain = route_prompt | structured_llm_router
+
+# Memo table and local classifier in front of the LLM router
+from langchain_openai import OpenAIEmbeddings
+from shared.embedding_cache import CachedEmbeddings
+from utils.router import QuestionRouter
+
+question_router = QuestionRouter(CachedEmbeddings(OpenAIEmbeddings()), question_router_chain)
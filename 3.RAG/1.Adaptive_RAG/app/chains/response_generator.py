@@ -12,7 +12,7 @@ from langchain_core.output_parsers import StrOutputParser
 prompt = hub.pull("rlm/rag-prompt")
 
 # LLM
-llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0)
+llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0, streaming=True)
 
 # Post-processing
 def format_docs(docs):
@@ -20,5 +20,9 @@ def format_docs(docs):
 
 
 # Chain
-rag_chain = prompt | llm | StrOutputParser()
+# The tag lets streaming consumers tell answer tokens apart from grader calls
+rag_generation_tag = "rag_generation"
+rag_chain = (prompt | llm | StrOutputParser()).with_config(
+    run_name="rag_chain", tags=[rag_generation_tag]
+)
 
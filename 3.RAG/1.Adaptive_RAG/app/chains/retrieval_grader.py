@@ -1,3 +1,5 @@
+from typing import List
+
 from langchain_core.pydantic_v1 import BaseModel, Field
 from langchain_openai import ChatOpenAI
 llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
@@ -27,4 +29,36 @@ grade_prompt = ChatPromptTemplate.from_messages(
 )
 
 structured_llm_grader = llm.with_structured_output(GradeDocuments)
-retrieval_grader_chain = grade_prompt | structured_llm_grader
\ No newline at end of file
+retrieval_grader_chain = grade_prompt | structured_llm_grader
+
+### Batch Retrieval Grader
+# Grades every retrieved document in a single structured-output call
+class GradeDocumentsBatch(BaseModel):
+    """Binary relevance scores for a numbered list of retrieved documents."""
+
+    binary_scores: List[str] = Field(
+        description="One score per document, in the order given: 'yes' if the document is relevant to the question, otherwise 'no'"
+    )
+
+
+batch_system = """You are a grader assessing relevance of several retrieved documents to a user question. \n 
+    If a document contains keyword(s) or semantic meaning related to the user question, grade it as relevant. \n
+    It does not need to be a stringent test. The goal is to filter out erroneous retrievals. \n
+    Return exactly one binary score 'yes' or 'no' per document, in the same order as the documents are numbered."""
+
+batch_grade_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", batch_system),
+        ("human", "Retrieved documents: \n\n {documents} \n\n User question: {question}"),
+    ]
+)
+
+
+def format_numbered_docs(docs):
+    return "\n\n".join(
+        f"Document {i + 1}:\n{doc.page_content}" for i, doc in enumerate(docs)
+    )
+
+
+structured_llm_batch_grader = llm.with_structured_output(GradeDocumentsBatch)
+batch_retrieval_grader_chain = batch_grade_prompt | structured_llm_batch_grader
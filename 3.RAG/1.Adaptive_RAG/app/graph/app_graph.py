@@ -8,52 +8,106 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
-workflow = StateGraph(GraphState)
-
-# Define the nodes
-workflow.add_node("web_search", web_search)  # web search
-workflow.add_node("retrieve", retrieve)  # retrieve
-workflow.add_node("grade_documents", grade_documents)  # grade documents
-workflow.add_node("generate", generate)  # generatae
-workflow.add_node("transform_query", transform_query)  # transform_query
-
-# Build graph
-workflow.add_conditional_edges(
-    START,
-    route_question,
-    {
-        "web_search": "web_search",
-        "vectorstore": "retrieve",
-    },
-)
+def build_graph(
+    web_search=web_search,
+    retrieve=retrieve,
+    grade_documents=grade_documents,
+    generate=generate,
+    transform_query=transform_query,
+    compress_context=compress_context,
+    best_effort=best_effort,
+    route_question=route_question,
+    decide_to_generate=decide_to_generate,
+    grade_generation_v_documents_and_question=grade_generation_v_documents_and_question,
+):
+    workflow = StateGraph(GraphState)
 
+    # Define the nodes
+    workflow.add_node("web_search", web_search)  # web search
+    workflow.add_node("retrieve", retrieve)  # retrieve
+    workflow.add_node("grade_documents", grade_documents)  # grade documents
+    workflow.add_node("compress_context", compress_context)  # compress_context
+    workflow.add_node("generate", generate)  # generatae
+    workflow.add_node("transform_query", transform_query)  # transform_query
+    workflow.add_node("best_effort", best_effort)  # retry budget spent
 
-# Build Edges point
-workflow.add_edge("web_search", "generate")
-workflow.add_edge("retrieve", "grade_documents")   
-workflow.add_edge("transform_query", "retrieve")
+    # Build graph
+    workflow.add_conditional_edges(
+        START,
+        route_question,
+        {
+            "web_search": "web_search",
+            "vectorstore": "retrieve",
+        },
+    )
 
-workflow.add_conditional_edges(
-    "grade_documents",
-    decide_to_generate,
-    {
-        "transform_query": "transform_query",
-        "generate": "generate",
-    },
-)
 
-workflow.add_conditional_edges(
-    "generate",
-    grade_generation_v_documents_and_question,
-    {
-        "not supported": "generate",
-        "useful": END,
-        "not useful": "transform_query",
-    },
+    # Build Edges point
+    workflow.add_edge("web_search", "compress_context")
+    workflow.add_edge("compress_context", "generate")
+    workflow.add_edge("retrieve", "grade_documents")   
+    workflow.add_edge("best_effort", END)
+
+    workflow.add_conditional_edges(
+        "transform_query",
+        decide_to_retrieve,
+        {
+            "retrieve": "retrieve",
+            "web_search": "web_search",
+            "best_effort": "best_effort",
+        },
+    )
+
+    workflow.add_conditional_edges(
+        "grade_documents",
+        decide_to_generate,
+        {
+            "transform_query": "transform_query",
+            "generate": "compress_context",
+            "web_search": "web_search",
+            "best_effort": "best_effort",
+        },
+    )
+
+    workflow.add_conditional_edges(
+        "generate",
+        grade_generation_v_documents_and_question,
+        {
+            "not supported": "generate",
+            "useful": END,
+            "not useful": "transform_query",
+            "web_search": "web_search",
+            "best_effort": "best_effort",
+        },
+    )
+
+    # Compile
+    return workflow.compile()
+
+
+app = build_graph()
+
+# Same graph with async nodes and edges, for serving many requests on one event loop
+async_app = build_graph(
+    web_search=aweb_search,
+    retrieve=aretrieve,
+    grade_documents=agrade_documents,
+    generate=agenerate,
+    transform_query=atransform_query,
+    compress_context=acompress_context,
+    route_question=aroute_question,
+    grade_generation_v_documents_and_question=agrade_generation_v_documents_and_question,
 )
 
-# Compile
-app = workflow.compile()
+# Answer repeated questions from the semantic cache instead of running the graph
+from langchain_openai import OpenAIEmbeddings
+from shared.embedding_cache import CachedEmbeddings
+from utils.indexer import index_version
+from utils.semantic_cache import CachedGraph, SemanticCache
+
+semantic_cache = SemanticCache(CachedEmbeddings(OpenAIEmbeddings()), version_fn=index_version)
+cached_app = CachedGraph(app, semantic_cache)
+cached_async_app = CachedGraph(async_app, semantic_cache)
 
 
 def display_graph(graph, file_path="graph_output.png"):
@@ -2,14 +2,32 @@ from chains.question_rewriter import *
 from chains.hullucination_grader import *
 from chains.answer_grader import *
 from chains.question_router import *
+from chains.generation_grader import *
+from chains.response_generator import format_docs
+from shared.concurrency import run_sync
+from utils.loop_control import can_regenerate, can_rewrite, fallback
 from pprint import pprint
+import asyncio
+import os
+import time
+
+# Generation grading: "speculative" (hallucination and answer graders in parallel),
+# "combined" (one call returning both verdicts) or "sequential"
+generation_grading_mode = os.environ.get("GENERATION_GRADING_MODE", "speculative")
+
+# Wall-clock time saved by speculative grading compared to running the graders back to back
+speculative_stats = {"runs": 0, "answer_grades_discarded": 0, "seconds_saved": 0.0}
 
 ### Edges ###
 
 ## Here are the Edges:
 # 1) route_question
 # 2) decide_to_generate
-# 3) grade_generation_v_documents_and_question
+# 3) decide_to_retrieve
+# 4) grade_generation_v_documents_and_question
+#
+# Every retry is checked against the request's loop budget (utils.loop_control);
+# once it is spent the edges fall back to "web_search" or "best_effort".
 
 def route_question(state):
     """
@@ -24,11 +42,11 @@ def route_question(state):
 
     print("---ROUTE QUESTION---")
     question = state["question"]
-    source = question_router_chain.invoke({"question": question})
-    if source.datasource == "web_search":
+    datasource = question_router.route(question)
+    if datasource == "web_search":
         print("---ROUTE QUESTION TO WEB SEARCH---")
         return "web_search"
-    elif source.datasource == "vectorstore":
+    elif datasource == "vectorstore":
         print("---ROUTE QUESTION TO RAG---")
         return "vectorstore"
 
@@ -50,6 +68,8 @@ def decide_to_generate(state):
 
     if not filtered_documents:
         # All documents have been filtered check_relevance
+        if not can_rewrite(state):
+            return fallback(state)
         # We will re-generate a new query
         print(
             "---DECISION: ALL DOCUMENTS ARE NOT RELEVANT TO QUESTION, TRANSFORM QUERY---"
@@ -61,6 +81,116 @@ def decide_to_generate(state):
         return "generate"
 
 
+def decide_to_retrieve(state):
+    """
+    Determines whether a rewritten question is worth retrieving for.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        str: "retrieve", or a fallback when the rewrite repeats an earlier question
+    """
+
+    if state.get("duplicate_of"):
+        # Retrieval and grading would return what they returned before
+        return fallback(state, "rewrite repeats an earlier question")
+    return "retrieve"
+
+
+def decide_after_grading(state, grounded, addresses_question):
+    """
+    Map the generation grades to the next step, within the request's loop budget.
+
+    Returns:
+        str: "useful", "not supported", "not useful", "web_search" or "best_effort"
+    """
+    if grounded != "yes":
+        if not can_regenerate(state):
+            return fallback(state)
+        pprint("---DECISION: GENERATION IS NOT GROUNDED IN DOCUMENTS, RE-TRY---")
+        return "not supported"
+
+    print("---DECISION: GENERATION IS GROUNDED IN DOCUMENTS---")
+    # Check question-answering
+    print("---GRADE GENERATION vs QUESTION---")
+    if addresses_question == "yes":
+        print("---DECISION: GENERATION ADDRESSES QUESTION---")
+        return "useful"
+    print("---DECISION: GENERATION DOES NOT ADDRESS QUESTION---")
+    if not can_rewrite(state):
+        return fallback(state)
+    return "not useful"
+
+
+async def agrade_generation_speculatively(question, documents, generation):
+    """
+    Run the hallucination and answer graders in parallel.
+
+    The answer grade is cancelled (or ignored, if it already finished) when the
+    generation turns out not to be grounded.
+
+    Returns:
+        tuple: (grounded, addresses_question) as 'yes' / 'no'; addresses_question
+            is None when the generation is not grounded
+    """
+
+    async def timed(chain, inputs):
+        started = time.perf_counter()
+        result = await chain.ainvoke(inputs)
+        return result.binary_score, time.perf_counter() - started
+
+    started = time.perf_counter()
+    hallucination_task = asyncio.create_task(
+        timed(hallucination_grader_chain, {"documents": documents, "generation": generation})
+    )
+    answer_task = asyncio.create_task(
+        timed(answer_grader_chain, {"question": question, "generation": generation})
+    )
+    try:
+        grounded, hallucination_seconds = await hallucination_task
+        speculative_stats["runs"] += 1
+        if grounded != "yes":
+            speculative_stats["answer_grades_discarded"] += 1
+            return grounded, None
+
+        addresses_question, answer_seconds = await answer_task
+        # Sequentially this would have cost both calls back to back
+        saved = hallucination_seconds + answer_seconds - (time.perf_counter() - started)
+        speculative_stats["seconds_saved"] += max(saved, 0.0)
+        print(f"---SPECULATIVE GRADING SAVED {saved:.2f}s---")
+        return grounded, addresses_question
+    finally:
+        answer_task.cancel()
+        await asyncio.gather(hallucination_task, answer_task, return_exceptions=True)
+
+
+def grade_generation(question, documents, generation):
+    """
+    Grade a generation for groundedness and usefulness using the configured mode.
+
+    Returns:
+        tuple: (grounded, addresses_question) as 'yes' / 'no'; addresses_question
+            is None when it was not graded
+    """
+    if generation_grading_mode == "combined":
+        score = generation_grader_chain.invoke(
+            {"documents": documents, "question": question, "generation": generation}
+        )
+        return score.grounded, score.addresses_question
+
+    if generation_grading_mode == "speculative":
+        return run_sync(agrade_generation_speculatively(question, documents, generation))
+
+    score = hallucination_grader_chain.invoke(
+        {"documents": documents, "generation": generation}
+    )
+    if score.binary_score != "yes":
+        return score.binary_score, None
+    score = answer_grader_chain.invoke({"question": question, "generation": generation})
+    return "yes", score.binary_score
+
+
 def grade_generation_v_documents_and_question(state):
     """
     Determines whether the generation is grounded in the document and answers question.
@@ -74,27 +204,50 @@ def grade_generation_v_documents_and_question(state):
 
     print("---CHECK HALLUCINATIONS---")
     question = state["question"]
-    documents = state["documents"]
+    # The same compressed context the answer was generated from
+    documents = format_docs(state.get("context") or state["documents"])
     generation = state["generation"]
 
-    score = hallucination_grader_chain.invoke(
+    grounded, addresses_question = grade_generation(question, documents, generation)
+    return decide_after_grading(state, grounded, addresses_question)
+
+
+### Async edges
+# Same decisions as the edges above, for the async graph (graph.app_graph.async_app)
+
+async def aroute_question(state):
+    print("---ROUTE QUESTION---")
+    datasource = await question_router.aroute(state["question"])
+    if datasource == "web_search":
+        print("---ROUTE QUESTION TO WEB SEARCH---")
+    else:
+        print("---ROUTE QUESTION TO RAG---")
+    return datasource
+
+
+async def agrade_generation(question, documents, generation):
+    """Async version of grade_generation."""
+    if generation_grading_mode == "combined":
+        score = await generation_grader_chain.ainvoke(
+            {"documents": documents, "question": question, "generation": generation}
+        )
+        return score.grounded, score.addresses_question
+
+    if generation_grading_mode == "speculative":
+        return await agrade_generation_speculatively(question, documents, generation)
+
+    score = await hallucination_grader_chain.ainvoke(
         {"documents": documents, "generation": generation}
     )
-    grade = score.binary_score
-
-    # Check hallucination
-    if grade == "yes":
-        print("---DECISION: GENERATION IS GROUNDED IN DOCUMENTS---")
-        # Check question-answering
-        print("---GRADE GENERATION vs QUESTION---")
-        score = answer_grader_chain.invoke({"question": question, "generation": generation})
-        grade = score.binary_score
-        if grade == "yes":
-            print("---DECISION: GENERATION ADDRESSES QUESTION---")
-            return "useful"
-        else:
-            print("---DECISION: GENERATION DOES NOT ADDRESS QUESTION---")
-            return "not useful"
-    else:
-        pprint("---DECISION: GENERATION IS NOT GROUNDED IN DOCUMENTS, RE-TRY---")
-        return "not supported"
\ No newline at end of file
+    if score.binary_score != "yes":
+        return score.binary_score, None
+    score = await answer_grader_chain.ainvoke({"question": question, "generation": generation})
+    return "yes", score.binary_score
+
+
+async def agrade_generation_v_documents_and_question(state):
+    print("---CHECK HALLUCINATIONS---")
+    grounded, addresses_question = await agrade_generation(
+        state["question"], format_docs(state.get("context") or state["documents"]), state["generation"]
+    )
+    return decide_after_grading(state, grounded, addresses_question)
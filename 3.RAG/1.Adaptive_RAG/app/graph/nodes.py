@@ -1,19 +1,36 @@
 import os
+import asyncio
 from dotenv import load_dotenv
 load_dotenv()
 
-from langchain_community.tools.tavily_search import TavilySearchResults
+from utils.web_search import WebSearch, TavilyBackend, max_queries
 
-web_search_tool = TavilySearchResults(k=3)
+# Cached, coalescing search; swap the backend (e.g. utils.web_search.FakeBackend) to run offline
+web_search_tool = WebSearch(TavilyBackend())
+
+# Document grading: "concurrent" (one call per document, in parallel),
+# "batch" (one call for all documents) or "serial" (one call at a time)
+grading_mode = os.environ.get("GRADING_MODE", "concurrent")
+grading_max_concurrency = int(os.environ.get("GRADING_MAX_CONCURRENCY", 4))
+# Stop grading once this many relevant documents are found (0 grades everything)
+grading_enough_relevant = int(os.environ.get("GRADING_ENOUGH_RELEVANT", 0))
 
 from langchain.schema import Document
-from utils.indexer import build_retriever
+from utils.indexer import get_vectorstore, retrieve_with_scores, aretrieve_with_scores
+from utils.loop_control import begin, count, add_tokens, cached, remember, find_duplicate, exhausted
+from utils.prefilter import prefilter, llm_calls_avoided
+from shared.concurrency import run_sync
+from utils.compression import ContextCompressor
+from shared.embedding_cache import CachedEmbeddings
+from langchain_openai import OpenAIEmbeddings
 from chains.question_rewriter import *
 from chains.retrieval_grader import *
 from chains.hullucination_grader import *
 from chains.answer_grader import *
 from chains.response_generator import *
 
+context_compressor = ContextCompressor(CachedEmbeddings(OpenAIEmbeddings()))
+
 def retrieve(state):
     """
     Retrieve documents
@@ -26,10 +43,16 @@ def retrieve(state):
     """
     print("---RETRIEVE---")
     question = state["question"]
-    retriever=build_retriever()
-
-    # Retrieval
-    documents = retriever.invoke(question)
+    count(state, "retrieve")
+
+    # Retrieval, keeping the similarity scores for the grading pre-filter.
+    # A question already retrieved for in this request reuses its results.
+    documents = cached(state, "retrieval_cache", question)
+    if documents is None:
+        documents = retrieve_with_scores(question)
+        remember(state, "retrieval_cache", question, documents)
+    else:
+        print("---RETRIEVE: REUSING RESULTS FOR THIS QUESTION---")
     # Update the state with retrieved documents while retaining other existing state keys
     state["documents"] = documents
     return state
@@ -47,43 +70,189 @@ def generate(state):
     """
     print("---GENERATE---")
     question = state["question"]
-    documents = state["documents"]
+    context = format_docs(state.get("context") or state["documents"])
+    count(state, "generate")
 
     # RAG generation
-    generation = rag_chain.invoke({"context": documents, "question": question})
+    generation = rag_chain.invoke({"context": context, "question": question})
+    add_tokens(state, question, generation, context)
 
     # Update the state with the new generation while retaining other existing state keys
     state["generation"] = generation
     return state
 
 
-def grade_documents(state):
+async def agrade_documents_concurrently(question, documents, max_concurrency, enough_relevant=None):
     """
-    Determines whether the retrieved documents are relevant to the question.
+    Grade documents in parallel, one LLM call per document.
 
     Args:
-        state (dict): The current graph state
+        question (str): The user question
+        documents (list): Retrieved documents
+        max_concurrency (int): Maximum grading calls in flight
+        enough_relevant (int): Stop once this many relevant documents are found; 0 or None grades all
 
     Returns:
-        state (dict): Updated state with only filtered relevant documents
+        list: Relevant documents, in retrieval order
     """
-    print("---CHECK DOCUMENT RELEVANCE TO QUESTION---")
-    question = state["question"]
-    documents = state["documents"]
-    
-    # Score each document
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def grade(i, d):
+        async with semaphore:
+            score = await retrieval_grader_chain.ainvoke(
+                {"question": question, "document": d.page_content}
+            )
+        return i, score.binary_score
+
+    tasks = [asyncio.create_task(grade(i, d)) for i, d in enumerate(documents)]
+    relevant = set()
+    try:
+        for next_graded in asyncio.as_completed(tasks):
+            i, grade = await next_graded
+            if grade == "yes":
+                print("---GRADE: DOCUMENT RELEVANT---")
+                relevant.add(i)
+                if enough_relevant and len(relevant) >= enough_relevant:
+                    print("---GRADE: ENOUGH RELEVANT DOCUMENTS, SKIPPING THE REST---")
+                    break
+            else:
+                print("---GRADE: DOCUMENT NOT RELEVANT---")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return [d for i, d in enumerate(documents) if i in relevant]
+
+
+async def agrade_documents_in_one_call(question, documents):
+    """
+    Grade all documents with a single structured-output LLM call.
+
+    Args:
+        question (str): The user question
+        documents (list): Retrieved documents
+
+    Returns:
+        list: Relevant documents, in retrieval order
+    """
+    score = await batch_retrieval_grader_chain.ainvoke(
+        {"question": question, "documents": format_numbered_docs(documents)}
+    )
+    scores = score.binary_scores
+
+    if len(scores) != len(documents):
+        print("---GRADE: BATCH GRADER RETURNED THE WRONG NUMBER OF SCORES, GRADING PER DOCUMENT---")
+        return await agrade_documents_concurrently(question, documents, grading_max_concurrency)
+
     filtered_docs = []
-    for d in documents:
-        score = retrieval_grader_chain.invoke(
+    for d, grade in zip(documents, scores):
+        if grade == "yes":
+            print("---GRADE: DOCUMENT RELEVANT---")
+            filtered_docs.append(d)
+        else:
+            print("---GRADE: DOCUMENT NOT RELEVANT---")
+    return filtered_docs
+
+
+async def agrade_candidates(question, candidates, enough_relevant):
+    """
+    Grade the documents the pre-filter could not decide, using the configured grading mode.
+
+    Returns:
+        list: Relevant documents, in retrieval order
+    """
+    if grading_mode == "batch":
+        return await agrade_documents_in_one_call(question, candidates)
+    if grading_mode == "concurrent":
+        return await agrade_documents_concurrently(
+            question, candidates, grading_max_concurrency, enough_relevant
+        )
+
+    # Score each document
+    graded = []
+    for d in candidates:
+        score = await retrieval_grader_chain.ainvoke(
             {"question": question, "document": d.page_content}
         )
         grade = score.binary_score
         if grade == "yes":
             print("---GRADE: DOCUMENT RELEVANT---")
-            filtered_docs.append(d)
+            graded.append(d)
         else:
             print("---GRADE: DOCUMENT NOT RELEVANT---")
             continue
+    return graded
+
+
+def prefilter_documents(question, documents):
+    """
+    Decide the clear-cut documents locally, leaving only the ambiguous ones for the LLM.
+
+    Returns:
+        tuple: (verdicts, candidates, enough_relevant). verdicts maps positions of
+            locally decided documents to True/False; candidates is empty when no
+            LLM grading is needed.
+    """
+    verdicts, ambiguous = prefilter(question, documents)
+    candidates = [documents[i] for i in ambiguous]
+    enough_relevant = grading_enough_relevant
+    if enough_relevant:
+        enough_relevant = max(enough_relevant - sum(verdicts.values()), 0)
+        if not enough_relevant:
+            candidates = []
+    return verdicts, candidates, enough_relevant
+
+
+def merge_graded(documents, verdicts, graded):
+    graded_ids = {id(d) for d in graded}
+    filtered_docs = [
+        d for i, d in enumerate(documents) if verdicts.get(i) or id(d) in graded_ids
+    ]
+    print(f"---PREFILTER: {llm_calls_avoided()} LLM GRADING CALLS AVOIDED SO FAR---")
+    return filtered_docs
+
+
+def compress_context(state):
+    """
+    Compress the graded documents down to the sentences relevant to the question.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): New key added to state, context, used by generate and the hallucination grader
+    """
+    print("---COMPRESS CONTEXT---")
+    state["context"] = context_compressor.compress(state["question"], state["documents"])
+    return state
+
+
+def grade_documents(state):
+    """
+    Determines whether the retrieved documents are relevant to the question.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Updated state with only filtered relevant documents
+    """
+    print("---CHECK DOCUMENT RELEVANCE TO QUESTION---")
+    question = state["question"]
+    documents = state["documents"]
+
+    filtered_docs = cached(state, "grading_cache", question)
+    if filtered_docs is not None:
+        print("---GRADE: REUSING GRADES FOR THIS QUESTION---")
+    else:
+        verdicts, candidates, enough_relevant = prefilter_documents(question, documents)
+        graded = []
+        if candidates:
+            add_tokens(state, *(question + d.page_content for d in candidates))
+            graded = run_sync(agrade_candidates(question, candidates, enough_relevant))
+        filtered_docs = merge_graded(documents, verdicts, graded)
+        remember(state, "grading_cache", question, filtered_docs)
 
     # Update the state with filtered documents while retaining other existing state keys
     state["documents"] = filtered_docs
@@ -102,15 +271,36 @@ def transform_query(state):
 
     print("---TRANSFORM QUERY---")
     question = state["question"]
+    count(state, "transform_query")
 
     # Re-write the question
     better_question = question_rewriter_chain.invoke({"question": question})
+    add_tokens(state, question, better_question)
+    state["duplicate_of"] = check_rewrite(state, question, better_question)
 
     # Update the state with the rephrased question while retaining other existing state keys
     state["question"] = better_question
     return state
 
 
+def check_rewrite(state, question, better_question):
+    """
+    Compare a rewritten question with the questions already tried in this request.
+
+    The embeddings are cached, so retrieving for the rewrite afterwards does not embed it again.
+
+    Returns:
+        str: The earlier question the rewrite duplicates, or None
+    """
+    embed = get_vectorstore().embeddings.embed_query
+    if not begin(state)["seen_questions"]:
+        find_duplicate(state, question, embed(question))
+    duplicate = find_duplicate(state, better_question, embed(better_question))
+    if duplicate is not None:
+        print(f"---TRANSFORM QUERY: REWRITE DUPLICATES '{duplicate}'---")
+    return duplicate
+
+
 
 def web_search(state):
     """
@@ -124,19 +314,130 @@ def web_search(state):
     """
 
     print("---WEB SEARCH---")
-    question = state["question"]
+    count(state, "web_search")
 
-    # Web search
-    docs = web_search_tool.invoke({"query": question})
-    web_results = "\n".join([d["content"] for d in docs])
-    web_results_doc = Document(page_content=web_results)
+    # Web search, one document per result
+    web_results_docs = web_search_tool.search(search_queries(state))
 
     # Initialize documents if not already done
     if "documents" not in state or state["documents"] is None:
         state["documents"] = []
 
     # Append web results to existing documents
-    state["documents"].append(web_results_doc)
+    state["documents"].extend(web_results_docs)
+
+    return state
+
+
+def search_queries(state):
+    """
+    The question plus, when fan-out is enabled, the earlier phrasings tried in this request.
+
+    Returns:
+        list: Up to max_queries distinct queries, the current question first
+    """
+    queries = [state["question"]] + [q for q, _ in state.get("seen_questions", [])]
+    return list(dict.fromkeys(queries))[:max_queries]
+
+
+def best_effort(state):
+    """
+    Finish with the last generation once the retry budget is spent.
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Updated state, with best_effort set so the answer is not cached
+    """
+    print(f"---BEST-EFFORT ANSWER ({exhausted(state) or 'retry limit reached'})---")
+    state["best_effort"] = True
+    return state
+
+
+### Async nodes
+# Same behaviour as the nodes above, for the async graph (graph.app_graph.async_app)
+
+async def aretrieve(state):
+    print("---RETRIEVE---")
+    question = state["question"]
+    count(state, "retrieve")
+
+    # Retrieval, keeping the similarity scores for the grading pre-filter
+    documents = cached(state, "retrieval_cache", question)
+    if documents is None:
+        documents = await aretrieve_with_scores(question)
+        remember(state, "retrieval_cache", question, documents)
+    else:
+        print("---RETRIEVE: REUSING RESULTS FOR THIS QUESTION---")
+    state["documents"] = documents
+    return state
+
 
+async def agenerate(state):
+    print("---GENERATE---")
+    question = state["question"]
+    context = format_docs(state.get("context") or state["documents"])
+    count(state, "generate")
+
+    # RAG generation
+    generation = await rag_chain.ainvoke({"context": context, "question": question})
+    add_tokens(state, question, generation, context)
+    state["generation"] = generation
+    return state
+
+
+async def acompress_context(state):
+    print("---COMPRESS CONTEXT---")
+    state["context"] = await asyncio.to_thread(
+        context_compressor.compress, state["question"], state["documents"]
+    )
+    return state
+
+
+async def agrade_documents(state):
+    print("---CHECK DOCUMENT RELEVANCE TO QUESTION---")
+    question = state["question"]
+    documents = state["documents"]
+
+    filtered_docs = cached(state, "grading_cache", question)
+    if filtered_docs is not None:
+        print("---GRADE: REUSING GRADES FOR THIS QUESTION---")
+    else:
+        verdicts, candidates, enough_relevant = prefilter_documents(question, documents)
+        graded = []
+        if candidates:
+            add_tokens(state, *(question + d.page_content for d in candidates))
+            graded = await agrade_candidates(question, candidates, enough_relevant)
+        filtered_docs = merge_graded(documents, verdicts, graded)
+        remember(state, "grading_cache", question, filtered_docs)
+
+    state["documents"] = filtered_docs
     return state
 
+
+async def atransform_query(state):
+    print("---TRANSFORM QUERY---")
+    question = state["question"]
+
+    count(state, "transform_query")
+
+    # Re-write the question
+    better_question = await question_rewriter_chain.ainvoke({"question": question})
+    add_tokens(state, question, better_question)
+    state["duplicate_of"] = await asyncio.to_thread(check_rewrite, state, question, better_question)
+    state["question"] = better_question
+    return state
+
+
+async def aweb_search(state):
+    print("---WEB SEARCH---")
+    count(state, "web_search")
+
+    # Web search, one document per result
+    web_results_docs = await web_search_tool.asearch(search_queries(state))
+
+    if "documents" not in state or state["documents"] is None:
+        state["documents"] = []
+    state["documents"].extend(web_results_docs)
+    return state
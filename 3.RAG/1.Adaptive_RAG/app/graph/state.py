@@ -1,5 +1,6 @@
-from typing import List
+from typing import Dict, List, Optional
 
+from langchain_core.documents import Document
 from typing_extensions import TypedDict
 
 class GraphState(TypedDict):
@@ -10,8 +11,26 @@ class GraphState(TypedDict):
         question: question
         generation: LLM generation
         documents: list of documents
+        context: documents compressed for generation and the hallucination grader
+        attempts: how many times each node has run for this request
+        started_at: when the request started (time.time())
+        tokens_used: estimated LLM tokens spent on this request
+        retrieval_cache: retrieved documents per normalized question
+        grading_cache: relevant documents per normalized question
+        seen_questions: (question, embedding) for every question tried
+        duplicate_of: earlier question the last rewrite repeats, if any
+        best_effort: the answer was returned because the retry budget ran out
     """
 
     question: str
     generation: str
     documents: List[str]
+    context: List[Document]
+    attempts: Dict[str, int]
+    started_at: float
+    tokens_used: int
+    retrieval_cache: Dict[str, List]
+    grading_cache: Dict[str, List]
+    seen_questions: List
+    duplicate_of: Optional[str]
+    best_effort: bool
@@ -0,0 +1,100 @@
+import asyncio
+
+from graph.app_graph import app, cached_app
+from chains.response_generator import rag_generation_tag
+from shared.concurrency import run_sync
+
+### Token streaming
+#
+# Turns app.astream_events into a small stream of UI events:
+#   {"type": "node", "name": ...}                      a node started
+#   {"type": "token", "text": ..., "provisional": True} an answer token from `generate`
+#   {"type": "retract", "reason": ...}                 the graders rejected the answer streamed so far
+#   {"type": "final", "text": ..., "cached": bool}     the accepted answer
+#
+# Tokens are provisional because the hallucination / answer graders only run
+# after `generate` finishes. If the next node to start is `generate` again
+# (not grounded) or `transform_query` (does not answer the question), the
+# tokens shown so far are retracted and new ones follow. `best_effort` keeps
+# them: the retry budget ran out and the last answer is returned as is.
+
+node_names = {"web_search", "retrieve", "grade_documents", "compress_context", "generate", "transform_query", "best_effort"}
+
+retract_reasons = {
+    "generate": "answer not grounded in the documents, regenerating",
+    "transform_query": "answer does not address the question, rewriting the question",
+    "web_search": "answer rejected, searching the web instead",
+}
+
+
+async def astream_answer(question):
+    """
+    Stream answer tokens for a question as soon as the model produces them.
+
+    Args:
+        question (str): The user question
+
+    Yields:
+        dict: UI events, see the module comment
+    """
+    # The cache embeds the question (a blocking HTTP call): keep it off the event loop
+    cached = await asyncio.to_thread(cached_app.cache.lookup, question)
+    if cached is not None:
+        yield {"type": "final", "text": cached["generation"], "cached": True}
+        return
+
+    streamed = False
+    final_state = None
+    best_effort = False
+    async for event in app.astream_events({"question": question}, version="v2"):
+        kind = event["event"]
+        name = event["name"]
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind == "on_chain_start" and name == node and name in node_names:
+            if name == "best_effort":
+                best_effort = True
+            elif streamed:
+                yield {"type": "retract", "reason": retract_reasons.get(name, name)}
+                streamed = False
+            yield {"type": "node", "name": name}
+
+        elif kind == "on_chat_model_stream" and rag_generation_tag in event.get("tags", []):
+            text = event["data"]["chunk"].content
+            if text:
+                streamed = True
+                yield {"type": "token", "text": text, "provisional": True}
+
+        elif kind == "on_chain_end" and name == "generate" and node == "generate":
+            output = event["data"].get("output")
+            if isinstance(output, dict) and "generation" in output:
+                final_state = output
+
+    if final_state is not None:
+        if not best_effort:
+            await asyncio.to_thread(
+                cached_app.cache.store, question, final_state["generation"], final_state.get("documents", [])
+            )
+        yield {"type": "final", "text": final_state["generation"], "cached": False}
+
+
+def stream_answer(question):
+    """Synchronous version of astream_answer, for callers without an event loop (Streamlit)."""
+    # Every step runs on the process-wide loop, which the async model clients'
+    # connections are tied to; a loop per call would break the next request
+    events = astream_answer(question)
+
+    async def next_event():
+        return await events.__anext__()
+
+    async def close():
+        await events.aclose()
+
+    try:
+        while True:
+            try:
+                yield run_sync(next_event())
+            except StopAsyncIteration:
+                break
+    finally:
+        run_sync(close())
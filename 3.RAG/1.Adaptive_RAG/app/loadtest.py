@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+### Load test for server.py
+#
+# Sends questions to POST /ask at increasing concurrency and reports throughput
+# and latency percentiles per level:
+#   python loadtest.py --url http://localhost:8000 --levels 1 2 4 8 16 32
+#
+# The questions repeat, so past the first few requests the server answers most
+# of them from its semantic cache; the hit / miss counts show how many did.
+# --no-cache asks the server to skip the cache and measures the graph itself.
+
+default_questions = [
+    "What are the types of agent memory?",
+    "How does task decomposition work for LLM agents?",
+    "What is chain of thought prompting?",
+    "What is few-shot prompting?",
+    "What are adversarial attacks on LLMs?",
+    "How do jailbreak prompts work?",
+    "Who won the last FIFA world cup?",
+    "What is the weather like in Paris today?",
+]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (k - lower)
+
+
+async def run_level(client, url, questions, concurrency, requests_per_level, use_cache=True):
+    latencies, errors, hits = [], 0, 0
+    queue = asyncio.Queue()
+    for i in range(requests_per_level):
+        queue.put_nowait(questions[i % len(questions)])
+
+    async def worker():
+        nonlocal errors, hits
+        while True:
+            try:
+                question = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"{url}/ask", json={"question": question, "cache": use_cache})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+                hits += bool(response.json().get("cached"))
+            except httpx.HTTPError as e:
+                errors += 1
+                print(f"  error: {e!r}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests_per_level,
+        "errors": errors,
+        "cache_hits": hits,
+        "cache_misses": len(latencies) - hits,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(1000 * percentile(latencies, 50), 1),
+        "p95_ms": round(1000 * percentile(latencies, 95), 1),
+        "p99_ms": round(1000 * percentile(latencies, 99), 1),
+    }
+
+
+async def main(args):
+    questions = list(default_questions)
+    if args.questions:
+        with open(args.questions) as f:
+            questions = [line.strip() for line in f if line.strip()]
+    if args.shuffle:
+        random.shuffle(questions)
+
+    limits = httpx.Limits(max_connections=max(args.levels), max_keepalive_connections=max(args.levels))
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        (await client.get(f"{args.url}/healthz")).raise_for_status()
+
+        results = []
+        print(
+            f"{'conc':>5} {'reqs':>5} {'err':>4} {'hits':>5} {'miss':>5} "
+            f"{'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+        )
+        for concurrency in args.levels:
+            r = await run_level(
+                client, args.url, questions, concurrency, args.requests or 4 * concurrency, use_cache=not args.no_cache
+            )
+            results.append(r)
+            print(
+                f"{r['concurrency']:>5} {r['requests']:>5} {r['errors']:>4} {r['cache_hits']:>5} "
+                f"{r['cache_misses']:>5} {r['throughput_rps']:>8} "
+                f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the Adaptive RAG server")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests", type=int, default=0, help="Requests per level (default 4 x concurrency)")
+    parser.add_argument("--questions", help="File with one question per line")
+    parser.add_argument("--shuffle", action="store_true")
+    parser.add_argument("--no-cache", action="store_true", help="Have the server skip its semantic cache")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Write the results as JSON")
+    asyncio.run(main(parser.parse_args()))
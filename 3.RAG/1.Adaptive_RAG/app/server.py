@@ -0,0 +1,107 @@
+import json
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from graph.app_graph import async_app, cached_async_app
+
+### Question answering service
+#
+# A minimal ASGI app that answers many questions concurrently on one event loop:
+#   uvicorn server:app --host 0.0.0.0 --port 8000
+#
+#   POST /ask      {"question": "...", "cache": true} -> {"generation", "sources", "cached", "latency_ms"}
+#   GET  /healthz  -> {"status": "ok"}
+#
+# Every request runs the async graph (graph.app_graph.async_app) behind the
+# semantic cache; "cache": false skips the cache, e.g. to load test the graph
+# itself (loadtest.py --no-cache). The chat
+# models, embeddings, Chroma client and Tavily tool are created once at import
+# time, so all requests share their HTTP connection pools instead of opening
+# new connections per question.
+
+max_body_bytes = 64 * 1024
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > max_body_bytes:
+            raise ValueError("request body too large")
+        if not message.get("more_body"):
+            return body
+
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def ask(receive, send):
+    try:
+        body = json.loads(await read_body(receive))
+        question = body["question"]
+        if not isinstance(question, str) or not question.strip():
+            raise ValueError("question must be a non-empty string")
+        use_cache = body.get("cache", True)
+        if not isinstance(use_cache, bool):
+            raise ValueError("cache must be a boolean")
+    except (ValueError, KeyError, TypeError) as e:
+        await send_json(send, 400, {"error": f"expected {{\"question\": str, \"cache\": bool}}: {e}"})
+        return
+
+    started = time.perf_counter()
+    graph = cached_async_app if use_cache else async_app
+    state = await graph.ainvoke({"question": question})
+    sources = sorted({
+        d.metadata["source"] for d in state.get("documents", []) if d.metadata.get("source")
+    })
+    await send_json(send, 200, {
+        "generation": state["generation"],
+        "sources": sources,
+        "cached": bool(state.get("cached")),
+        "latency_ms": round(1000 * (time.perf_counter() - started), 1),
+    })
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] != "http":
+        return
+
+    route = (scope["method"], scope["path"])
+    if route == ("GET", "/healthz"):
+        await send_json(send, 200, {"status": "ok"})
+    elif route == ("POST", "/ask"):
+        try:
+            await ask(receive, send)
+        except Exception as e:
+            print(f"---SERVER: REQUEST FAILED: {e!r}---")
+            await send_json(send, 500, {"error": str(e)})
+    else:
+        await send_json(send, 404, {"error": "not found"})
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("server:app", host="0.0.0.0", port=8000)
@@ -4,32 +4,7 @@ import streamlit as st
 import os
 load_dotenv()
 
-from graph.app_graph import app
-
-from pprint import pprint
-
-
-
-def print_final_generation(inputs):
-    # Stream outputs from the app
-    inputs = {"question": inputs}
-    for output in app.stream(inputs):
-        # For each node in the output, yield the formatted string
-        for key, value in output.items():
-            # Create a formatted string for the node
-            node_output = f"Node '{key}':"
-            yield node_output  # Yield the node output
-            
-            # Optionally yield full state at each node
-            # keys_output = pprint.pformat(value["keys"], indent=2, width=80, depth=None)
-            # yield keys_output
-
-        # Yield a separator between nodes
-        yield "\n---\n"
-
-    # Yield the final generation
-    final_generation = value.get("generation", "No generation found")
-    yield final_generation
+from graph.streaming import stream_answer
 
 
 def handle_message():
@@ -49,7 +24,6 @@ def handle_message():
         print(message)
         print(type(message))
         user_question = next((item['content'] for item in reversed(message) if item['role'] == 'user'), None)
-        placeholder = st.empty()
 
         if user_question:                                             
             # Add the user question to the session state
@@ -57,32 +31,36 @@ def handle_message():
 
             # Initialize the assistant's message with the avatar
             assistant_message = st.chat_message("assistant", avatar="./bot.png")
-
-            # Initialize an empty list to keep track of already processed nodes
-            processed_nodes = set()
-
-            # Use the modified print_final_generation function to stream the answer
-            streamed_output = ""  # Accumulate the full streamed output here
-
-            # Stream the answer progressively
-            for partial_answer in print_final_generation(user_question):
-                # Check if the partial answer is a node or part of the expected structure
-                if partial_answer.startswith("Node"):
-                    # If the node has not been processed yet, add to the output
-                    node_name = partial_answer.split("'")[1]  # Extract node name
-                    if node_name not in processed_nodes:
-                        processed_nodes.add(node_name)
-                        streamed_output += partial_answer + "\n"
-
-                else:
-                    # For other outputs, just add them directly
-                    streamed_output += partial_answer + "\n"
-                
-                # Update the assistant's message with the accumulated streamed output
-                assistant_message.markdown(streamed_output)
-
-            # Once streaming is complete, add the final streamed output to the session state
-            st.session_state.messages.append({"role": "assistant", "content": streamed_output})
+            progress_placeholder = assistant_message.empty()
+            answer_placeholder = assistant_message.empty()
+
+            # Stream answer tokens as they are generated; they stay marked as
+            # provisional until the graders accept the answer
+            processed_nodes = []
+            provisional_answer = ""
+            final_answer = ""
+            for event in stream_answer(user_question):
+                if event["type"] == "node":
+                    if event["name"] not in processed_nodes:
+                        processed_nodes.append(event["name"])
+                    progress_placeholder.caption(" → ".join(processed_nodes))
+
+                elif event["type"] == "token":
+                    provisional_answer += event["text"]
+                    answer_placeholder.markdown(provisional_answer + " ▌\n\n_checking the answer..._")
+
+                elif event["type"] == "retract":
+                    provisional_answer = ""
+                    answer_placeholder.markdown(f"_{event['reason']}..._")
+
+                elif event["type"] == "final":
+                    final_answer = event["text"]
+                    if event["cached"]:
+                        progress_placeholder.caption("answered from cache")
+                    answer_placeholder.markdown(final_answer)
+
+            # Once streaming is complete, add the final answer to the session state
+            st.session_state.messages.append({"role": "assistant", "content": final_answer})
     
 def main():
 
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Tests import the app's packages (graph, utils, chains) the way the app does:
+#   cd 3.RAG/1.Adaptive_RAG/app && python -m pytest tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils  # noqa: E402,F401  puts the shared package on sys.path
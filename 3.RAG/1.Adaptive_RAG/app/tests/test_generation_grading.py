@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+# The chains need the prompt hub client and the pydantic_v1 shim of langchain < 1
+pytest.importorskip("langchain.hub")
+pytest.importorskip("langchain_core.pydantic_v1")
+
+from shared.testing import fake_openai
+
+# Grader model name -> binary_score the fake model answers with
+verdicts = {}
+
+
+def reply(request):
+    name = request["tools"][0]["function"]["name"]
+    arguments = json.dumps({"binary_score": verdicts[name]})
+    call = {"id": "call_1", "type": "function", "function": {"name": name, "arguments": arguments}}
+    return {"role": "assistant", "content": None, "tool_calls": [call]}
+
+
+@pytest.fixture(scope="module")
+def server():
+    from langchain import hub
+    from langchain_core.prompts import ChatPromptTemplate
+
+    with fake_openai(reply) as server, pytest.MonkeyPatch.context() as patch:
+        patch.setenv("OPENAI_API_KEY", "test")
+        patch.setenv("OPENAI_API_BASE", server.url)
+        patch.setenv("OPENAI_BASE_URL", server.url)
+        # Offline: the RAG prompt is not pulled from the hub
+        patch.setattr(hub, "pull", lambda name: ChatPromptTemplate.from_template("{context}\n{question}"))
+        yield server
+
+
+@pytest.fixture
+def edges(server, monkeypatch):
+    import graph.conditional_edge_functions as edges
+
+    monkeypatch.setattr(edges, "generation_grading_mode", "speculative")
+    server.requests.clear()
+    return edges
+
+
+def test_speculative_grading_in_consecutive_requests(edges, server):
+    # Document grading and generation grading used to run on two short-lived
+    # loops; the second one found the async client's connections closed
+    verdicts.update(GradeHallucinations="yes", GradeAnswer="yes")
+    for question in ["What is an agent?", "What is prompt engineering?"]:
+        assert edges.grade_generation(question, "facts", "answer") == ("yes", "yes")
+    assert len(server.requests) == 4
+
+
+def test_speculative_grading_discards_the_answer_grade(edges):
+    verdicts.update(GradeHallucinations="no", GradeAnswer="yes")
+    assert edges.grade_generation("What is an agent?", "facts", "answer") == ("no", None)
@@ -0,0 +1,26 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from utils.semantic_cache import SemanticCache
+
+
+class LockCheckingEmbeddings(DeterministicFakeEmbedding):
+    """Fails if asked to embed while the cache holds its lock."""
+
+    cache: object = None
+
+    def embed_query(self, text):
+        assert not self.cache._lock.locked(), "embedded while holding the cache lock"
+        return super().embed_query(text)
+
+
+def test_lookup_embeds_outside_the_lock():
+    embeddings = LockCheckingEmbeddings(size=8)
+    cache = SemanticCache(embeddings, threshold=0.99)
+    embeddings.cache = cache
+
+    assert cache.lookup("What is an agent?") is None
+    cache.store("What is an agent?", "An LLM using tools.", [])
+
+    assert cache.lookup("what is an agent")["generation"] == "An LLM using tools."
+    assert cache.lookup("How do agents plan?") is None
+    assert (cache.hits, cache.misses) == (1, 2)
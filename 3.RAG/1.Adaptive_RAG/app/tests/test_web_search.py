@@ -0,0 +1,81 @@
+import asyncio
+import threading
+
+from utils.web_search import FakeBackend, WebSearch
+
+results = {
+    "what is an agent": [
+        {"url": "https://a.example/agents", "content": "Agents use tools.", "title": "Agents"},
+        {"url": "https://b.example/llm", "content": "LLMs predict tokens.", "title": "LLMs"},
+    ],
+    "agents memory": [
+        {"url": "https://b.example/llm", "content": "LLMs predict tokens.", "title": "LLMs"},
+        {"url": "https://c.example/memory", "content": "Memory stores facts.", "title": "Memory"},
+    ],
+}
+
+
+def test_variants_are_merged_by_rank_and_deduplicated():
+    search = WebSearch(FakeBackend(results))
+
+    documents = search.search(["What is an agent?", "agents memory"])
+
+    assert [d.metadata["source"] for d in documents] == [
+        "https://a.example/agents",
+        "https://b.example/llm",
+        "https://c.example/memory",
+    ]
+    assert documents[2].metadata["query"] == "agents memory"
+
+
+def test_repeated_queries_are_served_from_the_cache():
+    backend = FakeBackend(results)
+    search = WebSearch(backend)
+
+    search.search("What is an agent?")
+    search.search("what is an AGENT")
+
+    assert backend.calls == 1
+    assert search.stats["cache_hits"] == 1
+
+
+def test_concurrent_queries_share_one_call_across_threads_and_loops():
+    backend = FakeBackend(results, delay=0.3)
+    search = WebSearch(backend)
+    found = []
+
+    def sync_caller():
+        found.append(search.search("What is an agent?"))
+
+    def async_caller():
+        found.append(asyncio.run(search.asearch("What is an agent?")))
+
+    threads = [threading.Thread(target=target) for target in (sync_caller, sync_caller, async_caller, async_caller)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert backend.calls == 1
+    assert search.stats["coalesced"] + search.stats["cache_hits"] == 3
+    assert all(documents == found[0] for documents in found)
+
+
+def test_a_failed_call_fails_every_waiter_and_is_not_cached():
+    class FailingBackend(FakeBackend):
+        async def asearch(self, query, k):
+            await super().asearch(query, k)
+            raise RuntimeError("web search failed: rate limited")
+
+    backend = FailingBackend(delay=0.1)
+    search = WebSearch(backend)
+
+    async def both():
+        return await asyncio.gather(search.asearch("q"), search.asearch("q"), return_exceptions=True)
+
+    errors = asyncio.run(both())
+
+    assert [str(e) for e in errors] == ["web search failed: rate limited"] * 2
+    assert backend.calls == 1
+    assert isinstance(asyncio.run(both())[0], RuntimeError)
+    assert backend.calls == 2
@@ -0,0 +1,140 @@
+import os
+import re
+import zlib
+
+import numpy as np
+from langchain_core.documents import Document
+
+from shared.pipeline import count_tokens
+
+### Context compression
+#
+# Runs between grading and generation so that `generate` and the hallucination
+# grader both see a short context instead of whole 500-token chunks:
+#   1. near-duplicate passages are dropped, comparing MinHash signatures of
+#      their word shingles (estimated Jaccard similarity >= dedupe_threshold)
+#   2. every remaining passage is split into sentences, and sentences are
+#      ranked by embedding similarity to the question
+#   3. the best sentences are kept until `max_tokens` is reached, then put
+#      back in their original order, one Document per source passage
+
+enabled = os.environ.get("COMPRESSION", "on") == "on"
+max_tokens = int(os.environ.get("COMPRESSION_MAX_TOKENS", 1500))
+# Sentences less similar to the question than this are dropped
+min_similarity = float(os.environ.get("COMPRESSION_MIN_SIMILARITY", 0.25))
+dedupe_threshold = float(os.environ.get("COMPRESSION_DEDUPE_THRESHOLD", 0.8))
+
+# MinHash settings
+num_permutations = 64
+shingle_size = 3
+_prime = (1 << 61) - 1
+_rng = np.random.default_rng(0)
+# a < 2**32 and 32-bit shingle hashes keep a * x below 2**64
+_a = _rng.integers(1, 1 << 32, size=num_permutations, dtype=np.uint64)
+_b = _rng.integers(0, _prime, size=num_permutations, dtype=np.uint64)
+
+
+def split_sentences(text):
+    sentences = re.split(r"(?<=[.!?])\s+|\n{2,}", text)
+    return [s.strip() for s in sentences if s and s.strip()]
+
+
+def minhash(text):
+    """
+    MinHash signature of the text's word shingles.
+
+    Returns:
+        np.ndarray: num_permutations minimum hash values
+    """
+    words = re.findall(r"\w+", text.lower())
+    shingles = {
+        " ".join(words[i:i + shingle_size])
+        for i in range(max(len(words) - shingle_size + 1, 1))
+    }
+    hashes = np.array([zlib.crc32(s.encode()) for s in shingles], dtype=np.uint64)
+    # (a * x + b) mod p for every permutation and shingle
+    permuted = (np.outer(_a, hashes) % _prime + _b[:, None]) % _prime
+    return permuted.min(axis=1)
+
+
+def dedupe(documents, threshold=dedupe_threshold):
+    """
+    Drop documents whose estimated Jaccard similarity to an earlier one is at least threshold.
+
+    Returns:
+        list: The kept documents, in their original order
+    """
+    kept, signatures = [], []
+    for d in documents:
+        signature = minhash(d.page_content)
+        if any(np.mean(signature == s) >= threshold for s in signatures):
+            print("---COMPRESS: DROPPED NEAR-DUPLICATE PASSAGE---")
+            continue
+        kept.append(d)
+        signatures.append(signature)
+    return kept
+
+
+class ContextCompressor:
+    """
+    Shrinks retrieved documents to the sentences that matter for a question.
+
+    Attributes:
+        embeddings: Model used to compare sentences with the question
+        max_tokens: Token budget for the whole compressed context
+    """
+
+    def __init__(self, embeddings, max_tokens=max_tokens, min_similarity=min_similarity):
+        self.embeddings = embeddings
+        self.max_tokens = max_tokens
+        self.min_similarity = min_similarity
+
+    def compress(self, question, documents):
+        """
+        Args:
+            question (str): The user question
+            documents (list): Graded documents
+
+        Returns:
+            list: Compressed documents, with the original metadata
+        """
+        if not enabled or not documents:
+            return documents
+
+        documents = dedupe(documents)
+        sentences = [
+            (i, j, s)
+            for i, d in enumerate(documents)
+            for j, s in enumerate(split_sentences(d.page_content))
+        ]
+        if not sentences:
+            return documents
+
+        vectors = np.asarray(self.embeddings.embed_documents([s for _, _, s in sentences]), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-9
+        query = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        similarities = vectors @ (query / (np.linalg.norm(query) or 1.0))
+
+        # Best sentences first; always keep the best one even if it is below the bar
+        order = np.argsort(-similarities)
+        selected, used = set(), 0
+        for rank, n in enumerate(order):
+            if rank and similarities[n] < self.min_similarity:
+                break
+            tokens = count_tokens(sentences[n][2])
+            if rank and used + tokens > self.max_tokens:
+                continue
+            selected.add(int(n))
+            used += tokens
+
+        kept = {}
+        for n in sorted(selected):
+            i, _, sentence = sentences[n]
+            kept.setdefault(i, []).append(sentence)
+
+        before = sum(count_tokens(d.page_content) for d in documents)
+        print(f"---COMPRESS: {before} -> {used} CONTEXT TOKENS---")
+        return [
+            Document(page_content=" ".join(kept[i]), metadata=documents[i].metadata)
+            for i in sorted(kept)
+        ]
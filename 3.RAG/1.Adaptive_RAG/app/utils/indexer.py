@@ -2,44 +2,227 @@ from dotenv import load_dotenv
 import os
 load_dotenv()
 
+import asyncio
+import hashlib
+import json
+import shutil
+import threading
+
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import WebBaseLoader
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
 
+from shared.bm25 import BM25Index
+from shared.embedding_cache import CachedEmbeddings
+from shared.fingerprints import FingerprintStore, manifest_name
+from shared.hybrid import HybridRetriever
+from shared.pipeline import update_index
 
 
-def build_retriever():
-    ### from langchain_cohere import CohereEmbeddings
+# Docs to index
+urls = [
+    "https://lilianweng.github.io/posts/2023-06-23-agent/",
+    "https://lilianweng.github.io/posts/2023-03-15-prompt-engineering/",
+    "https://lilianweng.github.io/posts/2023-10-25-adv-attack-llm/",
+]
+
+# Splitter settings
+chunk_size = 500
+chunk_overlap = 0
+
+collection_name = "rag-chroma"
+
+# On-disk location of the persisted Chroma indexes
+index_root = os.environ.get("ADAPTIVE_RAG_INDEX_DIR", "./.chroma")
+
+# Documents returned per query (dense and BM25 rankings are fused, see shared.hybrid)
+retrieval_k = int(os.environ.get("RETRIEVAL_K", 4))
+
+# Process-wide singletons
+_vectorstore = None
+_sparse_index = None
+_retriever = None
+_lock = threading.Lock()
+# (manifest mtime, version)
+_version = (None, None)
+
+
+def index_key(chunk_size=chunk_size, chunk_overlap=chunk_overlap):
+    """
+    Hash the splitter settings into a stable key for the index directory.
+
+    Sources are not part of the key: adding, changing or removing a URL is handled
+    incrementally by shared.pipeline.update_index.
+
+    Args:
+        chunk_size (int): Splitter chunk size in tokens
+        chunk_overlap (int): Splitter chunk overlap in tokens
 
-    # Set embeddings
-    embd = OpenAIEmbeddings()
+    Returns:
+        str: Hex digest identifying this index configuration
+    """
+    settings = {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "collection_name": collection_name,
+    }
+    payload = json.dumps(settings, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
 
-    # Docs to index
-    urls = [
-        "https://lilianweng.github.io/posts/2023-06-23-agent/",
-        "https://lilianweng.github.io/posts/2023-03-15-prompt-engineering/",
-        "https://lilianweng.github.io/posts/2023-10-25-adv-attack-llm/",
-    ]
 
-    # Load
-    docs = [WebBaseLoader(url).load() for url in urls]
-    docs_list = [item for sublist in docs for item in sublist]
+def index_path(key=None):
+    return os.path.join(index_root, key or index_key())
 
-    # Split
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=500, chunk_overlap=0
+
+def build_text_splitter():
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
     )
-    doc_splits = text_splitter.split_documents(docs_list)
 
-    # Add to vectorstore
-    vectorstore = Chroma.from_documents(
-        documents=doc_splits,
-        collection_name="rag-chroma",
-        embedding=embd,
+
+def load_vectorstore(refresh=False, rebuild=False):
+    """
+    Open the persisted vectorstore, indexing the sources on first use.
+
+    Args:
+        refresh (bool): Re-check every source and re-index only what changed
+        rebuild (bool): Drop the existing index and build a fresh one
+
+    Returns:
+        Chroma: The vectorstore
+    """
+    embd = CachedEmbeddings(OpenAIEmbeddings())
+    persist_directory = index_path()
+
+    if rebuild and os.path.exists(persist_directory):
+        shutil.rmtree(persist_directory)
+    os.makedirs(persist_directory, exist_ok=True)
+
+    vectorstore = Chroma(
+        collection_name=collection_name,
+        embedding_function=embd,
+        persist_directory=persist_directory,
     )
-    retriever = vectorstore.as_retriever()
-    print("indexing done!!!")
+    store = FingerprintStore(persist_directory)
+    sparse_index = BM25Index(persist_directory)
+
+    # Sources that failed to load last time are retried on the next start
+    if store.exists() and not refresh and not store.missing(urls):
+        print("---LOADING PERSISTED INDEX---")
+        if not sparse_index.exists():
+            backfill_sparse_index(vectorstore, sparse_index)
+    else:
+        print("---UPDATING INDEX---")
+        if store.exists() and not sparse_index.exists():
+            backfill_sparse_index(vectorstore, sparse_index)
+        update_index(
+            vectorstore, store, urls, build_text_splitter(), sparse_index=sparse_index
+        )
+        print("indexing done!!!")
+
+    return vectorstore
+
+
+def backfill_sparse_index(vectorstore, sparse_index):
+    """Build the BM25 index from the chunks of an index created before it existed."""
+    print("---BUILDING BM25 INDEX FROM THE COLLECTION---")
+    chunks = vectorstore.get(include=["documents"])
+    sparse_index.add(chunks["ids"], chunks["documents"])
+    sparse_index.save()
+
+
+def index_version():
+    """
+    Version of the persisted index content, or None if nothing is indexed yet.
+
+    The manifest is only re-read when its modification time changes, so this is
+    cheap enough to call on every request.
+    """
+    global _version
+    path = os.path.join(index_path(), manifest_name)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _version[0] != mtime:
+        _version = (mtime, FingerprintStore(index_path()).version())
+    return _version[1]
+
+
+def get_vectorstore():
+    """
+    Return the process-wide vectorstore, opening the persisted index on first call.
+
+    Returns:
+        Chroma: The shared vectorstore
+    """
+    global _vectorstore
+    if _vectorstore is None:
+        with _lock:
+            if _vectorstore is None:
+                _vectorstore = load_vectorstore()
+    return _vectorstore
+
+
+def get_sparse_index():
+    """
+    Return the process-wide BM25 index persisted next to the vectorstore.
+
+    Returns:
+        BM25Index: The shared keyword index
+    """
+    global _sparse_index
+    if _sparse_index is None:
+        get_vectorstore()
+        with _lock:
+            if _sparse_index is None:
+                _sparse_index = BM25Index(index_path())
+    return _sparse_index
+
+
+def get_retriever():
+    """
+    Return the process-wide hybrid (BM25 + dense) retriever over the shared index.
+
+    Returns:
+        HybridRetriever: The shared retriever
+    """
+    global _retriever
+    if _retriever is None:
+        vectorstore, sparse_index = get_vectorstore(), get_sparse_index()
+        with _lock:
+            if _retriever is None:
+                _retriever = HybridRetriever(vectorstore=vectorstore, sparse_index=sparse_index, k=retrieval_k)
+    return _retriever
+
+
+def retrieve_with_scores(question, k=retrieval_k):
+    """
+    Retrieve documents along with their similarity to the question.
+
+    Args:
+        question (str): The query
+        k (int): Number of documents to return
+
+    Returns:
+        list: Documents ranked by hybrid search. Those the dense search found have a
+            "relevance_score" in [0, 1] in their metadata; keyword-only hits do not.
+    """
+    return get_retriever().search(question, k=k)
+
+
+async def aretrieve_with_scores(question, k=retrieval_k):
+    """Async version of retrieve_with_scores."""
+    retriever = await asyncio.to_thread(get_retriever)
+    return await retriever.asearch(question, k=k)
+
+
+def build_retriever():
+    """Kept for callers of the old API; returns the shared retriever."""
+    return get_retriever()
+
 
-    return retriever
-    
\ No newline at end of file
+if __name__ == "__main__":
+    # Refresh the index offline: python -m utils.indexer [--rebuild]
+    import sys
+    load_vectorstore(refresh=True, rebuild="--rebuild" in sys.argv)
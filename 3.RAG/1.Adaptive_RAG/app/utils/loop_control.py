@@ -0,0 +1,136 @@
+import os
+import time
+
+import numpy as np
+
+from utils.semantic_cache import normalize
+
+### Loop control
+#
+# Bounds the retry loops of a single request:
+#   generate -> "not supported" -> generate
+#   generate -> "not useful" -> transform_query -> retrieve -> grade_documents
+#   grade_documents -> no relevant documents -> transform_query -> ...
+# The graph state carries per-node attempt counters, the request start time and
+# an estimated token count. Retrieval and grading results are memoized per
+# normalized question for the request, and a rewrite whose embedding is nearly
+# identical to an earlier question is flagged. Once the budget is spent the
+# edges fall back to web search (if it has not been tried yet) and finally to
+# the best answer generated so far.
+
+max_rewrites = int(os.environ.get("LOOP_MAX_REWRITES", 2))
+max_generations = int(os.environ.get("LOOP_MAX_GENERATIONS", 3))
+max_seconds = float(os.environ.get("LOOP_MAX_SECONDS", 60))
+max_tokens = int(os.environ.get("LOOP_MAX_TOKENS", 30_000))
+duplicate_threshold = float(os.environ.get("LOOP_DUPLICATE_THRESHOLD", 0.97))
+
+
+def begin(state):
+    """
+    Add the loop-control keys to the state the first time a node sees it.
+
+    Returns:
+        state (dict): The same state
+    """
+    state.setdefault("attempts", {})
+    state.setdefault("started_at", time.time())
+    state.setdefault("tokens_used", 0)
+    state.setdefault("retrieval_cache", {})
+    state.setdefault("grading_cache", {})
+    state.setdefault("seen_questions", [])
+    return state
+
+
+def count(state, node):
+    attempts = begin(state)["attempts"]
+    attempts[node] = attempts.get(node, 0) + 1
+    return attempts[node]
+
+
+def estimate_tokens(*texts):
+    # ~4 characters per token for English text; good enough for a budget
+    return sum(len(t) for t in texts) // 4
+
+
+def add_tokens(state, *texts):
+    begin(state)["tokens_used"] += estimate_tokens(*texts)
+
+
+def exhausted(state):
+    """
+    Returns:
+        str: Why the request budget is spent, or None if it is not
+    """
+    if "started_at" in state and time.time() - state["started_at"] > max_seconds:
+        return f"time budget of {max_seconds:.0f}s spent"
+    if state.get("tokens_used", 0) > max_tokens:
+        return f"token budget of {max_tokens} spent"
+    return None
+
+
+def attempts(state, node):
+    return state.get("attempts", {}).get(node, 0)
+
+
+def can_rewrite(state):
+    return attempts(state, "transform_query") < max_rewrites and not exhausted(state)
+
+
+def can_regenerate(state):
+    return attempts(state, "generate") < max_generations and not exhausted(state)
+
+
+def fallback(state, reason=None):
+    """
+    Next step once retrying is no longer allowed.
+
+    Args:
+        state (dict): The current graph state
+        reason (str): Why, for the log; defaults to the spent budget
+
+    Returns:
+        str: "web_search" if the web has not been searched yet, otherwise "best_effort"
+    """
+    reason = reason or exhausted(state) or "retry limit reached"
+    if not attempts(state, "web_search"):
+        print(f"---LOOP CONTROL: {reason.upper()}, FALLING BACK TO WEB SEARCH---")
+        return "web_search"
+    print(f"---LOOP CONTROL: {reason.upper()}, RETURNING BEST-EFFORT ANSWER---")
+    return "best_effort"
+
+
+def cached(state, cache, question):
+    """Memoized result for the question in this request, or None."""
+    return begin(state)[cache].get(normalize(question))
+
+
+def remember(state, cache, question, documents):
+    # Copy, since later nodes append to state["documents"]
+    begin(state)[cache][normalize(question)] = list(documents)
+
+
+def find_duplicate(state, question, vector):
+    """
+    Record a question and check it against the questions already tried in this request.
+
+    Args:
+        state (dict): The current graph state
+        question (str): The (rewritten) question
+        vector (list): Its embedding
+
+    Returns:
+        str: The earlier question it duplicates, or None
+    """
+    seen = begin(state)["seen_questions"]
+    vector = np.asarray(vector, dtype=np.float32)
+    vector = vector / (np.linalg.norm(vector) or 1.0)
+
+    duplicate = None
+    for earlier, earlier_vector in seen:
+        if normalize(earlier) == normalize(question) or float(
+            np.dot(vector, earlier_vector)
+        ) >= duplicate_threshold:
+            duplicate = earlier
+            break
+    seen.append((question, vector))
+    return duplicate
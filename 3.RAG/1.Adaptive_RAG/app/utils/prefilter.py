@@ -0,0 +1,109 @@
+import math
+import os
+import threading
+
+from shared.bm25 import tokenize
+
+### Local relevance pre-filter
+#
+# Scores each retrieved document without calling an LLM, by mixing
+#   - the dense similarity the vectorstore already returned ("relevance_score"), and
+#   - a BM25-style, IDF-weighted overlap between question and document keywords.
+# Documents scoring above `high_threshold` are kept and those below
+# `low_threshold` are dropped straight away; only the band in between is sent
+# to the LLM grader.
+
+enabled = os.environ.get("PREFILTER", "on") == "on"
+high_threshold = float(os.environ.get("PREFILTER_HIGH", 0.75))
+low_threshold = float(os.environ.get("PREFILTER_LOW", 0.30))
+# Weight of the dense similarity; the keyword score gets the rest
+dense_weight = float(os.environ.get("PREFILTER_DENSE_WEIGHT", 0.6))
+
+# Running totals since the process started
+stats = {"documents": 0, "accepted_locally": 0, "rejected_locally": 0, "llm_graded": 0}
+_stats_lock = threading.Lock()
+
+
+def keyword_scores(question, documents):
+    """
+    IDF-weighted share of the question's keywords that each document contains.
+
+    IDF is computed over the retrieved documents, as in BM25, so terms that appear
+    in every candidate count for little and rare matching terms count for a lot.
+
+    Returns:
+        list: A score in [0, 1] per document
+    """
+    terms = set(tokenize(question))
+    if not terms:
+        return [0.0] * len(documents)
+
+    doc_terms = [set(tokenize(d.page_content)) for d in documents]
+    n = len(documents)
+    idf = {}
+    for t in terms:
+        df = sum(1 for dt in doc_terms if t in dt)
+        idf[t] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+    total = sum(idf.values())
+
+    return [sum(idf[t] for t in terms if t in dt) / total for dt in doc_terms]
+
+
+def local_scores(question, documents):
+    """
+    Combined local relevance score per document, or None when no dense score is available.
+    """
+    keywords = keyword_scores(question, documents)
+    scores = []
+    for d, keyword in zip(documents, keywords):
+        dense = d.metadata.get("relevance_score")
+        if dense is None:
+            scores.append(None)
+        else:
+            scores.append(dense_weight * dense + (1 - dense_weight) * keyword)
+    return scores
+
+
+def prefilter(question, documents):
+    """
+    Split documents into locally decided and ambiguous ones.
+
+    Args:
+        question (str): The user question
+        documents (list): Retrieved documents
+
+    Returns:
+        tuple: (verdicts, ambiguous). verdicts maps a document's position to
+            True/False for locally decided documents; ambiguous lists the
+            positions that still need the LLM grader.
+    """
+    if not enabled:
+        _record(len(documents), 0, 0, len(documents))
+        return {}, list(range(len(documents)))
+
+    verdicts, ambiguous = {}, []
+    for i, score in enumerate(local_scores(question, documents)):
+        if score is not None and score >= high_threshold:
+            print(f"---PREFILTER: DOCUMENT RELEVANT ({score:.2f})---")
+            verdicts[i] = True
+        elif score is not None and score <= low_threshold:
+            print(f"---PREFILTER: DOCUMENT NOT RELEVANT ({score:.2f})---")
+            verdicts[i] = False
+        else:
+            ambiguous.append(i)
+
+    accepted = sum(verdicts.values())
+    _record(len(documents), accepted, len(verdicts) - accepted, len(ambiguous))
+    return verdicts, ambiguous
+
+
+def _record(documents, accepted, rejected, llm_graded):
+    with _stats_lock:
+        stats["documents"] += documents
+        stats["accepted_locally"] += accepted
+        stats["rejected_locally"] += rejected
+        stats["llm_graded"] += llm_graded
+
+
+def llm_calls_avoided():
+    return stats["accepted_locally"] + stats["rejected_locally"]
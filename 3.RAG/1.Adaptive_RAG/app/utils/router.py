@@ -0,0 +1,219 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.semantic_cache import normalize
+
+### Question routing
+#
+# Picks "vectorstore" or "web_search" as cheaply as possible:
+#   1. memo    - exact match on the normalized question
+#   2. local   - cosine similarity of the question embedding to per-route centroids
+#   3. llm     - question_router_chain, only when the local classifier is unsure
+# Every decision is appended to a JSONL log. `python -m utils.router train`
+# rebuilds the centroids from the LLM decisions in that log.
+
+router_dir = os.environ.get("ROUTER_DIR", "./.router")
+log_path = os.path.join(router_dir, "decisions.jsonl")
+centroids_path = os.path.join(router_dir, "centroids.json")
+
+# What the vectorstore covers; used until centroids have been trained
+vectorstore_topics = [
+    "LLM powered autonomous agents: planning, memory and tool use",
+    "Prompt engineering techniques for large language models",
+    "Adversarial attacks and jailbreaks on large language models",
+]
+
+# Topic-only mode: route locally when clearly on or clearly off topic
+topic_high = float(os.environ.get("ROUTER_TOPIC_HIGH", 0.85))
+topic_low = float(os.environ.get("ROUTER_TOPIC_LOW", 0.72))
+# Trained mode: route locally when one centroid wins by at least this margin
+min_margin = float(os.environ.get("ROUTER_MIN_MARGIN", 0.05))
+
+memo_size = 4096
+
+
+class QuestionRouter:
+    """
+    Memo table + centroid classifier in front of an LLM router.
+
+    Attributes:
+        stats: How many decisions each method made
+    """
+
+    def __init__(self, embeddings, llm_router):
+        self.embeddings = embeddings
+        self.llm_router = llm_router
+        self.stats = {"memo": 0, "local": 0, "llm": 0}
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self._centroids = None
+        self._topics = None
+
+    def _embed(self, text):
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _load_centroids(self):
+        if self._centroids is None and os.path.exists(centroids_path):
+            with open(centroids_path) as f:
+                saved = json.load(f)
+            self._centroids = {
+                label: np.asarray(vector, dtype=np.float32) for label, vector in saved.items()
+            }
+        return self._centroids
+
+    def _topic_matrix(self):
+        if self._topics is None:
+            self._topics = np.stack([self._embed(t) for t in vectorstore_topics])
+        return self._topics
+
+    def classify(self, question):
+        """
+        Route with the local classifier.
+
+        Returns:
+            tuple: (datasource or None when unsure, confidence)
+        """
+        vector = self._embed(question)
+        centroids = self._load_centroids()
+
+        if centroids and {"vectorstore", "web_search"} <= set(centroids):
+            scores = {label: float(c @ vector) for label, c in centroids.items()}
+            best = max(scores, key=scores.get)
+            margin = scores[best] - min(scores.values())
+            return (best if margin >= min_margin else None), margin
+
+        similarity = float(np.max(self._topic_matrix() @ vector))
+        if similarity >= topic_high:
+            return "vectorstore", similarity
+        if similarity <= topic_low:
+            return "web_search", 1 - similarity
+        return None, similarity
+
+    def _recall(self, key):
+        with self._lock:
+            datasource = self._memo.get(key)
+            if datasource is not None:
+                self._memo.move_to_end(key)
+        return datasource
+
+    def _remember(self, key, datasource):
+        with self._lock:
+            self._memo[key] = datasource
+            if len(self._memo) > memo_size:
+                self._memo.popitem(last=False)
+
+    def route(self, question):
+        """
+        Pick the datasource for a question.
+
+        Args:
+            question (str): The user question
+
+        Returns:
+            str: "vectorstore" or "web_search"
+        """
+        key = normalize(question)
+        datasource = self._recall(key)
+        if datasource is not None:
+            self._log(question, datasource, "memo", 1.0)
+            return datasource
+
+        datasource, confidence = self.classify(question)
+        method = "local"
+        if datasource is None:
+            datasource = self.llm_router.invoke({"question": question}).datasource
+            method = "llm"
+
+        self._remember(key, datasource)
+        self._log(question, datasource, method, confidence)
+        return datasource
+
+    async def aroute(self, question):
+        """Async version of route."""
+        key = normalize(question)
+        datasource = self._recall(key)
+        if datasource is not None:
+            self._log(question, datasource, "memo", 1.0)
+            return datasource
+
+        datasource, confidence = await asyncio.to_thread(self.classify, question)
+        method = "local"
+        if datasource is None:
+            source = await self.llm_router.ainvoke({"question": question})
+            datasource = source.datasource
+            method = "llm"
+
+        self._remember(key, datasource)
+        self._log(question, datasource, method, confidence)
+        return datasource
+
+    def _log(self, question, datasource, method, confidence):
+        self.stats[method] += 1
+        print(f"---ROUTER: {datasource} via {method} (confidence {confidence:.2f})---")
+        record = {
+            "time": time.time(),
+            "question": question,
+            "datasource": datasource,
+            "method": method,
+            "confidence": round(confidence, 4),
+        }
+        with self._lock:
+            os.makedirs(router_dir, exist_ok=True)
+            with open(log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+def train(embeddings, path=log_path):
+    """
+    Rebuild the route centroids from logged LLM router decisions.
+
+    Only "llm" decisions are used, so the classifier never learns from its own output.
+
+    Args:
+        embeddings (Embeddings): Embedding model, must match the one used at routing time
+        path (str): Decision log to train from
+
+    Returns:
+        dict: Number of training questions per route
+    """
+    questions = {}
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            if record["method"] == "llm":
+                questions.setdefault(record["datasource"], {})[normalize(record["question"])] = record["question"]
+
+    centroids = {}
+    for label, texts in questions.items():
+        vectors = np.asarray(embeddings.embed_documents(list(texts.values())), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        centroid = vectors.mean(axis=0)
+        centroids[label] = (centroid / np.linalg.norm(centroid)).tolist()
+
+    os.makedirs(router_dir, exist_ok=True)
+    with open(centroids_path, "w") as f:
+        json.dump(centroids, f)
+    counts = {label: len(texts) for label, texts in questions.items()}
+    print(f"---ROUTER TRAINED: {counts}---")
+    return counts
+
+
+if __name__ == "__main__":
+    # Retrain offline: python -m utils.router train
+    import sys
+    from dotenv import load_dotenv
+    from langchain_openai import OpenAIEmbeddings
+    from shared.embedding_cache import CachedEmbeddings
+
+    load_dotenv()
+    if sys.argv[1:] == ["train"]:
+        train(CachedEmbeddings(OpenAIEmbeddings()))
+    else:
+        print("usage: python -m utils.router train")
@@ -0,0 +1,212 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+### Semantic response cache
+#
+# Sits in front of the compiled graph. A question is first looked up by its
+# normalized text, then by cosine similarity of its embedding against every
+# cached question (a brute-force matrix product, which for a few hundred
+# entries is faster than any ANN structure). Entries expire after `ttl`
+# seconds, the least recently used entry is evicted once `max_entries` is
+# reached, and the whole cache is dropped when the vector index version changes.
+
+threshold = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.95))
+ttl = float(os.environ.get("SEMANTIC_CACHE_TTL", 24 * 3600))
+max_entries = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", 512))
+
+
+def normalize(question):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", "", question.lower())).strip()
+
+
+class SemanticCache:
+    """
+    Question -> (generation, documents) cache with similarity lookup.
+
+    Attributes:
+        hits / misses: Counters since the cache was created
+    """
+
+    def __init__(self, embeddings, version_fn=None, threshold=threshold, ttl=ttl, max_entries=max_entries):
+        self.embeddings = embeddings
+        self.version_fn = version_fn or (lambda: None)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # normalized question -> entry, in LRU order (oldest first)
+        self._entries = OrderedDict()
+        self._keys = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._version = None
+
+    def _check_version(self):
+        version = self.version_fn()
+        if version != self._version:
+            if self._entries:
+                print("---SEMANTIC CACHE: INDEX CHANGED, INVALIDATING---")
+            self._entries.clear()
+            self._rebuild()
+            self._version = version
+
+    def _rebuild(self):
+        self._keys = list(self._entries)
+        if self._keys:
+            self._matrix = np.stack([self._entries[k]["vector"] for k in self._keys])
+        else:
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+    def _embed(self, question):
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _expire(self, now):
+        expired = [k for k, e in self._entries.items() if now - e["created"] > self.ttl]
+        for k in expired:
+            del self._entries[k]
+        if expired:
+            self._rebuild()
+
+    def lookup(self, question):
+        """
+        Find a cached answer for the question or a near-identical one.
+
+        Returns:
+            dict: The cached entry ("question", "generation", "documents", "similarity"), or None
+        """
+        key = normalize(question)
+        with self._lock:
+            self._check_version()
+            self._expire(time.time())
+            if key in self._entries:
+                return self._hit(key, 1.0)
+            if not self._keys:
+                self.misses += 1
+                return None
+
+        # Embedding is a network call: keep it outside the lock, as store() does
+        vector = self._embed(question)
+        with self._lock:
+            if key in self._entries:
+                return self._hit(key, 1.0)
+            if self._keys:
+                scores = self._matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    return self._hit(self._keys[best], float(scores[best]))
+            self.misses += 1
+            return None
+
+    def _hit(self, key, similarity):
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return {**self._entries[key], "similarity": similarity}
+
+    def store(self, question, generation, documents):
+        key = normalize(question)
+        vector = self._embed(question)
+        with self._lock:
+            self._check_version()
+            self._entries[key] = {
+                "question": question,
+                "generation": generation,
+                "documents": documents,
+                "vector": vector,
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._rebuild()
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._rebuild()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+class CachedGraph:
+    """
+    Wraps a compiled graph so repeated questions are answered from a SemanticCache.
+
+    stream() yields a single {"semantic_cache": state} update on a hit, so callers
+    that read value["generation"] from the last update work unchanged. States
+    served from the cache carry "cached": True. Best-effort
+    answers (retry budget spent) are returned but not cached. Anything
+    else (get_graph, astream, ...) is delegated to the wrapped graph.
+    """
+
+    def __init__(self, graph, cache):
+        self.graph = graph
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.graph, name)
+
+    def _hit(self, question):
+        started = time.perf_counter()
+        entry = self.cache.lookup(question)
+        if entry is None:
+            return None
+        print(
+            f"---SEMANTIC CACHE HIT ({entry['similarity']:.3f}) "
+            f"in {1000 * (time.perf_counter() - started):.1f} ms---"
+        )
+        return {
+            "question": question,
+            "generation": entry["generation"],
+            "documents": entry["documents"],
+            "cached": True,
+        }
+
+    def stream(self, inputs, config=None, **kwargs):
+        question = inputs["question"]
+        cached = self._hit(question)
+        if cached is not None:
+            yield {"semantic_cache": cached}
+            return
+
+        final_state = None
+        for output in self.graph.stream(inputs, config, **kwargs):
+            for value in output.values():
+                if isinstance(value, dict) and "generation" in value:
+                    final_state = value
+            yield output
+
+        if final_state is not None and not final_state.get("best_effort"):
+            self.cache.store(question, final_state["generation"], final_state.get("documents", []))
+
+    def invoke(self, inputs, config=None, **kwargs):
+        question = inputs["question"]
+        cached = self._hit(question)
+        if cached is not None:
+            return cached
+
+        result = self.graph.invoke(inputs, config, **kwargs)
+        if result.get("generation") and not result.get("best_effort"):
+            self.cache.store(question, result["generation"], result.get("documents", []))
+        return result
+
+    async def ainvoke(self, inputs, config=None, **kwargs):
+        question = inputs["question"]
+        cached = await asyncio.to_thread(self._hit, question)
+        if cached is not None:
+            return cached
+
+        result = await self.graph.ainvoke(inputs, config, **kwargs)
+        if result.get("generation") and not result.get("best_effort"):
+            await asyncio.to_thread(
+                self.cache.store, question, result["generation"], result.get("documents", [])
+            )
+        return result
@@ -0,0 +1,194 @@
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.documents import Document
+
+from shared.concurrency import run_sync
+from utils.semantic_cache import normalize
+
+### Web search
+#
+# Wraps a search backend with:
+#   - a TTL cache keyed by the normalized query
+#   - request coalescing: concurrent identical queries share one in-flight
+#     backend call, whichever thread or event loop they run on (sync nodes
+#     search on the run_sync loop, async ones on the caller's loop)
+#   - optional fan-out over several query variants in parallel, with results
+#     deduplicated by URL
+# and returns one Document per result, with the URL, title and query in its
+# metadata.
+#
+# A backend is any object with `async asearch(query, k)` returning a list of
+# {"url", "content", "title"} dicts. TavilyBackend is the default; FakeBackend
+# serves canned results for offline runs.
+
+ttl = float(os.environ.get("WEB_SEARCH_TTL", 3600))
+max_entries = int(os.environ.get("WEB_SEARCH_MAX_ENTRIES", 1024))
+# Results per query
+results_k = int(os.environ.get("WEB_SEARCH_K", 3))
+# Query variants searched in parallel (1 searches the question only)
+max_queries = int(os.environ.get("WEB_SEARCH_MAX_QUERIES", 1))
+
+
+class TavilyBackend:
+    """Tavily search through the LangChain tool."""
+
+    def __init__(self):
+        from langchain_community.tools.tavily_search import TavilySearchResults
+
+        self._tools = {}
+        self._tool_class = TavilySearchResults
+
+    def _tool(self, k):
+        if k not in self._tools:
+            self._tools[k] = self._tool_class(max_results=k)
+        return self._tools[k]
+
+    async def asearch(self, query, k):
+        results = await self._tool(k).ainvoke({"query": query})
+        if isinstance(results, str):
+            # The tool reports errors as a string instead of raising
+            raise RuntimeError(f"web search failed: {results}")
+        return results
+
+
+class FakeBackend:
+    """
+    Canned results, for running without network access.
+
+    Args:
+        results (dict): normalized query -> list of {"url", "content", "title"}
+        default (list): Results for any other query
+        delay (float): Seconds each call takes
+    """
+
+    def __init__(self, results=None, default=None, delay=0.0):
+        self.results = results or {}
+        self.default = default or []
+        self.delay = delay
+        self.calls = 0
+
+    async def asearch(self, query, k):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.results.get(normalize(query), self.default)[:k]
+
+
+class WebSearch:
+    """
+    Cached, coalescing web search over a pluggable backend.
+
+    Attributes:
+        stats: Backend calls, cache hits and coalesced calls since creation
+    """
+
+    def __init__(self, backend, ttl=ttl, max_entries=max_entries, k=results_k):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.k = k
+        self.stats = {"backend_calls": 0, "cache_hits": 0, "coalesced": 0}
+        self._lock = threading.Lock()
+        # normalized query -> (expires at, results), in LRU order
+        self._cache = OrderedDict()
+        # normalized query -> concurrent.futures.Future of the in-flight backend call;
+        # unlike an asyncio task it can be awaited from any loop
+        self._inflight = {}
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return entry[1]
+
+    def _store(self, key, results):
+        with self._lock:
+            self._cache[key] = (time.time() + self.ttl, results)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    async def _search_one(self, query):
+        key = normalize(query)
+        results = self._cached(key)
+        if results is not None:
+            return results
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = concurrent.futures.Future()
+                self.stats["backend_calls"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        if not owner:
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        async def call():
+            try:
+                results = await self.backend.asearch(query, self.k)
+                self._store(key, results)
+                future.set_result(results)
+                return results
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+
+        # Shielded: a cancelled caller does not cancel the call the others wait for
+        return await asyncio.shield(asyncio.ensure_future(call()))
+
+    async def asearch(self, queries):
+        """
+        Search one or more query variants in parallel.
+
+        Args:
+            queries (str or list): The query, or query variants best first
+
+        Returns:
+            list: One Document per distinct URL, interleaving the variants' results by rank
+        """
+        if isinstance(queries, str):
+            queries = [queries]
+        queries = list(dict.fromkeys(q for q in queries if q))
+        per_query = await asyncio.gather(*(self._search_one(q) for q in queries))
+
+        documents, seen = [], set()
+        for rank in range(max((len(r) for r in per_query), default=0)):
+            for query, results in zip(queries, per_query):
+                if rank >= len(results):
+                    continue
+                result = results[rank]
+                url = result.get("url")
+                if url is not None:
+                    if url in seen:
+                        continue
+                    seen.add(url)
+                documents.append(
+                    Document(
+                        page_content=result.get("content", ""),
+                        metadata={"source": url, "title": result.get("title", ""), "query": query},
+                    )
+                )
+        return documents
+
+    def search(self, queries):
+        """Synchronous version of asearch."""
+        return run_sync(self.asearch(queries))
@@ -0,0 +1,216 @@
+from dotenv import load_dotenv
+import os
+load_dotenv()
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+import httpx
+from langchain_core.load import dumpd, load
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.pydantic_v1 import BaseModel, Field
+from langchain_openai import ChatOpenAI
+
+### Component registry
+#
+# Models, prompts and chains used by the graph nodes and edges, built once per
+# process on first use (lru_cache) instead of on every call. All chat models
+# share one pair of httpx clients, so every call reuses the same connection
+# pool. Hub prompts are cached on disk, optionally pinned to a commit, so
+# answering a question never waits on the LangChain Hub.
+#
+# `timings` records how long each component took to build and how long
+# callers spent fetching it; `python -m chains.components` prints a
+# comparison with building everything per call, as the nodes used to.
+
+prompt_cache_dir = os.environ.get("PROMPT_CACHE_DIR", "./.prompt_cache")
+# Hub commit to pin rlm/rag-prompt to; empty uses the latest, cached after the first pull
+rag_prompt_version = os.environ.get("RAG_PROMPT_VERSION", "")
+
+http_limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+# component name -> {"builds", "build_seconds", "gets", "get_seconds"}
+timings = {}
+_timings_lock = threading.Lock()
+
+
+def _record(name, key, seconds):
+    with _timings_lock:
+        entry = timings.setdefault(
+            name, {"builds": 0, "build_seconds": 0.0, "gets": 0, "get_seconds": 0.0}
+        )
+        entry["builds" if key == "build_seconds" else "gets"] += 1
+        entry[key] += seconds
+
+
+@contextmanager
+def timed(name, key="build_seconds"):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, key, time.perf_counter() - started)
+
+
+@lru_cache(maxsize=None)
+def http_clients():
+    """One sync and one async HTTP client shared by every chat model."""
+    with timed("http_clients"):
+        return httpx.Client(limits=http_limits), httpx.AsyncClient(limits=http_limits)
+
+
+@lru_cache(maxsize=None)
+def chat_model(model, streaming=True):
+    with timed(f"chat_model:{model}"):
+        client, async_client = http_clients()
+        return ChatOpenAI(
+            model=model,
+            temperature=0,
+            streaming=streaming,
+            http_client=client,
+            http_async_client=async_client,
+        )
+
+
+def pull_prompt(name, version=""):
+    """
+    Load a LangChain Hub prompt, from the on-disk cache when possible.
+
+    Args:
+        name (str): Hub handle, e.g. "rlm/rag-prompt"
+        version (str): Commit hash to pin to; empty for the latest
+
+    Returns:
+        BasePromptTemplate: The prompt
+    """
+    path = os.path.join(
+        prompt_cache_dir, f"{name.replace('/', '__')}@{version or 'latest'}.json"
+    )
+    if os.path.exists(path):
+        with open(path) as f:
+            return load(json.load(f))
+
+    from langchain import hub
+
+    print(f"---PULLING PROMPT {name}{':' + version if version else ''} FROM THE HUB---")
+    prompt = hub.pull(f"{name}:{version}" if version else name)
+    os.makedirs(prompt_cache_dir, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(dumpd(prompt), f)
+    os.replace(tmp_path, path)
+    return prompt
+
+
+@lru_cache(maxsize=None)
+def rag_prompt():
+    with timed("rag_prompt"):
+        return pull_prompt("rlm/rag-prompt", rag_prompt_version)
+
+
+@lru_cache(maxsize=None)
+def agent_model():
+    """The agent model with the retriever tool bound."""
+    from chains.indexer import tools
+
+    with timed("agent_model"):
+        return chat_model("gpt-4-turbo").bind_tools(tools)
+
+
+@lru_cache(maxsize=None)
+def rewrite_model():
+    return chat_model("gpt-4o-mini")
+
+
+@lru_cache(maxsize=None)
+def rag_chain():
+    with timed("rag_chain"):
+        return rag_prompt() | chat_model("gpt-4o-mini") | StrOutputParser()
+
+
+# Data model
+class grade(BaseModel):
+    """Binary score for relevance check."""
+
+    binary_score: str = Field(description="Relevance score 'yes' or 'no'")
+
+
+grade_prompt = PromptTemplate(
+    template="""You are a grader assessing relevance of a retrieved document to a user question. \n 
+    Here is the retrieved document: \n\n {context} \n\n
+    Here is the user question: {question} \n
+    If the document contains keyword(s) or semantic meaning related to the user question, grade it as relevant. \n
+    Give a binary score 'yes' or 'no' score to indicate whether the document is relevant to the question.""",
+    input_variables=["context", "question"],
+)
+
+
+@lru_cache(maxsize=None)
+def relevance_grader():
+    """grade_prompt | gpt-4o-mini with structured output."""
+    with timed("relevance_grader"):
+        return grade_prompt | chat_model("gpt-4o-mini").with_structured_output(grade)
+
+
+def get(name):
+    """
+    Fetch a component by name, recording how long the caller waited for it.
+
+    Args:
+        name (str): "agent_model", "rewrite_model", "rag_chain" or "relevance_grader"
+    """
+    with timed(name, key="get_seconds"):
+        return registry[name]()
+
+
+registry = {
+    "agent_model": agent_model,
+    "rewrite_model": rewrite_model,
+    "rag_chain": rag_chain,
+    "relevance_grader": relevance_grader,
+}
+
+
+def report():
+    for name, entry in sorted(timings.items()):
+        print(
+            f"{name:<28} builds {entry['builds']:>3} ({1000 * entry['build_seconds']:8.2f} ms)  "
+            f"gets {entry['gets']:>5} ({1000 * entry['get_seconds']:8.2f} ms)"
+        )
+
+
+if __name__ == "__main__":
+    # Construction overhead per call, rebuilding every time (as the nodes used to)
+    # versus fetching from the registry:  python -m chains.components [calls]
+    import sys
+
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    def rebuild(name):
+        # Clear the caches so everything is constructed again. The hub prompt now
+        # comes from the disk cache; the old per-call hub.pull also paid a network round trip.
+        for builder in (http_clients, chat_model, rag_prompt, *registry.values()):
+            builder.cache_clear()
+        return registry[name]()
+
+    for name in registry:
+        started = time.perf_counter()
+        for _ in range(calls):
+            rebuild(name)
+        per_call_before = (time.perf_counter() - started) / calls
+
+        started = time.perf_counter()
+        for _ in range(calls):
+            get(name)
+        per_call_after = (time.perf_counter() - started) / calls
+
+        print(
+            f"{name:<18} per-call construction: {1000 * per_call_before:8.3f} ms before, "
+            f"{1000 * per_call_after:8.4f} ms after"
+        )
+    report()
@@ -2,58 +2,235 @@ from dotenv import load_dotenv
 import os
 load_dotenv()
 
+import threading
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import WebBaseLoader
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
 
-def build_index():     
-    embd = OpenAIEmbeddings()
+from shared.bm25 import BM25Index, index_name
+from shared.embedding_cache import CachedEmbeddings
+from shared.fingerprints import FingerprintStore, manifest_name
+from shared.hybrid import HybridRetriever
+from shared.pipeline import update_index
+
+# Docs to index
+urls = [
+    "https://lilianweng.github.io/posts/2023-06-23-agent/",
+    "https://lilianweng.github.io/posts/2023-03-15-prompt-engineering/",
+    "https://lilianweng.github.io/posts/2023-10-25-adv-attack-llm/",
+]
+
+collection_name = "rag-chroma"
+
+# On-disk location of the persisted Chroma collection
+persist_directory = os.environ.get("AGENTIC_RAG_INDEX_DIR", "./.chroma/rag-chroma")
+
+# Documents returned per query (dense and BM25 rankings are fused, see shared.hybrid)
+retrieval_k = int(os.environ.get("RETRIEVAL_K", 4))
 
-    # Docs to index
-    urls = [
-        "https://lilianweng.github.io/posts/2023-06-23-agent/",
-        "https://lilianweng.github.io/posts/2023-03-15-prompt-engineering/",
-        "https://lilianweng.github.io/posts/2023-10-25-adv-attack-llm/",
-    ]
+# Index the sources on first use when nothing is persisted yet. Set to 0 in
+# deployments so workers never index and `python -m chains.indexer build-index`
+# has to run first.
+build_on_demand = os.environ.get("AGENTIC_RAG_BUILD_ON_DEMAND", "1") == "1"
 
-    # Load
-    docs = [WebBaseLoader(url).load() for url in urls]
-    docs_list = [item for sublist in docs for item in sublist]
+# Process-wide singletons, opened on first use
+_vectorstore = None
+_retriever = None
+_lock = threading.Lock()
 
+
+def build_index(vectorstore, store, sparse_index):
+    """
+    Incrementally (re-)index the sources into the vectorstore.
+
+    Sources stream through load -> split -> embed -> upsert stages (see
+    shared.pipeline), so memory stays flat and chunks are queryable as soon as
+    their batch is stored. Only changed sources are re-split and only new chunks
+    are embedded; chunks that disappeared are deleted from the collection.
+
+    Args:
+        vectorstore (Chroma): The persisted collection
+        store (FingerprintStore): Fingerprints of what is currently indexed
+        sparse_index (BM25Index): Keyword index kept next to the collection
+
+    Returns:
+        dict: Counts of changed sources, added chunks and deleted chunks
+    """
     # Split
     text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
         chunk_size=500, chunk_overlap=0
     )
-    doc_splits = text_splitter.split_documents(docs_list)
-    return doc_splits
+    return update_index(vectorstore, store, urls, text_splitter, sparse_index=sparse_index)
 
 
-def build_vector_store(doc_splits):
-    embd = OpenAIEmbeddings()
-    # Add to vectorstore
-    vectorstore = Chroma.from_documents(
-        documents=doc_splits,
-        collection_name="rag-chroma",
-        embedding=embd,
+def _open_index():
+    embd = CachedEmbeddings(OpenAIEmbeddings())
+    os.makedirs(persist_directory, exist_ok=True)
+    vectorstore = Chroma(
+        collection_name=collection_name,
+        embedding_function=embd,
+        persist_directory=persist_directory,
     )
+    store = FingerprintStore(persist_directory)
+    sparse_index = BM25Index(persist_directory)
+    if store.exists() and not sparse_index.exists():
+        # Index built before the BM25 index existed
+        chunks = vectorstore.get(include=["documents"])
+        sparse_index.add(chunks["ids"], chunks["documents"])
+        sparse_index.save()
+    return vectorstore, store, sparse_index
+
+
+def open_vector_store():
+    """
+    Open the persisted vectorstore without indexing anything.
+
+    Returns:
+        Chroma: The vectorstore
+    """
+    return _open_index()[0]
+
+
+def build_vector_store(refresh=False):
+    """
+    Open the persisted vectorstore, indexing the sources if it is empty or a refresh is requested.
+
+    Args:
+        refresh (bool): Re-check every source and re-index only what changed
+
+    Returns:
+        Chroma: The vectorstore
+    """
+    vectorstore, store, sparse_index = _open_index()
+    # Sources that failed to load last time are retried by the next build
+    if store.exists() and not refresh and not store.missing(urls):
+        print("---LOADING PERSISTED INDEX---")
+    else:
+        build_index(vectorstore, store, sparse_index)
     return vectorstore
 
-doc_splits=build_index()
-vectorstore= build_vector_store(doc_splits)
+
+def is_ready():
+    """
+    Readiness probe: True when a persisted index exists, so the first query will not index.
+
+    Cheap enough to call from a health check; nothing is opened or loaded.
+    """
+    return all(os.path.exists(os.path.join(persist_directory, name)) for name in (manifest_name, index_name))
+
+
+def get_vectorstore():
+    """
+    Return the process-wide vectorstore, opening the persisted index on first call.
+
+    Returns:
+        Chroma: The shared vectorstore
+    """
+    global _vectorstore
+    if _vectorstore is None:
+        with _lock:
+            if _vectorstore is None:
+                if not is_ready():
+                    if not build_on_demand:
+                        raise RuntimeError(
+                            f"No index in {persist_directory}; run `python -m chains.indexer build-index`"
+                        )
+                    print("---NO PERSISTED INDEX, BUILDING IT NOW---")
+                    _vectorstore = build_vector_store()
+                else:
+                    # Serving only opens the index: sources missing from it are
+                    # retried by `build-index`, never by a worker's first query
+                    _vectorstore = open_vector_store()
+    return _vectorstore
+
 
 def build_retriever(vectorstore):
-    retriever = vectorstore.as_retriever()
+    retriever = HybridRetriever(
+        vectorstore=vectorstore, sparse_index=BM25Index(persist_directory), k=retrieval_k
+    )
     return retriever
 
-retriever =build_retriever(vectorstore)
 
-from langchain.tools.retriever import create_retriever_tool
+def get_retriever():
+    """
+    Return the process-wide hybrid (BM25 + dense) retriever, opening the index on first call.
+
+    Returns:
+        HybridRetriever: The shared retriever
+    """
+    global _retriever
+    if _retriever is None:
+        # Outside the lock: get_vectorstore takes it too
+        vectorstore = get_vectorstore()
+        with _lock:
+            if _retriever is None:
+                _retriever = build_retriever(vectorstore)
+    return _retriever
+
+
+class LazyRetriever(BaseRetriever):
+    """Stands in for the hybrid retriever, opening the index on the first query instead of at import."""
+
+    def _get_relevant_documents(self, query, *, run_manager) -> List[Document]:
+        return get_retriever().invoke(query)
+
+    async def _aget_relevant_documents(self, query, *, run_manager) -> List[Document]:
+        return await get_retriever().ainvoke(query)
+
+
+retriever = LazyRetriever()
 
-retriever_tool = create_retriever_tool(
-    retriever,
-    "retrieve_blog_posts",
-    "Search and return information about Lilian Weng blog posts on LLM agents, prompt engineering, and adversarial attacks on LLMs.",
-)
+from langchain_core.tools import tool
+
+from shared.fingerprints import chunk_id
+
+
+def chunk_artifact(doc):
+    """Per-chunk record carried in the tool message artifact."""
+    return {
+        "id": doc.id or chunk_id(doc.metadata.get("source", ""), doc.page_content),
+        "content": doc.page_content,
+        "source": doc.metadata.get("source"),
+        "score": doc.metadata.get("rrf_score"),
+        "relevance_score": doc.metadata.get("relevance_score"),
+    }
+
+
+@tool("retrieve_blog_posts", response_format="content_and_artifact")
+def retriever_tool(query: str):
+    """Search and return information about Lilian Weng blog posts on LLM agents, prompt engineering, and adversarial attacks on LLMs."""
+    # The agent reads the text; grade_documents and generate use the chunks in the artifact
+    chunks = [chunk_artifact(d) for d in retriever.invoke(query)]
+    return "\n\n".join(c["content"] for c in chunks), chunks
 
 tools = [retriever_tool]
+
+
+def __getattr__(name):
+    # `vectorstore` used to be built at import; keep it working, lazily
+    if name == "vectorstore":
+        return get_vectorstore()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    # Offline indexing and readiness check:
+    #   python -m chains.indexer build-index [--refresh]
+    #   python -m chains.indexer check        (exit code 0 when ready)
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "build-index":
+        build_vector_store(refresh="--refresh" in sys.argv)
+    elif command == "check":
+        ready = is_ready()
+        print("ready" if ready else f"not ready: no index in {persist_directory}")
+        sys.exit(0 if ready else 1)
+    else:
+        print("usage: python -m chains.indexer build-index [--refresh] | check")
+        sys.exit(2)
@@ -3,7 +3,7 @@ from typing import List
 from typing_extensions import TypedDict
 
 from graph.nodes import *
-from graph.edges import grade_documents
+from graph.edges import decide_to_generate
 
 from chains.indexer import *
 
@@ -18,6 +18,8 @@ class AgentState(TypedDict):
     # The add_messages function defines how an update should be processed
     # Default is to replace. add_messages says "append"
     messages: Annotated[Sequence[BaseMessage], add_messages]
+    # Retrieved chunks graded relevant to the question (replaced on every retrieval)
+    documents: List[dict]
 
 
 def create_graph_app():
@@ -32,6 +34,7 @@ def create_graph_app():
     workflow.add_node("agent", agent)  # agent
     retrieve = ToolNode([retriever_tool])
     workflow.add_node("retrieve", retrieve)  # retrieval
+    workflow.add_node("grade_documents", grade_documents)  # per-chunk relevance grading
     workflow.add_node("rewrite", rewrite)  # Re-writing the question
     workflow.add_node(
         "generate", generate
@@ -52,10 +55,11 @@ def create_graph_app():
     )
 
     # Edges taken after the `action` node is called.
+    workflow.add_edge("retrieve", "grade_documents")
     workflow.add_conditional_edges(
-        "retrieve",
-        # Assess agent decision
-        grade_documents,
+        "grade_documents",
+        # Generate from the relevant chunks, or rewrite if there are none
+        decide_to_generate,
     )
     workflow.add_edge("generate", END)
     workflow.add_edge("rewrite", "agent")
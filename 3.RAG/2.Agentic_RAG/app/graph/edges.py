@@ -12,9 +12,9 @@ from langgraph.prebuilt import tools_condition
 
 ### Edges
 
-def grade_documents(state) -> Literal["generate", "rewrite"]:
+def decide_to_generate(state) -> Literal["generate", "rewrite"]:
     """
-    Determines whether the retrieved documents are relevant to the question.
+    Determines whether any retrieved chunk was graded relevant to the question.
 
     Args:
         state (messages): The current state
@@ -23,50 +23,10 @@ def grade_documents(state) -> Literal["generate", "rewrite"]:
         str: A decision for whether the documents are relevant or not
     """
 
-    print("---CHECK RELEVANCE---")
-
-    # Data model
-    class grade(BaseModel):
-        """Binary score for relevance check."""
-
-        binary_score: str = Field(description="Relevance score 'yes' or 'no'")
-
-    # LLM
-    model = ChatOpenAI(temperature=0, model="gpt-4o-mini", streaming=True)
-
-    # LLM with tool and validation
-    llm_with_tool = model.with_structured_output(grade)
-
-
-    # Prompt
-    prompt = PromptTemplate(
-        template="""You are a grader assessing relevance of a retrieved document to a user question. \n 
-        Here is the retrieved document: \n\n {context} \n\n
-        Here is the user question: {question} \n
-        If the document contains keyword(s) or semantic meaning related to the user question, grade it as relevant. \n
-        Give a binary score 'yes' or 'no' score to indicate whether the document is relevant to the question.""",
-        input_variables=["context", "question"],
-    )
-
-    # Chain
-    chain = prompt | llm_with_tool
-
-    messages = state["messages"]
-    last_message = messages[-1]
-
-    question = messages[0].content
-    docs = last_message.content
-
-    scored_result = chain.invoke({"question": question, "context": docs})
-
-    score = scored_result.binary_score
-
-    if score == "yes":
-        print("---DECISION: DOCS RELEVANT---")
+    if state["documents"]:
+        print(f"---DECISION: {len(state['documents'])} CHUNKS RELEVANT---")
         return "generate"
 
     else:
         print("---DECISION: DOCS NOT RELEVANT---")
-        print(score)
         return "rewrite"
-
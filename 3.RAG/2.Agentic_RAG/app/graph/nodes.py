@@ -9,7 +9,13 @@ from langchain_openai import ChatOpenAI
 
 from langgraph.prebuilt import tools_condition
 
+import os
+
 from chains.indexer import *
+from chains import components
+
+# Chunks graded in parallel by grade_documents
+grading_max_concurrency = int(os.environ.get("GRADING_MAX_CONCURRENCY", 4))
 
 ### Nodes
 
@@ -27,8 +33,7 @@ def agent(state):
     """
     print("---CALL AGENT---")
     messages = state["messages"]
-    model = ChatOpenAI(temperature=0, streaming=True, model="gpt-4-turbo")
-    model = model.bind_tools(tools)
+    model = components.get("agent_model")
     response = model.invoke(messages)
     # We return a list, because this will get added to the existing list
     return {"messages": [response]}
@@ -63,13 +68,57 @@ def rewrite(state):
     ]
 
     # Grader
-    model = ChatOpenAI(temperature=0, model="gpt-4o-mini", streaming=True)
+    model = components.get("rewrite_model")
     response = model.invoke(msg)
     return {"messages": [response]}
 
 
 
 
+def retrieved_chunks(message):
+    """
+    Per-chunk records from a retrieval tool message.
+
+    Falls back to the whole message as a single chunk when it carries no artifact.
+    """
+    chunks = getattr(message, "artifact", None)
+    if chunks:
+        return chunks
+    return [{"id": None, "content": message.content, "source": None, "score": None}]
+
+
+def grade_documents(state):
+    """
+    Grades every retrieved chunk against the question, concurrently, keeping the relevant ones.
+
+    Args:
+        state (messages): The current state
+
+    Returns:
+        dict: The updated state with the relevant chunks in documents
+    """
+    print("---CHECK RELEVANCE---")
+    messages = state["messages"]
+    question = messages[0].content
+    chunks = retrieved_chunks(messages[-1])
+
+    # One call per chunk, so a single irrelevant chunk no longer fails the whole set
+    chain = components.get("relevance_grader")
+    scores = chain.batch(
+        [{"question": question, "context": c["content"]} for c in chunks],
+        config={"max_concurrency": grading_max_concurrency},
+    )
+
+    relevant = []
+    for chunk, scored_result in zip(chunks, scores):
+        if scored_result.binary_score == "yes":
+            print(f"---GRADE: CHUNK {chunk['id']} RELEVANT---")
+            relevant.append(chunk)
+        else:
+            print(f"---GRADE: CHUNK {chunk['id']} NOT RELEVANT---")
+    return {"documents": relevant}
+
+
 def generate(state):
     """
     Generate answer
@@ -83,23 +132,12 @@ def generate(state):
     print("---GENERATE---")
     messages = state["messages"]
     question = messages[0].content
-    last_message = messages[-1]
-
-    question = messages[0].content
-    docs = last_message.content
-
-    # Prompt
-    prompt = hub.pull("rlm/rag-prompt")
-
-    # LLM
-    llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0, streaming=True)
 
-    # Post-processing
-    def format_docs(docs):
-        return "\n\n".join(doc.page_content for doc in docs)
+    # Only the chunks grade_documents found relevant
+    docs = "\n\n".join(chunk["content"] for chunk in state["documents"])
 
-    # Chain
-    rag_chain = prompt | llm | StrOutputParser()
+    # Chain (prompt, LLM and parser are built once, see chains.components)
+    rag_chain = components.get("rag_chain")
 
     # Run
     response = rag_chain.invoke({"context": docs, "question": question})
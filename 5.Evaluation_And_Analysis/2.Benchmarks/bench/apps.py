@@ -0,0 +1,146 @@
+import importlib
+import os
+
+### Benchmarked apps
+#
+# Every graph in the repo with a runnable app, how to build it and how to
+# turn a question into its input. Paths are relative to the repo root; the
+# worker runs each app from its own directory, as the app scripts expect.
+#
+# `env` is applied before the app is imported. "{fixtures}" is the app's
+# cassette directory (persisted indexes recorded with the cassette live
+# there) and "{scratch}" a temporary directory for caches that must start
+# empty on every run.
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+
+
+def _attribute(module, name):
+    return getattr(importlib.import_module(module), name)
+
+
+def _factory(module, name):
+    return _attribute(module, name)()
+
+
+def _message_input(question):
+    from langchain_core.messages import HumanMessage
+
+    return [HumanMessage(content=question)]
+
+
+apps = {
+    "adaptive_rag": {
+        "dir": "3.RAG/1.Adaptive_RAG/app",
+        "build": lambda: _attribute("graph.app_graph", "app"),
+        "input": lambda q: {"question": q},
+        "mode": "sync",
+        "env": {
+            "ADAPTIVE_RAG_INDEX_DIR": "{fixtures}/chroma",
+            "EMBEDDING_CACHE_DIR": "{scratch}/embedding_cache",
+            "ROUTER_DIR": "{scratch}/router",
+        },
+        "questions": [
+            "What are the types of agent memory?",
+            "How does chain of thought prompting work?",
+            "What are adversarial attacks on LLMs?",
+            "Who won the Champions League final in 2024?",
+        ],
+    },
+    "agentic_rag": {
+        "dir": "3.RAG/2.Agentic_RAG/app",
+        "build": lambda: _factory("graph.app_graph", "create_graph_app"),
+        "input": lambda q: {"messages": [("user", q)]},
+        "mode": "sync",
+        "env": {
+            "AGENTIC_RAG_INDEX_DIR": "{fixtures}/chroma",
+            "EMBEDDING_CACHE_DIR": "{scratch}/embedding_cache",
+            "PROMPT_CACHE_DIR": "{scratch}/prompt_cache",
+        },
+        "questions": [
+            "What does Lilian Weng say about the types of agent memory?",
+            "What is few-shot prompting?",
+            "How do jailbreak prompts work?",
+        ],
+    },
+    "code_assistant": {
+        "dir": "2.ChatBots/3.Code_Assistant(WIP)/app",
+        "build": lambda: _attribute("graph.graph", "app"),
+        "input": lambda q: {"messages": [("user", q)], "iterations": 0},
+        "mode": "sync",
+        "env": {
+            # The LCEL docs crawled while recording; replay never crawls
+            "DOC_SNAPSHOT_DIR": "{fixtures}/doc_snapshot",
+            "CODE_ASSISTANT_INDEX_DIR": "{fixtures}/doc_index",
+        },
+        "questions": [
+            "How do I build a RAG chain with LCEL?",
+            "How can I run two runnables in parallel and merge their outputs?",
+        ],
+    },
+    "plan_and_execute": {
+        "dir": "4.Agent-Architectures/2.Planning_Agents/1.Plan-and-Execute(ReACT Agent)/app",
+        "build": lambda: _factory("graph.graph", "create_graph"),
+        "input": lambda q: {"input": q},
+        "mode": "async",
+        "config": {"recursion_limit": 50},
+        "questions": [
+            "What is the hometown of the 2024 Australian Open winner?",
+            "Which country hosted the 2022 FIFA World Cup and what is its capital?",
+        ],
+    },
+    "rewoo": {
+        "dir": "4.Agent-Architectures/2.Planning_Agents/2.Reasoning_without_Observation(ReWOO)/app",
+        "build": lambda: _factory("graph.graph", "create_graph"),
+        "input": lambda q: {"task": q},
+        "mode": "sync",
+        "questions": [
+            "What is the exact hometown of the 2024 mens Australian Open winner?",
+            "Who directed the movie that won Best Picture in 2023?",
+        ],
+    },
+    "reflection": {
+        "dir": "4.Agent-Architectures/3.Reflection_and_Critique/1.Reflection/app",
+        "build": lambda: _factory("graph", "create_graph"),
+        "input": _message_input,
+        "mode": "async",
+        "questions": [
+            "Write an essay on the topicality of The Little Prince and its message in modern life",
+        ],
+    },
+    "collaboration": {
+        "dir": "4.Agent-Architectures/1.Multi-Agent_Systems/1.Collaboration/app/graph",
+        "build": lambda: _attribute("graph", "graph"),
+        "input": lambda q: {"messages": _message_input(q)},
+        "mode": "sync",
+        "config": {"recursion_limit": 150},
+        "questions": [
+            "Fetch the UK's GDP over the past 5 years, then draw a line graph of it.",
+        ],
+    },
+    "supervision": {
+        "dir": "4.Agent-Architectures/1.Multi-Agent_Systems/2.Supervision/app",
+        # Compiled with a checkpointer: the worker gives every request its own thread_id
+        "build": lambda: _attribute("graph", "graph"),
+        "input": lambda q: {"messages": _message_input(q)},
+        "mode": "async",
+        "questions": [
+            "Write an essay on why The Little Prince is still read by adults",
+        ],
+    },
+    "hierarchical_teams": {
+        "dir": "4.Agent-Architectures/1.Multi-Agent_Systems/3.Hierarchical_Teams/app",
+        "build": lambda: _factory("graphs.super_graph", "create_supergraph"),
+        # The state's key is "messages" (app.py passes "input", which the graph ignores)
+        "input": lambda q: {"messages": _message_input(q)},
+        "mode": "async",
+        "config": {"recursion_limit": 100},
+        "questions": [
+            "Write a brief research report on the North American sturgeon.",
+        ],
+    },
+}
+
+
+def app_dir(name):
+    return os.path.join(repo_root, apps[name]["dir"])
@@ -0,0 +1,341 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import warnings
+from collections import Counter
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumpd, load
+from langchain_core.load.serializable import Serializable
+from langchain_core.messages import ToolMessage
+
+### Cassettes
+#
+# A cassette holds every external response one app needs to answer the
+# benchmark questions: chat model generations, embeddings, tool outputs and
+# LangChain Hub prompts, each with how long the real call took.
+#
+#   record  calls the real services for anything not in the cassette yet and
+#           stores the response
+#   replay  serves everything from the cassette, sleeping for the recorded
+#           time (times latency_scale) or for a fixed simulated latency, and
+#           raises CassetteMiss instead of touching the network
+#
+# Chat models are intercepted through LangChain's global LLM cache, so the
+# graph code runs unchanged; embeddings, tools and hub.pull are patched at
+# the class/module level by `install`.
+
+
+class CassetteMiss(KeyError):
+    """A call that is not in the cassette, during replay."""
+
+
+_uuid = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+_address = re.compile(r" at 0x[0-9a-fA-F]+")
+# Message fields that change between a live call and its replay
+_volatile = ("id", "usage_metadata", "response_metadata")
+
+
+def _strip_volatile(obj):
+    if isinstance(obj, dict):
+        obj = {k: _strip_volatile(v) for k, v in obj.items()}
+        if obj.get("lc") == 1 and isinstance(obj.get("kwargs"), dict):
+            for field in _volatile:
+                obj["kwargs"].pop(field, None)
+        return obj
+    if isinstance(obj, list):
+        return [_strip_volatile(v) for v in obj]
+    return obj
+
+
+def normalize(text):
+    """Drop run ids, object addresses and per-call metadata so equal calls get equal keys."""
+    try:
+        text = json.dumps(_strip_volatile(json.loads(text)), sort_keys=True)
+    except ValueError:
+        pass
+    return _address.sub("", _uuid.sub("<uuid>", text))
+
+
+def canonical(value):
+    """Stable string for tool inputs and other plain values."""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def encode(value):
+    if isinstance(value, Serializable):
+        return {"lc_object": dumpd(value)}
+    if isinstance(value, tuple):
+        return {"tuple": [encode(v) for v in value]}
+    try:
+        json.dumps(value)
+        return {"json": value}
+    except TypeError:
+        return {"json": str(value)}
+
+
+def decode(value):
+    if "lc_object" in value:
+        return _load(value["lc_object"])
+    if "tuple" in value:
+        return tuple(decode(v) for v in value["tuple"])
+    return value["json"]
+
+
+def _load(obj):
+    with warnings.catch_warnings():
+        # load() warns that it is in beta
+        warnings.simplefilter("ignore")
+        return load(obj)
+
+
+class Cassette:
+    """
+    Recorded responses for one app, stored as JSON.
+
+    Attributes:
+        path: The cassette file
+        mode: "record" or "replay"
+        latency_scale: Multiplier applied to recorded latencies during replay
+        latency: Fixed seconds per call during replay, overriding the recorded ones
+        stats: Calls served per kind ("llm", "embeddings", "tools", "prompts") and new recordings
+    """
+
+    kinds = ("llm", "embeddings", "tools", "prompts")
+
+    def __init__(self, path, mode="replay", latency_scale=1.0, latency=None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"mode must be 'record' or 'replay', not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.latency = latency
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self.entries = {kind: {} for kind in self.kinds}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries.update(json.load(f))
+        elif mode == "replay":
+            raise FileNotFoundError(f"No cassette at {path}; record one first with --record")
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha256("\x1f".join(normalize(p) for p in parts).encode()).hexdigest()
+
+    def has(self, kind, key):
+        return key in self.entries[kind]
+
+    def get(self, kind, key, what=""):
+        """
+        Return the recorded entry, or None when recording and it is missing.
+
+        Raises:
+            CassetteMiss: When replaying and the call was never recorded
+        """
+        entry = self.entries[kind].get(key)
+        if entry is None and self.mode == "replay":
+            raise CassetteMiss(
+                f"{kind} call not in {self.path}{': ' + what[:200] if what else ''}; "
+                "re-record with --record"
+            )
+        if entry is not None:
+            with self._lock:
+                self.stats[kind] += 1
+        return entry
+
+    def put(self, kind, key, value, seconds):
+        with self._lock:
+            self.entries[kind][key] = {"value": value, "seconds": seconds}
+            self.stats[kind] += 1
+            self.stats["recorded"] += 1
+
+    def delay(self, entry):
+        """Seconds to sleep before serving an entry."""
+        if self.mode == "record":
+            return 0.0
+        if self.latency is not None:
+            return self.latency
+        return entry["seconds"] * self.latency_scale
+
+    def wait(self, entry):
+        seconds = self.delay(entry)
+        if seconds:
+            time.sleep(seconds)
+
+    async def await_(self, entry):
+        seconds = self.delay(entry)
+        if seconds:
+            await asyncio.sleep(seconds)
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with self._lock, open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+class CassetteCache(BaseCache):
+    """LLM cache backed by a cassette; installed with set_llm_cache."""
+
+    def __init__(self, cassette):
+        self.cassette = cassette
+        # key -> when the live call started, to record its latency in update()
+        self._started = {}
+
+    def _lookup(self, prompt, llm_string):
+        key = self.cassette.key(prompt, llm_string)
+        entry = self.cassette.get("llm", key, prompt)
+        if entry is None:
+            self._started[key] = time.perf_counter()
+        return key, entry
+
+    def lookup(self, prompt, llm_string):
+        _, entry = self._lookup(prompt, llm_string)
+        if entry is None:
+            return None
+        self.cassette.wait(entry)
+        return [_load(g) for g in entry["value"]]
+
+    async def alookup(self, prompt, llm_string):
+        _, entry = self._lookup(prompt, llm_string)
+        if entry is None:
+            return None
+        await self.cassette.await_(entry)
+        return [_load(g) for g in entry["value"]]
+
+    def update(self, prompt, llm_string, return_val):
+        key = self.cassette.key(prompt, llm_string)
+        started = self._started.pop(key, None)
+        seconds = time.perf_counter() - started if started is not None else 0.0
+        self.cassette.put("llm", key, [dumpd(g) for g in return_val], seconds)
+
+    async def aupdate(self, prompt, llm_string, return_val):
+        self.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs):
+        self.cassette.entries["llm"].clear()
+
+
+def _patch_embeddings(cassette):
+    from langchain_openai import OpenAIEmbeddings
+
+    original = OpenAIEmbeddings.embed_documents
+
+    def lookup(self, texts):
+        keys = [cassette.key(self.model, t) for t in texts]
+        missing = [i for i, k in enumerate(keys) if not cassette.has("embeddings", k)]
+        if missing and cassette.mode == "record":
+            started = time.perf_counter()
+            vectors = original(self, [texts[i] for i in missing])
+            seconds = time.perf_counter() - started
+            for i, vector in zip(missing, vectors):
+                cassette.put("embeddings", keys[i], vector, seconds)
+        entries = [cassette.get("embeddings", k, t) for k, t in zip(keys, texts)]
+        # One batch call: the slowest recorded batch it was part of
+        slowest = max(entries, key=lambda e: e["seconds"], default=None)
+        return [e["value"] for e in entries], slowest
+
+    def embed_documents(self, texts, chunk_size=None, **kwargs):
+        vectors, slowest = lookup(self, texts)
+        if slowest:
+            cassette.wait(slowest)
+        return vectors
+
+    async def aembed_documents(self, texts, chunk_size=None, **kwargs):
+        vectors, slowest = await asyncio.to_thread(lookup, self, texts)
+        if slowest:
+            await cassette.await_(slowest)
+        return vectors
+
+    def embed_query(self, text, **kwargs):
+        return embed_documents(self, [text])[0]
+
+    async def aembed_query(self, text, **kwargs):
+        return (await aembed_documents(self, [text]))[0]
+
+    OpenAIEmbeddings.embed_documents = embed_documents
+    OpenAIEmbeddings.aembed_documents = aembed_documents
+    OpenAIEmbeddings.embed_query = embed_query
+    OpenAIEmbeddings.aembed_query = aembed_query
+
+
+def _replayed_tool_output(value, kwargs):
+    result = decode(value)
+    tool_call_id = kwargs.get("tool_call_id")
+    if isinstance(result, ToolMessage) and tool_call_id:
+        # Same input called under a different tool call id
+        result = result.model_copy(update={"tool_call_id": tool_call_id})
+    return result
+
+
+def _patch_tools(cassette):
+    from langchain_core.tools import BaseTool
+
+    original_run, original_arun = BaseTool.run, BaseTool.arun
+
+    def run(self, tool_input, *args, **kwargs):
+        key = cassette.key(self.name, canonical(tool_input))
+        entry = cassette.get("tools", key, f"{self.name}({canonical(tool_input)})")
+        if entry is None:
+            started = time.perf_counter()
+            result = original_run(self, tool_input, *args, **kwargs)
+            cassette.put("tools", key, encode(result), time.perf_counter() - started)
+            return result
+        cassette.wait(entry)
+        return _replayed_tool_output(entry["value"], kwargs)
+
+    async def arun(self, tool_input, *args, **kwargs):
+        key = cassette.key(self.name, canonical(tool_input))
+        entry = cassette.get("tools", key, f"{self.name}({canonical(tool_input)})")
+        if entry is None:
+            started = time.perf_counter()
+            result = await original_arun(self, tool_input, *args, **kwargs)
+            cassette.put("tools", key, encode(result), time.perf_counter() - started)
+            return result
+        await cassette.await_(entry)
+        return _replayed_tool_output(entry["value"], kwargs)
+
+    BaseTool.run = run
+    BaseTool.arun = arun
+
+
+def _patch_hub(cassette):
+    try:
+        from langchain import hub
+    except ImportError:
+        return
+
+    original = hub.pull
+
+    def pull(owner_repo_commit, *args, **kwargs):
+        key = cassette.key(owner_repo_commit)
+        entry = cassette.get("prompts", key, owner_repo_commit)
+        if entry is None:
+            prompt = original(owner_repo_commit, *args, **kwargs)
+            cassette.put("prompts", key, dumpd(prompt), 0.0)
+            return prompt
+        return _load(entry["value"])
+
+    hub.pull = pull
+
+
+def install(cassette):
+    """
+    Route chat models, OpenAI embeddings, tools and hub.pull through the cassette.
+
+    Call before importing the app, since some apps pull prompts at import time.
+    """
+    from langchain_core.globals import set_llm_cache
+
+    set_llm_cache(CassetteCache(cassette))
+    _patch_embeddings(cassette)
+    _patch_tools(cassette)
+    _patch_hub(cassette)
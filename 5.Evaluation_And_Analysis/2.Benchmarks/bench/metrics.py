@@ -0,0 +1,153 @@
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+### Per-request metrics
+#
+# A callback handler passed in the graph's config. LangGraph tags every node
+# run with its node name in metadata["langgraph_node"]; the run whose name
+# matches it is the node itself. Nodes of subgraphs (Hierarchical Teams) have
+# a nested checkpoint namespace ("parent|child") and are reported under
+# "parent/child", but only top-level nodes count towards graph overhead:
+#
+#   graph overhead = request wall time - sum of top-level node wall times
+#
+# i.e. time spent in LangGraph itself (scheduling, channel updates, state
+# merging, checkpoints) and in conditional edges.
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+class RequestMetrics(BaseCallbackHandler):
+    """Node timings, LLM calls and token usage for one graph invocation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # run id -> (node path, top level, started at)
+        self._running = {}
+        # node path -> {"calls", "seconds"}
+        self.nodes = {}
+        self.top_level_seconds = 0.0
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        if node is None or kwargs.get("name") != node:
+            return
+        namespace = metadata.get("langgraph_checkpoint_ns", "")
+        parents = [part.split(":")[0] for part in namespace.split("|")[:-1]]
+        path = "/".join(parents + [node])
+        with self._lock:
+            self._running[run_id] = (path, not parents, time.perf_counter())
+
+    def _node_end(self, run_id):
+        with self._lock:
+            running = self._running.pop(run_id, None)
+            if running is None:
+                return
+            path, top_level, started = running
+            seconds = time.perf_counter() - started
+            entry = self.nodes.setdefault(path, {"calls": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            if top_level:
+                self.top_level_seconds += seconds
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._node_end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._node_end(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        with self._lock:
+            self.llm_calls += 1
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        with self._lock:
+            self.llm_calls += 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    completion_tokens += usage.get("output_tokens", 0)
+        if not (prompt_tokens or completion_tokens):
+            # Completion models and older chat models report usage here instead
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def summary(self, wall_seconds):
+        """
+        Args:
+            wall_seconds (float): Wall time of the whole invocation
+
+        Returns:
+            dict: Metrics for the request, times in milliseconds
+        """
+        return {
+            "wall_ms": 1000 * wall_seconds,
+            "graph_overhead_ms": 1000 * max(wall_seconds - self.top_level_seconds, 0.0),
+            "nodes": {
+                path: {"calls": entry["calls"], "ms": 1000 * entry["seconds"]}
+                for path, entry in sorted(self.nodes.items())
+            },
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+        }
+
+
+def aggregate(requests):
+    """
+    Summarize the per-request metrics of one app.
+
+    Returns:
+        dict: Wall time and overhead percentiles, mean LLM calls and tokens, and per-node totals
+    """
+    ok = [r for r in requests if not r.get("error")]
+    walls = [r["wall_ms"] for r in ok]
+    overheads = [r["graph_overhead_ms"] for r in ok]
+    nodes = {}
+    for r in ok:
+        for path, entry in r["nodes"].items():
+            total = nodes.setdefault(path, {"calls": 0, "ms": 0.0})
+            total["calls"] += entry["calls"]
+            total["ms"] += entry["ms"]
+    for total in nodes.values():
+        total["mean_ms"] = total["ms"] / total["calls"]
+
+    def mean(key):
+        return sum(r[key] for r in ok) / len(ok) if ok else None
+
+    return {
+        "requests": len(requests),
+        "errors": len(requests) - len(ok),
+        "wall_ms": {"mean": mean("wall_ms"), "p50": percentile(walls, 50), "p95": percentile(walls, 95)},
+        "graph_overhead_ms": {
+            "mean": mean("graph_overhead_ms"),
+            "p50": percentile(overheads, 50),
+            "p95": percentile(overheads, 95),
+        },
+        "llm_calls_per_request": mean("llm_calls"),
+        "tool_calls_per_request": mean("tool_calls"),
+        "tokens_per_request": mean("total_tokens"),
+        "nodes": nodes,
+    }
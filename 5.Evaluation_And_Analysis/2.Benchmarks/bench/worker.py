@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+import uuid
+
+from bench.apps import app_dir, apps
+from bench.cassette import Cassette, install
+from bench.metrics import RequestMetrics
+
+### Benchmark worker
+#
+# Runs one app's questions in a fresh process:  python -m bench.worker --app NAME ...
+# The apps import top-level packages with clashing names (graph, chains,
+# nodes), so each one gets its own interpreter, started in the app's
+# directory with that directory first on sys.path. run_benchmarks.py starts
+# one worker per app and collects their JSON output.
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark one app")
+    parser.add_argument("--app", required=True, choices=sorted(apps))
+    parser.add_argument("--cassettes", required=True, help="Directory holding one sub-directory per app")
+    parser.add_argument("--record", action="store_true")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--latency", type=float, default=None)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", required=True)
+    return parser.parse_args(argv)
+
+
+def prepare_environment(spec, fixtures, scratch, record):
+    for name, value in spec.get("env", {}).items():
+        os.environ[name] = value.format(fixtures=fixtures, scratch=scratch)
+    # Runs must not report to LangSmith
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    # tiktoken downloads its encodings on first use: recording stores them
+    # next to the cassette, so that token counting works offline on replay
+    os.environ["TIKTOKEN_CACHE_DIR"] = os.path.join(fixtures, "tiktoken")
+    if not record:
+        # Never used: every call is served from the cassette
+        for name in ("OPENAI_API_KEY", "TAVILY_API_KEY", "LANGCHAIN_API_KEY"):
+            os.environ.setdefault(name, "replay")
+
+
+def invoke(graph, spec, question, handler, loop):
+    """
+    Answer one question.
+
+    Async apps run on the worker's single event loop, never a new loop per
+    question: clients cached by the app (e.g. langchain_openai's httpx client)
+    are bound to the loop that first used them. Every request gets a fresh
+    thread_id, for graphs compiled with a checkpointer.
+    """
+    config = {
+        **spec.get("config", {}),
+        "configurable": {"thread_id": str(uuid.uuid4())},
+        "callbacks": [handler],
+    }
+    if spec["mode"] == "async":
+        return loop.run_until_complete(graph.ainvoke(spec["input"](question), config=config))
+    return graph.invoke(spec["input"](question), config=config)
+
+
+def run(args):
+    spec = apps[args.app]
+    directory = app_dir(args.app)
+    fixtures = os.path.join(os.path.abspath(args.cassettes), args.app)
+    os.chdir(directory)
+    sys.path.insert(0, directory)
+
+    cassette = Cassette(
+        os.path.join(fixtures, "cassette.json"),
+        mode="record" if args.record else "replay",
+        latency_scale=args.latency_scale,
+        latency=args.latency,
+    )
+    with tempfile.TemporaryDirectory(prefix=f"bench-{args.app}-") as scratch:
+        prepare_environment(spec, fixtures, scratch, args.record)
+        install(cassette)
+
+        started = time.perf_counter()
+        graph = spec["build"]()
+        build_ms = 1000 * (time.perf_counter() - started)
+
+        requests = []
+        loop = asyncio.new_event_loop()
+        for question in spec["questions"] * args.repeat:
+            handler = RequestMetrics()
+            before = dict(cassette.stats)
+            started = time.perf_counter()
+            error = None
+            try:
+                invoke(graph, spec, question, handler, loop)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                traceback.print_exc()
+            result = {"question": question, **handler.summary(time.perf_counter() - started)}
+            for kind, key in (("tools", "tool_calls"), ("embeddings", "embedding_calls")):
+                result[key] = cassette.stats[kind] - before.get(kind, 0)
+            result["error"] = error
+            requests.append(result)
+        loop.close()
+
+    if args.record:
+        cassette.save()
+    return {"app": args.app, "build_ms": build_ms, "requests": requests}
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    output = run(args)
+    with open(args.output, "w") as f:
+        json.dump(output, f)
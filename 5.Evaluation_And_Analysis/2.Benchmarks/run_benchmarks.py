@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.apps import app_dir, apps
+from bench.metrics import aggregate
+
+### Offline benchmarks for every graph in the repo
+#
+# Record the OpenAI / Tavily / hub responses once (needs API keys and network):
+#
+#   python run_benchmarks.py --record
+#
+# then replay them as often as needed, offline, with the recorded latencies
+# (optionally scaled) or a fixed simulated latency per call:
+#
+#   python run_benchmarks.py                                  # recorded latencies
+#   python run_benchmarks.py --latency-scale 0                # graph + local work only
+#   python run_benchmarks.py --latency 0.2 --apps rewoo reflection
+#   python run_benchmarks.py --repeat 5 --output results/main.json
+#
+# No cassettes ship with the repo yet: replay fails with "No cassette at ..."
+# for every app until one was recorded (and committed, to share it).
+# Recording also keeps what replay needs besides the responses in the app's
+# cassette directory: persisted indexes, the Code Assistant's doc snapshot
+# and tiktoken's encodings.
+#
+# Per request it reports wall time, per-node wall time, graph overhead
+# (wall time not spent inside a top-level node), LLM calls, tool calls,
+# embedding calls and tokens; per app, percentiles and means of those. See
+# bench/ for how calls are recorded (cassette.py) and measured (metrics.py).
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the repo's graphs against recorded responses")
+    parser.add_argument("--apps", nargs="+", choices=sorted(apps), default=sorted(apps))
+    parser.add_argument("--cassettes", default=os.path.join(here, "cassettes"))
+    parser.add_argument("--record", action="store_true", help="Call the real services and record what is missing")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for recorded latencies")
+    parser.add_argument("--latency", type=float, default=None, help="Fixed seconds per replayed call")
+    parser.add_argument("--repeat", type=int, default=1, help="Times to ask each question")
+    parser.add_argument("--output", default=None, help="JSON results file (default: print only)")
+    parser.add_argument("--verbose", action="store_true", help="Show the apps' own output")
+    return parser.parse_args()
+
+
+def run_app(name, args):
+    """
+    Run one app in its own worker process.
+
+    Returns:
+        dict: The worker's results, or {"error": ...} when the worker failed
+    """
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        output = f.name
+    command = [
+        sys.executable, "-m", "bench.worker",
+        "--app", name,
+        "--cassettes", os.path.abspath(args.cassettes),
+        "--latency-scale", str(args.latency_scale),
+        "--repeat", str(args.repeat),
+        "--output", output,
+    ]
+    if args.latency is not None:
+        command += ["--latency", str(args.latency)]
+    if args.record:
+        command.append("--record")
+
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")]))}
+    quiet = {} if args.verbose else {"stdout": subprocess.DEVNULL}
+    try:
+        completed = subprocess.run(command, cwd=here, env=env, **quiet)
+        if completed.returncode != 0:
+            return {"app": name, "error": f"worker exited with {completed.returncode}"}
+        with open(output) as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+
+def print_table(results):
+    print(
+        f"{'app':<20} {'reqs':>4} {'err':>3} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'overhead ms':>11} {'LLM calls':>9} {'tool calls':>10} {'tokens':>8}"
+    )
+    for name, result in results.items():
+        if "summary" not in result:
+            print(f"{name:<20} {result.get('error')}")
+            continue
+        s = result["summary"]
+
+        def fmt(value, spec):
+            return format(value, spec) if value is not None else "-"
+
+        print(
+            f"{name:<20} {s['requests']:>4} {s['errors']:>3} {fmt(s['wall_ms']['p50'], '9.1f')} "
+            f"{fmt(s['wall_ms']['p95'], '9.1f')} {fmt(s['graph_overhead_ms']['mean'], '11.2f')} "
+            f"{fmt(s['llm_calls_per_request'], '9.1f')} {fmt(s['tool_calls_per_request'], '10.1f')} "
+            f"{fmt(s['tokens_per_request'], '8.0f')}"
+        )
+
+
+def main():
+    args = parse_args()
+    results = {}
+    for name in args.apps:
+        print(f"---{'RECORDING' if args.record else 'BENCHMARKING'} {name} ({app_dir(name)})---", file=sys.stderr)
+        result = run_app(name, args)
+        if "requests" in result:
+            result["summary"] = aggregate(result["requests"])
+        results[name] = result
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "mode": "record" if args.record else "replay",
+        "latency_scale": args.latency_scale,
+        "latency": args.latency,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "apps": results,
+    }
+    print_table(results)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    # Non-zero exit when any app failed, so CI notices missing recordings
+    failed = any("summary" not in r or r["summary"]["errors"] for r in results.values())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
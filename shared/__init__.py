@@ -0,0 +1,2 @@
+# Modules used by more than one app. Each app puts the repository root on
+# sys.path from its own package (e.g. utils/__init__.py) before importing them.
@@ -0,0 +1,129 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+### Sparse keyword index
+#
+# An inverted index with BM25 scoring over chunk ids, saved as bm25.json.
+# The RAG apps keep one next to their Chroma collection, updated by
+# shared.pipeline whenever chunks are upserted or deleted; the Code Assistant
+# keeps one next to its documentation chunks (chains.doc_index). Chunk ids are
+# the same as in the store next to it, where the text and metadata of a hit
+# are read back from.
+
+index_name = "bm25.json"
+
+stopwords = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "how", "i", "in", "is", "it", "of", "on", "or", "that", "the", "this",
+    "to", "what", "when", "where", "which", "who", "why", "with", "you", "your",
+}
+
+# BM25 parameters
+k1 = 1.5
+b = 0.75
+
+
+def tokenize(text):
+    return [t for t in re.findall(r"[a-z0-9_]+", text.lower()) if t not in stopwords]
+
+
+class BM25Index:
+    """
+    Persisted BM25 inverted index over chunk ids.
+
+    Attributes:
+        path: The JSON file the index is saved to
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, index_name)
+        self._lock = threading.Lock()
+        # term -> {chunk id: term frequency}
+        self._postings = {}
+        # chunk id -> number of tokens
+        self._lengths = {}
+        # chunk id -> its distinct terms, so removing a chunk only touches its own postings
+        self._terms = {}
+        self._total_length = 0
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                saved = json.load(f)
+            self._postings = saved["postings"]
+            self._lengths = saved["lengths"]
+            self._total_length = sum(self._lengths.values())
+            for term, postings in self._postings.items():
+                for chunk_id in postings:
+                    self._terms.setdefault(chunk_id, []).append(term)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, ids, texts):
+        """Index chunks, replacing any already indexed under the same id."""
+        with self._lock:
+            for chunk_id, text in zip(ids, texts):
+                self._remove([chunk_id])
+                terms = Counter(tokenize(text))
+                for term, tf in terms.items():
+                    self._postings.setdefault(term, {})[chunk_id] = tf
+                length = sum(terms.values())
+                self._terms[chunk_id] = list(terms)
+                self._lengths[chunk_id] = length
+                self._total_length += length
+
+    def remove(self, ids):
+        with self._lock:
+            self._remove(ids)
+
+    def _remove(self, ids):
+        for chunk_id in set(ids):
+            if chunk_id not in self._lengths:
+                continue
+            for term in self._terms.pop(chunk_id, []):
+                postings = self._postings[term]
+                del postings[chunk_id]
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= self._lengths.pop(chunk_id)
+
+    def search(self, query, k):
+        """
+        Rank chunks by BM25 score against the query.
+
+        Args:
+            query (str): The query
+            k (int): Number of results
+
+        Returns:
+            list: (chunk id, score) pairs, best first
+        """
+        with self._lock:
+            n = len(self._lengths)
+            if not n:
+                return []
+            average_length = self._total_length / n
+            scores = Counter()
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    norm = k1 * (1 - b + b * self._lengths[chunk_id] / average_length)
+                    scores[chunk_id] += idf * tf * (k1 + 1) / (tf + norm)
+        return scores.most_common(k)
+
+    def save(self):
+        with self._lock:
+            payload = {"postings": self._postings, "lengths": self._lengths}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.path)
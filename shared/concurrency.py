@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+### Running coroutines from synchronous code
+#
+# Graph nodes and edges are called synchronously by app.stream / app.invoke,
+# yet some of them fan out with asyncio (document grading, web searches,
+# best-of-N generation). Every such call runs on one event loop that lives in
+# a daemon thread for the whole process, never on a new loop per call: async
+# HTTP clients are cached per process (langchain_openai keeps a single
+# httpx.AsyncClient) and their pooled keep-alive connections belong to the
+# loop that opened them. With asyncio.run per call, the second call in a
+# process fails with "RuntimeError: Event loop is closed".
+
+_loop = None
+_lock = threading.Lock()
+
+
+def background_loop():
+    """The process-wide event loop, running in a daemon thread from the first call on."""
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="run-sync-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run_sync(coro):
+    """
+    Run a coroutine to completion from synchronous code.
+
+    The coroutine runs on background_loop(), so this also works when the
+    caller's thread has an event loop of its own running (it blocks that loop
+    while waiting, as any synchronous call would).
+
+    Args:
+        coro (coroutine): The coroutine to run
+
+    Returns:
+        The coroutine's result
+    """
+    loop = background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync called from the background loop itself; await the coroutine instead")
+
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result()
+    except BaseException:
+        # Interrupted (e.g. KeyboardInterrupt): do not leave the coroutine running
+        future.cancel()
+        raise
@@ -0,0 +1,311 @@
+import atexit
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no file locks, keep one process per cache directory
+    fcntl = None
+
+### Content-addressed embedding cache
+#
+# Vectors live in one append-only float32 file (vectors.f32) that is read
+# through a memory map. index.jsonl is an append-only log: a header line
+# {"generation": <uuid>}, then one [key, offset, dim] line per stored vector, the key being
+# "<model>:<sha256(text)>", so a put appends to both files instead of
+# rewriting an index. When the vector file grows past the byte budget the
+# least recently used vectors are dropped and both files are rewritten.
+# Last-used times are kept in memory and merged into usage.json by flush()
+# and before every compaction.
+#
+# Processes can share a directory. Appends and compactions hold an exclusive
+# lock on its lock file and first read what other processes appended to the
+# log, so offsets and evictions are computed from the whole index. A
+# compaction writes both files with a new generation. Other processes compare
+# the generation (not the file's inode, which the OS reuses) under the lock
+# and then reload the whole index and re-map the vector file together, so an
+# index is never used with a vector file it does not describe.
+
+cache_dir = os.environ.get("EMBEDDING_CACHE_DIR", "./.embedding_cache")
+
+# 512 MB is roughly 85k vectors of text-embedding-ada-002 / text-embedding-3-small
+max_bytes = int(os.environ.get("EMBEDDING_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+class EmbeddingCache:
+    """
+    Disk-backed store of embedding vectors keyed by (model name, sha256(text)).
+
+    Attributes:
+        directory: Folder holding vectors.f32, index.jsonl and usage.json
+        max_bytes: Size budget of the vector file
+        hits / misses / evictions: Counters since the cache was opened
+    """
+
+    def __init__(self, directory=cache_dir, max_bytes=max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.log_path = os.path.join(directory, "index.jsonl")
+        self.usage_path = os.path.join(directory, "usage.json")
+        self.lock_path = os.path.join(directory, "lock")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._matrix = None
+
+        os.makedirs(directory, exist_ok=True)
+        # key -> [offset (in floats), dim]
+        self._index = {}
+        # key -> last used (time.time()), for keys used since the last flush
+        self._used = {}
+        # Generation of the log the index was read from, and how far
+        self._generation = None
+        self._log_pos = 0
+        with self._file_lock(shared=True):
+            self._refresh()
+
+    @staticmethod
+    def key(model, text):
+        return f"{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    @contextlib.contextmanager
+    def _file_lock(self, shared=False):
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _size(self):
+        return os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+
+    def _map(self):
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r") if self._size() else None
+
+    def _refresh(self):
+        """
+        Catch up with the log: read the lines other processes appended, or all of it
+        after a compaction, and re-map the vector file. Needs the file lock.
+        """
+        try:
+            f = open(self.log_path, "rb")
+        except FileNotFoundError:
+            self._index, self._generation, self._log_pos = {}, None, 0
+            self._matrix = self._map()
+            return
+        with f:
+            header = f.readline()
+            generation = json.loads(header)["generation"] if header else None
+            size = os.fstat(f.fileno()).st_size
+            if generation != self._generation or size < self._log_pos:
+                # Compacted (or new): the whole index changed
+                self._index, self._generation, self._log_pos = {}, generation, f.tell()
+            elif size == self._log_pos and self._matrix is not None:
+                return
+            f.seek(self._log_pos)
+            data = f.read(size - self._log_pos)
+        for line in data.splitlines():
+            key, offset, dim = json.loads(line)
+            self._index[key] = [offset, dim]
+        self._log_pos = size
+        # The map has to match the index: both are taken under the same lock
+        self._matrix = self._map()
+
+    def get_many(self, model, texts):
+        """
+        Look up cached vectors.
+
+        Args:
+            model (str): Embedding model name
+            texts (list): Texts to look up
+
+        Returns:
+            list: A vector (list of floats) per text, or None where it is not cached
+        """
+        results = []
+        with self._lock:
+            keys = [self.key(model, text) for text in texts]
+            if any(key not in self._index for key in keys):
+                # Another process may have stored (or compacted) since
+                with self._file_lock(shared=True):
+                    self._refresh()
+            now = time.time()
+            for key in keys:
+                entry = self._index.get(key)
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                offset, dim = entry
+                self._used[key] = now
+                self.hits += 1
+                results.append(self._matrix[offset : offset + dim].tolist())
+        return results
+
+    def put_many(self, model, texts, vectors):
+        """Append vectors for the given texts, then evict if over budget."""
+        with self._lock, self._file_lock():
+            self._refresh()
+            offset = self._size() // 4
+            now = time.time()
+            lines = []
+            with open(self.vectors_path, "ab") as f:
+                for text, vector in zip(texts, vectors):
+                    key = self.key(model, text)
+                    if key in self._index:
+                        continue
+                    array = np.asarray(vector, dtype=np.float32)
+                    f.write(array.tobytes())
+                    self._index[key] = [offset, len(array)]
+                    self._used[key] = now
+                    lines.append(json.dumps([key, offset, len(array)]) + "\n")
+                    offset += len(array)
+            if lines:
+                if self._generation is None:
+                    # No log yet (_refresh just looked, under the lock)
+                    self._generation = uuid.uuid4().hex
+                    lines.insert(0, json.dumps({"generation": self._generation}) + "\n")
+                # Vectors first: a log line never points past the end of the file
+                with open(self.log_path, "a") as f:
+                    f.write("".join(lines))
+                    self._log_pos = f.tell()
+
+            if self._size() > self.max_bytes:
+                self._evict()
+            self._matrix = self._map()
+
+    def _evict(self):
+        """Drop least recently used vectors until under budget, then compact both files. Needs the file lock."""
+        used = self._usage()
+        budget_floats = self.max_bytes // 4
+        live, total = [], 0
+        for key, entry in sorted(self._index.items(), key=lambda kv: -used.get(kv[0], 0.0)):
+            if total + entry[1] > budget_floats:
+                self.evictions += 1
+                continue
+            live.append((key, entry))
+            total += entry[1]
+
+        matrix = self._map()
+        generation = uuid.uuid4().hex
+        new_index, offset, lines = {}, 0, [json.dumps({"generation": generation}) + "\n"]
+        with open(self.vectors_path + ".tmp", "wb") as f:
+            for key, (old_offset, dim) in sorted(live, key=lambda kv: kv[1][0]):
+                f.write(np.asarray(matrix[old_offset : old_offset + dim]).tobytes())
+                new_index[key] = [offset, dim]
+                lines.append(json.dumps([key, offset, dim]) + "\n")
+                offset += dim
+        with open(self.log_path + ".tmp", "w") as f:
+            f.write("".join(lines))
+            log_pos = f.tell()
+        self._matrix = None
+        del matrix
+        os.replace(self.vectors_path + ".tmp", self.vectors_path)
+        os.replace(self.log_path + ".tmp", self.log_path)
+        self._index, self._generation, self._log_pos = new_index, generation, log_pos
+        self._save_usage({key: used[key] for key in new_index if key in used})
+
+    def _usage(self):
+        """Last-used times saved by every process, updated with this one's."""
+        used = {}
+        if os.path.exists(self.usage_path):
+            with open(self.usage_path) as f:
+                used = json.load(f)
+        for key, last_used in self._used.items():
+            if last_used > used.get(key, 0.0):
+                used[key] = last_used
+        return used
+
+    def _save_usage(self, used):
+        tmp_path = self.usage_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(used, f)
+        os.replace(tmp_path, self.usage_path)
+        self._used = {}
+
+    def flush(self):
+        """Persist last-used times so LRU order survives restarts."""
+        with self._lock:
+            if not self._used:
+                return
+            with self._file_lock():
+                self._refresh()
+                used = self._usage()
+                self._save_usage({key: last_used for key, last_used in used.items() if key in self._index})
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._index),
+            "bytes": self._size(),
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only sends texts missing from the cache to the wrapped model.
+
+    Example:
+        embd = CachedEmbeddings(OpenAIEmbeddings())
+    """
+
+    def __init__(self, embeddings, cache=None):
+        self.embeddings = embeddings
+        self.cache = cache or shared_cache()
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        dimensions = getattr(embeddings, "dimensions", None)
+        if dimensions:
+            self.model = f"{self.model}@{dimensions}"
+
+    def embed_documents(self, texts):
+        vectors = self.cache.get_many(self.model, texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            # Embed each distinct missing text once
+            todo = list(dict.fromkeys(texts[i] for i in missing))
+            fresh = dict(zip(todo, self.embeddings.embed_documents(todo)))
+            self.cache.put_many(self.model, todo, [fresh[t] for t in todo])
+            for i in missing:
+                vectors[i] = fresh[texts[i]]
+        return vectors
+
+    def embed_query(self, text):
+        vector = self.cache.get_many(self.model, [text])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many(self.model, [text], [vector])
+        return vector
+
+    def stats(self):
+        return self.cache.stats()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def shared_cache():
+    """The process-wide cache instance used by every CachedEmbeddings by default."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = EmbeddingCache()
+                atexit.register(_shared_cache.flush)
+    return _shared_cache
@@ -0,0 +1,61 @@
+import hashlib
+import json
+import os
+
+### Fingerprints for incremental indexing
+#
+# Every indexed source URL keeps its HTTP validators (ETag / Last-Modified),
+# a hash of its extracted text and the IDs of the chunks it produced.
+# Chunk IDs are content hashes, so an unchanged chunk keeps its ID (and its
+# embedding) across re-indexing runs.
+
+manifest_name = "fingerprints.json"
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(source, text):
+    """Content-addressed ID for a chunk of a given source."""
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()
+
+
+class FingerprintStore:
+    """
+    Manifest of source and chunk fingerprints, kept next to the Chroma collection.
+
+    Attributes:
+        path: Location of the JSON manifest
+        sources: url -> {"etag", "last_modified", "text_hash", "chunk_ids"}
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, manifest_name)
+        self.sources = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.sources = json.load(f).get("sources", {})
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def get(self, url):
+        return self.sources.get(url, {})
+
+    def missing(self, urls):
+        """The sources that were never indexed, e.g. because they failed to load."""
+        return [url for url in urls if url not in self.sources]
+
+    def chunk_ids(self):
+        return sorted(i for fp in self.sources.values() for i in fp.get("chunk_ids", []))
+
+    def version(self):
+        """Hash of every indexed chunk ID; changes whenever the index content changes."""
+        return text_hash("\n".join(self.chunk_ids()))[:16]
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": self.version(), "sources": self.sources}, f, indent=2)
+        os.replace(tmp_path, self.path)
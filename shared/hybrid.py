@@ -0,0 +1,131 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from shared.fingerprints import chunk_id
+
+### Hybrid retrieval
+#
+# Runs a dense similarity search on the Chroma collection and a BM25 keyword
+# search on shared.bm25.BM25Index side by side, then merges the two rankings
+# with weighted reciprocal rank fusion:
+#
+#   score(chunk) = sum over rankings of weight / (rrf_k + rank)
+#
+# Dense search finds paraphrases, BM25 finds exact terms (API names, error
+# codes) that embeddings tend to blur. Documents keep the dense
+# "relevance_score" when the dense search returned them, and get an
+# "rrf_score" either way.
+
+fetch_k = int(os.environ.get("HYBRID_FETCH_K", 20))
+dense_weight = float(os.environ.get("HYBRID_DENSE_WEIGHT", 1.0))
+sparse_weight = float(os.environ.get("HYBRID_SPARSE_WEIGHT", 1.0))
+rrf_k = int(os.environ.get("HYBRID_RRF_K", 60))
+
+# Shared by all retrievers; each search runs its dense and sparse halves here
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid-search")
+
+
+def rrf(rankings, k, rrf_k=rrf_k):
+    """
+    Weighted reciprocal rank fusion.
+
+    Args:
+        rankings (list): (weight, [(chunk id, Document), ...]) pairs, each list best first
+        k (int): Number of documents to return
+        rrf_k (int): Rank offset; larger values flatten the difference between ranks
+
+    Returns:
+        list: The top k Documents, best first, with "rrf_score" in their metadata
+    """
+    scores, docs = {}, {}
+    for weight, ranked in rankings:
+        for rank, (i, doc) in enumerate(ranked, start=1):
+            scores[i] = scores.get(i, 0.0) + weight / (rrf_k + rank)
+            docs.setdefault(i, doc)
+
+    fused = []
+    for i in sorted(scores, key=scores.get, reverse=True)[:k]:
+        docs[i].metadata["rrf_score"] = scores[i]
+        fused.append(docs[i])
+    return fused
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    BM25 + dense retriever fused with reciprocal rank fusion.
+
+    Example:
+        retriever = HybridRetriever(vectorstore=vectorstore, sparse_index=BM25Index(directory), k=4)
+    """
+
+    vectorstore: Any
+    sparse_index: Any
+    k: int = 4
+    fetch_k: int = fetch_k
+    dense_weight: float = dense_weight
+    sparse_weight: float = sparse_weight
+    rrf_k: int = rrf_k
+
+    def _dense(self, results):
+        ranked = []
+        for doc, score in results:
+            doc.metadata["relevance_score"] = score
+            ranked.append((doc.id or chunk_id(doc.metadata.get("source", ""), doc.page_content), doc))
+        return ranked
+
+    def _sparse(self, query):
+        hits = self.sparse_index.search(query, self.fetch_k)
+        if not hits:
+            return []
+        found = self.vectorstore.get(ids=[i for i, _ in hits], include=["documents", "metadatas"])
+        docs = {
+            i: Document(page_content=text, metadata=metadata or {}, id=i)
+            for i, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        ranked = []
+        for i, score in hits:
+            if i in docs:
+                docs[i].metadata["bm25_score"] = score
+                ranked.append((i, docs[i]))
+        return ranked
+
+    def _fuse(self, dense, sparse, k):
+        return rrf([(self.dense_weight, dense), (self.sparse_weight, sparse)], k, self.rrf_k)
+
+    def search(self, query, k=None):
+        """
+        Args:
+            query (str): The query
+            k (int): Number of documents; defaults to self.k
+
+        Returns:
+            list: Documents, best first
+        """
+        dense_k = self.fetch_k if self.sparse_weight else (k or self.k)
+        dense = _pool.submit(
+            self.vectorstore.similarity_search_with_relevance_scores, query, k=dense_k
+        )
+        sparse = _pool.submit(self._sparse, query) if self.sparse_weight else None
+        return self._fuse(
+            self._dense(dense.result()), sparse.result() if sparse else [], k or self.k
+        )
+
+    async def asearch(self, query, k=None):
+        """Async version of search."""
+        dense_k = self.fetch_k if self.sparse_weight else (k or self.k)
+        dense, sparse = await asyncio.gather(
+            self.vectorstore.asimilarity_search_with_relevance_scores(query, k=dense_k),
+            asyncio.to_thread(self._sparse, query) if self.sparse_weight else asyncio.sleep(0, []),
+        )
+        return self._fuse(self._dense(dense), sparse, k or self.k)
+
+    def _get_relevant_documents(self, query, *, run_manager) -> List[Document]:
+        return self.search(query)
+
+    async def _aget_relevant_documents(self, query, *, run_manager) -> List[Document]:
+        return await self.asearch(query)
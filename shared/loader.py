@@ -0,0 +1,173 @@
+import asyncio
+import random
+import time
+from collections import namedtuple
+from urllib.parse import urlparse
+
+import aiohttp
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+
+### Concurrent source loader
+#
+# Downloads sources with a bounded pool of workers sharing one connection pool.
+# Each host gets its own connection limit and request rate, failed requests are
+# retried with exponential backoff, and conditional GETs let unchanged pages come
+# back as 304 without a body. Results are yielded as soon as each download
+# finishes, so the caller can split and embed while other pages are still loading.
+
+headers_template = {"User-Agent": "Mozilla/5.0 (compatible; langgraph-rag-indexer)"}
+
+# Responses worth retrying
+retry_statuses = {429, 500, 502, 503, 504}
+
+# document is None when the source is unchanged (304) or failed (error is set)
+FetchResult = namedtuple("FetchResult", ["url", "document", "validators", "error"])
+
+
+class RetryableStatus(Exception):
+    pass
+
+
+def html_to_document(url, html):
+    """Extract the text of a page the same way WebBaseLoader does."""
+    soup = BeautifulSoup(html, "html.parser")
+    metadata = {"source": url}
+    if soup.title:
+        metadata["title"] = soup.title.get_text()
+    return Document(page_content=soup.get_text(), metadata=metadata)
+
+
+class HostRateLimiter:
+    """Spaces out requests to the same host to at most `requests_per_second`."""
+
+    def __init__(self, requests_per_second=None):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._next_slot = {}
+        self._locks = {}
+
+    async def wait(self, host):
+        if not self.interval:
+            return
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def fetch_source(session, url, fingerprint, limiter, retries=3, backoff=0.5, timeout=30):
+    """
+    Conditionally fetch one source, retrying transient failures.
+
+    Args:
+        session (aiohttp.ClientSession): Shared HTTP session
+        url (str): Source URL
+        fingerprint (dict): Previously stored validators ("etag", "last_modified"), may be empty
+        limiter (HostRateLimiter): Per-host rate limiter
+        retries (int): Retries after the first attempt
+        backoff (float): Base delay in seconds, doubled on every retry
+        timeout (float): Per-request timeout in seconds
+
+    Returns:
+        FetchResult: The fetched document, or None if the server answered 304
+    """
+    headers = {}
+    if fingerprint.get("etag"):
+        headers["If-None-Match"] = fingerprint["etag"]
+    if fingerprint.get("last_modified"):
+        headers["If-Modified-Since"] = fingerprint["last_modified"]
+
+    host = urlparse(url).netloc
+    for attempt in range(retries + 1):
+        try:
+            await limiter.wait(host)
+            async with session.get(
+                url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                if response.status == 304:
+                    validators = {
+                        "etag": fingerprint.get("etag"),
+                        "last_modified": fingerprint.get("last_modified"),
+                    }
+                    return FetchResult(url, None, validators, None)
+                if response.status in retry_statuses:
+                    raise RetryableStatus(f"HTTP {response.status}")
+                response.raise_for_status()
+                html = await response.text()
+                validators = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+            return FetchResult(url, html_to_document(url, html), validators, None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, RetryableStatus) as e:
+            if attempt == retries or (
+                isinstance(e, aiohttp.ClientResponseError) and e.status not in retry_statuses
+            ):
+                print(f"---FETCH FAILED: {url} ({e})---")
+                return FetchResult(url, None, {}, e)
+            delay = backoff * 2**attempt + random.uniform(0, backoff)
+            print(f"---FETCH RETRY {attempt + 1}/{retries} in {delay:.1f}s: {url} ({e})---")
+            await asyncio.sleep(delay)
+
+
+async def aload_sources(
+    urls,
+    fingerprints=None,
+    concurrency=8,
+    per_host=4,
+    requests_per_second=None,
+    retries=3,
+    backoff=0.5,
+):
+    """
+    Download sources concurrently, yielding each result as soon as it is ready.
+
+    Args:
+        urls (list): Source URLs
+        fingerprints (dict): url -> stored validators, used for conditional GETs
+        concurrency (int): Maximum downloads in flight (and size of the connection pool)
+        per_host (int): Maximum open connections per host
+        requests_per_second (float): Per-host request rate, None for unlimited
+        retries (int): Retries for transient failures
+        backoff (float): Base retry delay in seconds
+
+    Yields:
+        FetchResult: In completion order, not input order
+    """
+    fingerprints = fingerprints or {}
+    limiter = HostRateLimiter(requests_per_second)
+    pending = asyncio.Queue()
+    for url in urls:
+        pending.put_nowait(url)
+    # Bounded, so downloads pause while the consumer is behind
+    results = asyncio.Queue(maxsize=concurrency * 2)
+
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host)
+    async with aiohttp.ClientSession(connector=connector, headers=headers_template) as session:
+
+        async def worker():
+            while True:
+                try:
+                    url = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    result = await fetch_source(
+                        session, url, fingerprints.get(url, {}), limiter, retries, backoff
+                    )
+                except Exception as e:
+                    print(f"---FETCH FAILED: {url} ({e})---")
+                    result = FetchResult(url, None, {}, e)
+                await results.put(result)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(urls)))]
+        try:
+            for _ in range(len(urls)):
+                yield await results.get()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,284 @@
+import asyncio
+import time
+from functools import lru_cache
+
+import tiktoken
+
+from shared.fingerprints import chunk_id, text_hash
+from shared.loader import aload_sources
+
+### Streaming ingestion pipeline
+#
+#   load -> split -> embed -> upsert
+#
+# Each stage is a coroutine connected to the next by a bounded asyncio.Queue,
+# so a slow stage makes the ones before it wait instead of piling documents up
+# in memory. Blocking work (splitting, embedding, Chroma writes) runs in worker
+# threads so downloads keep flowing. Chunks become queryable batch by batch
+# rather than at the end of the run.
+#
+# Besides chunks, the queues carry one "source done" marker per re-indexed
+# source. It travels behind that source's chunks, so by the time the upsert
+# stage sees it every new chunk is stored and the stale ones can be deleted
+# and the fingerprint committed.
+
+_done = object()
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text):
+    return len(_encoding().encode(text))
+
+
+class StageStats:
+    """Item counts and busy time for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.started = time.monotonic()
+
+    def record(self, items, seconds):
+        self.items += items
+        self.busy += seconds
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (
+            f"{self.name:<7} {self.items:>7} items  {self.items / elapsed:8.1f}/s  "
+            f"busy {self.busy:6.1f}s ({100 * self.busy / elapsed:3.0f}%)"
+        )
+
+
+def split_source(store, result, text_splitter):
+    """
+    Split a freshly fetched source if its text changed.
+
+    Args:
+        store (FingerprintStore): Fingerprints of what is currently indexed
+        result (FetchResult): The download result for the source
+        text_splitter (TextSplitter): Splitter used to chunk the source
+
+    Returns:
+        tuple: (new chunks as (id, Document, tokens), marker), or None if the text is unchanged
+    """
+    url, doc = result.url, result.document
+    fingerprint = store.get(url)
+
+    doc_hash = text_hash(doc.page_content)
+    if doc_hash == fingerprint.get("text_hash"):
+        store.sources[url] = {**fingerprint, **result.validators}
+        return None
+
+    # Split, keeping the first occurrence of any repeated chunk
+    splits = {}
+    for split in text_splitter.split_documents([doc]):
+        splits.setdefault(chunk_id(url, split.page_content), split)
+
+    old_ids = set(fingerprint.get("chunk_ids", []))
+    new_chunks = [
+        (i, split, count_tokens(split.page_content))
+        for i, split in splits.items()
+        if i not in old_ids
+    ]
+    marker = {
+        "url": url,
+        "fingerprint": {**result.validators, "text_hash": doc_hash, "chunk_ids": list(splits)},
+        "stale_ids": list(old_ids - set(splits)),
+    }
+    return new_chunks, marker
+
+
+async def aupdate_index(
+    vectorstore,
+    store,
+    urls,
+    text_splitter,
+    batch_size=64,
+    max_batch_tokens=100_000,
+    queue_size=32,
+    report_every=10.0,
+    sparse_index=None,
+    **loader_kwargs,
+):
+    """
+    Bring a persisted vectorstore in line with the current sources, streaming.
+
+    Only sources whose content changed are re-split, only chunks whose hash is new
+    are embedded, and chunks that no longer exist are deleted from the collection.
+
+    Args:
+        vectorstore (Chroma): The persisted collection to update
+        store (FingerprintStore): Fingerprints of what is currently indexed
+        urls (list): The sources that should be indexed
+        text_splitter (TextSplitter): Splitter used to chunk changed sources
+        batch_size (int): Maximum chunks per embedding request
+        max_batch_tokens (int): Maximum tokens per embedding request
+        queue_size (int): Capacity of each queue between stages
+        report_every (float): Seconds between progress reports
+        sparse_index (BM25Index): Keyword index kept in step with the collection, if any
+        **loader_kwargs: Passed to shared.loader.aload_sources (concurrency, per_host, ...)
+
+    Returns:
+        dict: Counts of changed, unchanged and failed sources, added and deleted chunks
+
+    Raises:
+        RuntimeError: When no source could be loaded and nothing was indexed before;
+            nothing is saved in that case
+    """
+    embd = vectorstore.embeddings
+    collection = vectorstore._collection
+
+    split_q = asyncio.Queue(maxsize=queue_size)
+    embed_q = asyncio.Queue(maxsize=queue_size)
+    upsert_q = asyncio.Queue(maxsize=queue_size)
+
+    stages = {name: StageStats(name) for name in ["load", "split", "embed", "upsert"]}
+    counts = {
+        "sources_changed": 0,
+        "sources_unchanged": 0,
+        "sources_failed": 0,
+        "chunks_added": 0,
+        "chunks_deleted": 0,
+    }
+
+    async def load():
+        started = time.monotonic()
+        async for result in aload_sources(urls, store.sources, **loader_kwargs):
+            stages["load"].record(1, time.monotonic() - started)
+            if result.error is not None:
+                # Keep whatever was indexed before; the next run will try again
+                counts["sources_failed"] += 1
+            elif result.document is None:
+                counts["sources_unchanged"] += 1
+            else:
+                await split_q.put(result)
+            started = time.monotonic()
+        await split_q.put(_done)
+
+    async def split():
+        while (result := await split_q.get()) is not _done:
+            started = time.monotonic()
+            split_result = await asyncio.to_thread(split_source, store, result, text_splitter)
+            stages["split"].record(1, time.monotonic() - started)
+            if split_result is None:
+                counts["sources_unchanged"] += 1
+                continue
+            print(f"---RE-INDEXING: {result.url}---")
+            counts["sources_changed"] += 1
+            new_chunks, marker = split_result
+            for chunk in new_chunks:
+                await embed_q.put(chunk)
+            await embed_q.put(marker)
+        await embed_q.put(_done)
+
+    async def embed():
+        chunks, markers, tokens = [], [], 0
+
+        async def flush():
+            nonlocal chunks, markers, tokens
+            if chunks:
+                started = time.monotonic()
+                vectors = await asyncio.to_thread(
+                    embd.embed_documents, [doc.page_content for _, doc, _ in chunks]
+                )
+                stages["embed"].record(len(chunks), time.monotonic() - started)
+                await upsert_q.put((chunks, vectors))
+            for marker in markers:
+                await upsert_q.put(marker)
+            chunks, markers, tokens = [], [], 0
+
+        while (item := await embed_q.get()) is not _done:
+            if isinstance(item, dict):
+                # A source marker must not overtake its chunks
+                if chunks:
+                    markers.append(item)
+                else:
+                    await upsert_q.put(item)
+                continue
+            if chunks and (len(chunks) >= batch_size or tokens + item[2] > max_batch_tokens):
+                await flush()
+            chunks.append(item)
+            tokens += item[2]
+        await flush()
+        await upsert_q.put(_done)
+
+    async def upsert():
+        while (item := await upsert_q.get()) is not _done:
+            started = time.monotonic()
+            if isinstance(item, dict):
+                if item["stale_ids"]:
+                    await asyncio.to_thread(collection.delete, ids=item["stale_ids"])
+                    if sparse_index is not None:
+                        sparse_index.remove(item["stale_ids"])
+                    counts["chunks_deleted"] += len(item["stale_ids"])
+                store.sources[item["url"]] = item["fingerprint"]
+                continue
+            chunks, vectors = item
+            ids = [i for i, _, _ in chunks]
+            texts = [doc.page_content for _, doc, _ in chunks]
+            await asyncio.to_thread(
+                collection.upsert,
+                ids=ids,
+                embeddings=vectors,
+                documents=texts,
+                metadatas=[doc.metadata for _, doc, _ in chunks],
+            )
+            if sparse_index is not None:
+                await asyncio.to_thread(sparse_index.add, ids, texts)
+            stages["upsert"].record(len(chunks), time.monotonic() - started)
+            counts["chunks_added"] += len(chunks)
+
+    async def report():
+        while True:
+            await asyncio.sleep(report_every)
+            print_report()
+
+    def print_report():
+        print("---INGESTION PROGRESS---")
+        for stats in stages.values():
+            print(stats.summary())
+        print(f"queued: split {split_q.qsize()}  embed {embed_q.qsize()}  upsert {upsert_q.qsize()}")
+
+    reporter = asyncio.create_task(report())
+    tasks = [asyncio.create_task(stage()) for stage in (load, split, embed, upsert)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        reporter.cancel()
+        print_report()
+
+    if urls and counts["sources_failed"] == len(urls) and not store.exists():
+        # Saving now would leave an empty manifest that later runs take for a built index
+        raise RuntimeError(f"None of the {len(urls)} sources could be loaded; nothing was indexed")
+
+    # Sources that were dropped from the list. Sources that failed to load keep
+    # their previous fingerprint (and chunks) until a later run loads them.
+    for url in [u for u in store.sources if u not in urls]:
+        stale_ids = store.sources.pop(url).get("chunk_ids", [])
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+            if sparse_index is not None:
+                sparse_index.remove(stale_ids)
+        counts["chunks_deleted"] += len(stale_ids)
+
+    if sparse_index is not None:
+        sparse_index.save()
+    store.save()
+    print(f"---INDEX UPDATED: {counts}---")
+    return counts
+
+
+def update_index(vectorstore, store, urls, text_splitter, **kwargs):
+    """Blocking wrapper around aupdate_index."""
+    return asyncio.run(aupdate_index(vectorstore, store, urls, text_splitter, **kwargs))
@@ -0,0 +1,113 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+### Local HTTP stand-ins for tests
+#
+# A threaded HTTP/1.1 server on 127.0.0.1 (keep-alive on, like the real
+# services, so connection pooling is exercised) answering from a function.
+#
+#   with LocalServer(lambda request: (200, {}, "<html>...</html>")) as server:
+#       urls = [server.url + "/page"]
+#
+#   with fake_openai(lambda request: "yes") as server:
+#       llm = ChatOpenAI(base_url=server.url, api_key="test")
+
+
+class LocalServer:
+    """
+    HTTP server answering every request with handle(request).
+
+    handle gets a dict with "method", "path", "headers" and "body" (bytes, or the
+    decoded JSON for JSON requests) and returns (status, headers, body), body
+    being bytes, str, or anything JSON-serializable.
+
+    Attributes:
+        url: Base URL, e.g. http://127.0.0.1:54321
+        requests: Every request received, in order
+    """
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if "json" in self.headers.get("Content-Type", ""):
+                    body = json.loads(body)
+                request = {"method": self.command, "path": self.path, "headers": dict(self.headers), "body": body}
+                server.requests.append(request)
+                status, headers, payload = server.handle(request)
+                if not isinstance(payload, (bytes, str)):
+                    payload = json.dumps(payload)
+                    headers = {"Content-Type": "application/json", **headers}
+                if isinstance(payload, str):
+                    payload = payload.encode("utf-8")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = _respond
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def chat_completion(message):
+    """An OpenAI chat completion response carrying message (content str or message dict)."""
+    if isinstance(message, str):
+        message = {"role": "assistant", "content": message}
+    finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "test",
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+
+
+def fake_openai(reply):
+    """
+    Local OpenAI-compatible chat completions endpoint.
+
+    Args:
+        reply (callable): Request JSON -> message content (str) or message dict
+            (e.g. with "tool_calls")
+
+    Returns:
+        LocalServer: Its url ends in /v1, ready for ChatOpenAI(base_url=...)
+    """
+
+    def handle(request):
+        if request["method"] != "POST" or not request["path"].endswith("/chat/completions"):
+            return 404, {}, {"error": {"message": f"not found: {request['path']}"}}
+        return 200, {}, chat_completion(reply(request["body"]))
+
+    server = LocalServer(handle)
+    server.url += "/v1"
+    return server
@@ -0,0 +1,71 @@
+import asyncio
+from typing import List, TypedDict
+
+import pytest
+from langchain_openai import ChatOpenAI
+from langgraph.graph import END, START, StateGraph
+
+from shared.concurrency import background_loop, run_sync
+from shared.testing import fake_openai
+
+
+class State(TypedDict):
+    question: str
+    grades: List[str]
+
+
+def build_app(llm):
+    """A graph whose sync node fans out with asyncio, like grade_documents."""
+
+    async def agrade(question):
+        results = await asyncio.gather(*(llm.ainvoke(f"{question} #{i}") for i in range(3)))
+        return [r.content for r in results]
+
+    def grade(state):
+        return {"grades": run_sync(agrade(state["question"]))}
+
+    workflow = StateGraph(State)
+    workflow.add_node("grade", grade)
+    workflow.add_edge(START, "grade")
+    workflow.add_edge("grade", END)
+    return workflow.compile()
+
+
+def test_two_questions_in_a_row():
+    with fake_openai(lambda request: "yes") as server:
+        app = build_app(ChatOpenAI(base_url=server.url, api_key="test", max_retries=0))
+        for question in ["What is an agent?", "What is prompt engineering?"]:
+            assert app.invoke({"question": question})["grades"] == ["yes"] * 3
+        assert len(server.requests) == 6
+
+
+def test_graph_streamed_on_the_background_loop():
+    # Streamlit's path: astream_events runs on the background loop while the
+    # sync node, in an executor thread, submits its own coroutine to it
+    with fake_openai(lambda request: "yes") as server:
+        app = build_app(ChatOpenAI(base_url=server.url, api_key="test", max_retries=0))
+
+        async def stream(question):
+            return [chunk async for chunk in app.astream({"question": question})]
+
+        for question in ["first", "second"]:
+            assert run_sync(stream(question)) == [{"grade": {"grades": ["yes"] * 3}}]
+
+
+def test_called_from_a_running_loop():
+    with fake_openai(lambda request: "yes") as server:
+        llm = ChatOpenAI(base_url=server.url, api_key="test", max_retries=0)
+
+        async def caller():
+            return run_sync(llm.ainvoke("hi")).content
+
+        assert asyncio.run(caller()) == "yes"
+        assert run_sync(llm.ainvoke("again")).content == "yes"
+
+
+def test_called_from_the_background_loop():
+    async def nested():
+        return run_sync(asyncio.sleep(0))
+
+    with pytest.raises(RuntimeError, match="background loop"):
+        asyncio.run_coroutine_threadsafe(nested(), background_loop()).result(timeout=5)
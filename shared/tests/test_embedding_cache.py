@@ -0,0 +1,73 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from shared.embedding_cache import EmbeddingCache, fcntl
+
+dim = 8
+
+
+def vector(text):
+    return [float(len(text) + i) for i in range(dim)]
+
+
+def test_instances_sharing_a_directory_never_return_wrong_vectors(tmp_path):
+    a = EmbeddingCache(str(tmp_path), max_bytes=3 * dim * 4)
+    b = EmbeddingCache(str(tmp_path), max_bytes=3 * dim * 4)
+
+    b.put_many("m", ["b"], [vector("b")])
+    # Pushes b's vector out: the files are compacted behind b's back
+    a.put_many("m", ["a1", "a22", "a333"], [vector(t) for t in ["a1", "a22", "a333"]])
+
+    assert b.get_many("m", ["b"])[0] in (None, vector("b"))
+    assert b.get_many("m", ["a1", "a22", "a333"]) == [vector(t) for t in ["a1", "a22", "a333"]]
+    assert os.path.getsize(tmp_path / "vectors.f32") <= 3 * dim * 4
+
+
+def test_puts_append_instead_of_rewriting_the_index(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    cache.put_many("m", ["x"], [vector("x")])
+    cache.put_many("m", ["yy", "x"], [vector("yy"), vector("x")])
+
+    with open(tmp_path / "index.jsonl") as f:
+        header, *lines = f
+    assert "generation" in json.loads(header)
+    assert [json.loads(line)[1:] for line in lines] == [[0, dim], [dim, dim]]
+
+
+def test_flushed_usage_decides_eviction_after_reopening(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_bytes=2 * dim * 4)
+    cache.put_many("m", ["old", "new"], [vector("old"), vector("new")])
+    cache.get_many("m", ["old"])
+    cache.flush()
+
+    reopened = EmbeddingCache(str(tmp_path), max_bytes=2 * dim * 4)
+    reopened.put_many("m", ["third"], [vector("third")])
+
+    assert reopened.get_many("m", ["old", "new", "third"]) == [vector("old"), None, vector("third")]
+
+
+def _put_range(directory, start):
+    cache = EmbeddingCache(directory, max_bytes=40 * dim * 4)
+    for i in range(start, start + 50):
+        cache.put_many("m", [f"text {i}"], [[float(i)] * dim])
+
+
+@pytest.mark.skipif(fcntl is None, reason="needs file locks")
+def test_concurrent_processes(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_put_range, args=(str(tmp_path), start)) for start in (0, 1000)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    cache = EmbeddingCache(str(tmp_path), max_bytes=40 * dim * 4)
+    texts = [f"text {i}" for i in list(range(50)) + list(range(1000, 1050))]
+    found = cache.get_many("m", texts)
+    for text, vec in zip(texts, found):
+        assert vec is None or vec == [float(text.split()[1])] * dim
+    assert 0 < sum(vec is not None for vec in found) <= 40
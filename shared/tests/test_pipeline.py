@@ -0,0 +1,120 @@
+import os
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import shared.pipeline
+from shared.bm25 import BM25Index
+from shared.fingerprints import FingerprintStore
+from shared.pipeline import update_index
+from shared.testing import LocalServer
+
+pages = {
+    "/agents": "Agents plan, remember and use tools. " * 20,
+    "/prompts": "Few-shot prompting shows the model worked examples. " * 20,
+}
+
+
+class MemoryCollection:
+    """The part of a Chroma collection the pipeline writes to."""
+
+    def __init__(self):
+        self.chunks = {}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.chunks.update(zip(ids, documents))
+
+    def delete(self, ids):
+        for i in ids:
+            self.chunks.pop(i, None)
+
+
+class MemoryVectorstore:
+    def __init__(self):
+        self.embeddings = DeterministicFakeEmbedding(size=8)
+        self._collection = MemoryCollection()
+
+
+class Site:
+    """Serves `pages` with ETags; paths in `failing` answer 500."""
+
+    def __init__(self):
+        self.failing = set()
+
+    def __call__(self, request):
+        path = request["path"]
+        if path in self.failing:
+            return 500, {}, "unavailable"
+        etag = f'"{len(pages[path])}"'
+        if request["headers"].get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"ETag": etag, "Content-Type": "text/html"}, f"<html><body>{pages[path]}</body></html>"
+
+
+@pytest.fixture
+def site(monkeypatch):
+    # Word counts instead of tiktoken, whose encoding would be downloaded
+    monkeypatch.setattr(shared.pipeline, "count_tokens", lambda text: len(text.split()))
+    site = Site()
+    with LocalServer(site) as server:
+        site.server = server
+        site.urls = [server.url + path for path in pages]
+        yield site
+
+
+def update(site, directory, vectorstore):
+    store = FingerprintStore(directory)
+    counts = update_index(
+        vectorstore,
+        store,
+        site.urls,
+        RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=0),
+        sparse_index=BM25Index(directory),
+        retries=1,
+        backoff=0.01,
+        report_every=60,
+    )
+    return counts, store
+
+
+def test_nothing_saved_when_no_source_loads(site, tmp_path):
+    site.failing = set(pages)
+    vectorstore = MemoryVectorstore()
+
+    with pytest.raises(RuntimeError, match="nothing was indexed"):
+        update(site, tmp_path, vectorstore)
+
+    assert not FingerprintStore(tmp_path).exists()
+    assert not BM25Index(tmp_path).exists()
+    assert vectorstore._collection.chunks == {}
+    # Every source was tried, and retried once
+    assert len(site.server.requests) == 2 * len(pages)
+
+
+def test_failed_source_keeps_what_was_indexed(site, tmp_path):
+    vectorstore = MemoryVectorstore()
+    counts, store = update(site, tmp_path, vectorstore)
+    assert counts["sources_changed"] == len(pages)
+    indexed = dict(store.sources)
+    chunks = dict(vectorstore._collection.chunks)
+
+    site.failing = {"/agents"}
+    counts, store = update(site, tmp_path, vectorstore)
+
+    assert counts["sources_failed"] == 1
+    assert counts["sources_unchanged"] == 1
+    assert counts["chunks_deleted"] == 0
+    assert FingerprintStore(tmp_path).sources == indexed
+    assert vectorstore._collection.chunks == chunks
+    # The unchanged page was fetched conditionally
+    prompts = [r for r in site.server.requests if r["path"] == "/prompts"]
+    assert prompts[-1]["headers"].get("If-None-Match")
+
+
+def test_partial_first_run_leaves_the_failed_source_missing(site, tmp_path):
+    site.failing = {"/agents"}
+    counts, store = update(site, tmp_path, MemoryVectorstore())
+
+    assert counts["sources_failed"] == 1
+    assert FingerprintStore(tmp_path).missing(site.urls) == [site.server.url + "/agents"]